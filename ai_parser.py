@@ -1,13 +1,146 @@
+import asyncio
 import json
 import logging
-import google.generativeai as genai
-from config import GEMINI_API_KEY, EXPENSE_CATEGORIES
+import re
+import time
+import unicodedata
+from config import (
+    GEMINI_API_KEY, EXPENSE_CATEGORIES, CATEGORIES, GEMINI_TIMEOUT, GEMINI_MAX_CONCURRENCY,
+    PARSE_CACHE_PATH, PARSE_CACHE_MAX_ENTRIES, PARSE_CACHE_TTL_DAYS
+)
+from instrumentation import metrics
+from parse_cache import ParseCache
+from utils import parse_amount
 
-# Configure Gemini
-genai.configure(api_key=GEMINI_API_KEY)
-gemini_model = genai.GenerativeModel('gemini-1.5-flash')
+# Created on first use (see get_gemini_model) - importing google.generativeai takes ~0.5s
+gemini_model = None
 
-def parse_message_with_gemini(text: str, user_id: int) -> dict:
+# Caps how many Gemini requests are in flight at once across all users
+_gemini_slots = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+
+# The prompt embeds the category list, so it is part of the cache fingerprint
+parse_cache = ParseCache(
+    PARSE_CACHE_PATH,
+    fingerprint=json.dumps(EXPENSE_CATEGORIES, ensure_ascii=False),
+    max_entries=PARSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=PARSE_CACHE_TTL_DAYS * 86400
+)
+metrics.register_stats("wallet_parse_cache", "Gemini parse cache", parse_cache.stats)
+
+def get_gemini_model():
+    """Get the shared Gemini model, configuring the client on first call"""
+    global gemini_model
+    if gemini_model is None:
+        import google.generativeai as genai
+        genai.configure(api_key=GEMINI_API_KEY)
+        gemini_model = genai.GenerativeModel('gemini-1.5-flash')
+    return gemini_model
+
+async def generate_text(prompt: str, timeout: float = GEMINI_TIMEOUT, model=None) -> str:
+    """Run one Gemini request without blocking the event loop
+    
+    The deadline covers waiting for a free slot as well as the request itself.
+    Raises asyncio.TimeoutError when it is exceeded; cancelling the caller
+    cancels the request.
+    """
+    model = model or get_gemini_model()
+    
+    async def _request():
+        async with _gemini_slots:
+            response = await model.generate_content_async(prompt)
+            return response.text
+    
+    started = time.perf_counter()
+    try:
+        text = await asyncio.wait_for(_request(), timeout)
+    except Exception:
+        metrics.record_call("gemini", "generate_content", time.perf_counter() - started, error=True)
+        raise
+    
+    metrics.record_call("gemini", "generate_content", time.perf_counter() - started, 1, len(prompt.encode("utf-8")) + len(text.encode("utf-8")))
+    return text
+
+# Amount token the local parser trusts: k/m/tr notation (50k, 1.5m, 1,5tr) or a
+# plain number of at least 4 digits, where [.,]ddd groups are thousand
+# separators (200000, 50.000, 1,500). Anything else ("2", "1.5") goes to Gemini.
+_AMOUNT_TOKEN = re.compile(
+    r"^(?:(?P<number>\d+(?:[.,]\d{1,2})?)(?P<unit>k|m|tr)|(?P<plain>\d{4,}|\d{1,3}(?:[.,]\d{3})+))$",
+    re.IGNORECASE
+)
+
+# One whole-word pattern per category, built from config.CATEGORIES keywords
+_CATEGORY_PATTERNS = {
+    category: re.compile(
+        r"(?<!\w)(?:" + "|".join(re.escape(kw) for kw in sorted(info["keywords"] + [category], key=len, reverse=True)) + r")(?!\w)",
+        re.IGNORECASE
+    )
+    for category, info in CATEGORIES.items()
+}
+
+def parse_amount_token(token: str):
+    """Amount for a token matching _AMOUNT_TOKEN, or None: "50.000" -> 50000, "1,5tr" -> 1500000"""
+    match = _AMOUNT_TOKEN.match(token)
+    if not match:
+        return None
+    if match.group("unit"):
+        return parse_amount(match.group("number").replace(",", ".") + match.group("unit"))
+    return parse_amount(re.sub(r"[.,]", "", match.group("plain")))
+
+def parse_message_locally(text: str):
+    """Rule-based parsing for the common `50k cà phê` / `1.5m sofa` shape
+    
+    Returns the same dict shape as parse_message_with_gemini, or None when the
+    message is not confidently understood (no or several amounts, amount in
+    the middle, no or several matching categories).
+    """
+    tokens = unicodedata.normalize("NFC", text).split()
+    if len(tokens) < 2:
+        return None
+    
+    amount_positions = [i for i, token in enumerate(tokens) if _AMOUNT_TOKEN.match(token)]
+    if len(amount_positions) != 1 or amount_positions[0] not in (0, len(tokens) - 1):
+        return None
+    
+    position = amount_positions[0]
+    amount = parse_amount_token(tokens[position])
+    if not amount or amount <= 0:
+        return None
+    
+    description = " ".join(tokens[:position] + tokens[position + 1:]).strip()
+    matched = [category for category, pattern in _CATEGORY_PATTERNS.items() if pattern.search(description)]
+    if len(matched) != 1:
+        return None
+    
+    return {
+        "type": "expenses",
+        "expenses": [{"amount": amount, "description": description, "category": matched[0]}]
+    }
+
+async def parse_message(text: str, user_id: int) -> dict:
+    """Parse an expense message, calling Gemini only when the local parser is unsure
+    
+    Gemini answers are cached by normalized text, so repeated messages skip it too.
+    """
+    local_result = parse_message_locally(text)
+    if local_result:
+        return local_result
+    
+    cached_result = parse_cache.get(text)
+    if cached_result:
+        return cached_result
+    
+    result = await parse_message_with_gemini(text, user_id)
+    
+    # Only cache real answers - "unknown" may just be a timeout or API error
+    if result.get("type") == "expenses" and result.get("expenses"):
+        try:
+            await parse_cache.put_async(text, result)
+        except Exception as e:
+            logging.warning(f"Parse cache write failed: {e}")
+    
+    return result
+
+async def parse_message_with_gemini(text: str, user_id: int, timeout: float = GEMINI_TIMEOUT) -> dict:
     """Simple Gemini parsing for Vietnamese/English messages"""
     
     categories_str = ", ".join(EXPENSE_CATEGORIES)
@@ -46,8 +179,7 @@ If not expense, return: {{"type": "unknown", "expenses": []}}
 """
 
     try:
-        response = gemini_model.generate_content(prompt)
-        result_text = response.text.strip()
+        result_text = (await generate_text(prompt, timeout)).strip()
         
         # Clean markdown formatting
         if result_text.startswith('```json'):
@@ -56,11 +188,14 @@ If not expense, return: {{"type": "unknown", "expenses": []}}
         result = json.loads(result_text)
         return result
         
+    except asyncio.TimeoutError:
+        logging.warning(f"Gemini parsing timed out after {timeout}s")
+        return {"type": "unknown", "expenses": []}
     except Exception as e:
         logging.error(f"Gemini parsing error: {e}")
         return {"type": "unknown", "expenses": []}
 
-def generate_monthly_summary(expense_data, income_data, month, year):
+async def generate_monthly_summary(expense_data, income_data, month, year, timeout: float = GEMINI_TIMEOUT):
     """Simple monthly summary generation"""
     summary_prompt = f"""
 Create a short financial summary in Vietnamese for:
@@ -78,8 +213,10 @@ Keep it short and friendly with emojis.
 """
     
     try:
-        response = gemini_model.generate_content(summary_prompt)
-        return response.text
+        return await generate_text(summary_prompt, timeout)
+    except asyncio.TimeoutError:
+        logging.warning(f"Summary generation timed out after {timeout}s")
+        return None
     except Exception as e:
         logging.error(f"Summary generation error: {e}")
         return None
\ No newline at end of file
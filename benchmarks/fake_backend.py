@@ -0,0 +1,65 @@
+"""In-memory backend and stub Gemini model for benchmarks"""
+import asyncio
+import json
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+from sqlite_database import SQLiteDatabaseManager
+
+class CountingManager:
+    """Wraps a DatabaseManager-shaped object: counts calls per method and adds latency
+    
+    latency (seconds) is slept on the calling worker thread, like a network
+    round-trip to Supabase would be.
+    """
+    
+    def __init__(self, manager, latency=0.0):
+        self._manager = manager
+        self.latency = latency
+        self.calls = Counter()
+    
+    def __getattr__(self, name):
+        attr = getattr(self._manager, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+        
+        def call(*args, **kwargs):
+            self.calls[name] += 1
+            if self.latency:
+                time.sleep(self.latency)
+            return attr(*args, **kwargs)
+        
+        call.__name__ = name
+        return call
+    
+    def total_calls(self):
+        return sum(self.calls.values())
+
+def create_fake_backend(latency=0.0):
+    """Fresh in-memory DatabaseManager (SQLite :memory:) with call counting"""
+    return CountingManager(SQLiteDatabaseManager(":memory:"), latency)
+
+class StubGeminiModel:
+    """Stands in for genai.GenerativeModel; answers each prompt kind with a canned reply"""
+    
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+    
+    async def generate_content_async(self, prompt):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        
+        if '"matched_index"' in prompt:
+            text = json.dumps({"matched_index": 0, "confidence": "high", "reason": "stub"})
+        elif "Message:" in prompt:
+            text = json.dumps({
+                "type": "expenses",
+                "expenses": [{"amount": 20000, "description": "đồ linh tinh", "category": "linh tinh"}]
+            }, ensure_ascii=False)
+        else:
+            text = "Stub monthly summary."
+        
+        return SimpleNamespace(text=text)
\ No newline at end of file
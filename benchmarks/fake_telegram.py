@@ -0,0 +1,168 @@
+"""Fake Telegram harness for webhook throughput runs
+
+Starts the bot in webhook mode next to a fake Bot API server, then POSTs
+synthetic expense messages from several users and waits for every reply.
+Reports updates/second and checks that each user's replies came back in the
+order the messages were sent.
+
+    python -m benchmarks.fake_telegram --users 20 --messages 50
+
+Runs against the local SQLite backend in a temp directory unless
+DATABASE_BACKEND etc. are already set.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import re
+import sys
+import tempfile
+import time
+from urllib.parse import parse_qsl
+
+# Bot API replies are parsed back into the amount we sent, e.g. "1,000₫"
+REPLY_AMOUNT = re.compile(r"Chi tiêu\*: ([\d,]+)₫")
+
+class FakeBotAPI:
+    """Minimal Bot API: answers getMe/setWebhook and records sendMessage calls"""
+    
+    def __init__(self):
+        self.sent = []  # (chat_id, text, monotonic time)
+        self._message_ids = itertools.count(1)
+        self.all_replied = asyncio.Event()
+        self.expected = 0
+    
+    def create_app(self):
+        from starlette.applications import Starlette
+        from starlette.responses import JSONResponse
+        from starlette.routing import Route
+        
+        async def bot_method(request):
+            method = request.path_params["method"]
+            payload = await self._payload(request)
+            
+            if method == "getMe":
+                result = {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+            elif method == "sendMessage":
+                chat_id = int(payload["chat_id"])
+                self.sent.append((chat_id, payload.get("text", ""), time.monotonic()))
+                if len(self.sent) >= self.expected:
+                    self.all_replied.set()
+                result = {
+                    "message_id": next(self._message_ids),
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private"},
+                    "text": payload.get("text", "")
+                }
+            else:
+                result = True
+            
+            return JSONResponse({"ok": True, "result": result})
+        
+        return Starlette(routes=[Route("/bot{token}/{method}", bot_method, methods=["GET", "POST"])])
+    
+    @staticmethod
+    async def _payload(request):
+        # python-telegram-bot posts url-encoded forms when there are no files
+        if request.headers.get("content-type", "").startswith("application/json"):
+            return await request.json()
+        return dict(parse_qsl((await request.body()).decode("utf-8")))
+
+def make_update(update_id, user_id, text):
+    """Synthetic private-chat text message update"""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private", "first_name": f"User{user_id}"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"},
+            "text": text
+        }
+    }
+
+async def run(users, messages, bot_port, api_port):
+    import httpx
+    import uvicorn
+    
+    user_ids = [900000 + i for i in range(users)]
+    os.environ["ALLOWED_USERS"] = ",".join(str(user_id) for user_id in user_ids)
+    os.environ["TELEGRAM_API_BASE_URL"] = f"http://127.0.0.1:{api_port}/bot"
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "1:fake")
+    os.environ.setdefault("GEMINI_API_KEY", "fake")
+    workdir = tempfile.mkdtemp(prefix="fake_telegram_")
+    os.environ.setdefault("DATABASE_BACKEND", "sqlite")
+    os.environ.setdefault("SQLITE_DATABASE_PATH", os.path.join(workdir, "wallet.db"))
+    os.environ.setdefault("WRITE_JOURNAL_PATH", os.path.join(workdir, "write_journal.db"))
+    # Measures the bot, not Telegram's rate limits (see rate_limiter.py)
+    os.environ.setdefault("TELEGRAM_CHAT_RATE", "0")
+    os.environ.setdefault("TELEGRAM_GLOBAL_RATE", "0")
+    
+    # Imported only now so config picks up the environment above
+    from config import WEBHOOK_PATH
+    from main import build_application
+    from webhook_server import create_webhook_server, run_webhook
+    
+    api = FakeBotAPI()
+    api.expected = users * messages
+    api_server = uvicorn.Server(uvicorn.Config(api.create_app(), host="127.0.0.1", port=api_port, log_level="warning"))
+    api_task = asyncio.create_task(api_server.serve())
+    while not api_server.started:
+        await asyncio.sleep(0.05)
+    
+    application = build_application(concurrent=True)
+    bot_server = create_webhook_server(application, listen="127.0.0.1", port=bot_port)
+    bot_task = asyncio.create_task(run_webhook(application, server=bot_server, set_webhook=False))
+    
+    url = f"http://127.0.0.1:{bot_port}{WEBHOOK_PATH}"
+    async with httpx.AsyncClient(timeout=30) as client:
+        while True:
+            try:
+                await client.get(f"http://127.0.0.1:{bot_port}/healthz")
+                break
+            except httpx.TransportError:
+                if bot_task.done():
+                    bot_task.result()  # re-raise the startup error
+                await asyncio.sleep(0.05)
+        
+        update_ids = itertools.count(1)
+        
+        async def send_user_messages(user_id):
+            # One user's messages are posted in order, like Telegram does
+            for i in range(messages):
+                await client.post(url, json=make_update(next(update_ids), user_id, f"{i + 1}k cà phê"))
+        
+        started = time.monotonic()
+        await asyncio.gather(*(send_user_messages(user_id) for user_id in user_ids))
+        await asyncio.wait_for(api.all_replied.wait(), timeout=300)
+        elapsed = time.monotonic() - started
+    
+    out_of_order = 0
+    for user_id in user_ids:
+        amounts = [int(m.group(1).replace(",", "")) for chat_id, text, _ in api.sent if chat_id == user_id for m in [REPLY_AMOUNT.search(text)] if m]
+        if amounts != sorted(amounts):
+            out_of_order += 1
+    
+    total = users * messages
+    print(f"Updates:        {total} ({users} users x {messages} messages)")
+    print(f"Elapsed:        {elapsed:.2f}s")
+    print(f"Throughput:     {total / elapsed:.1f} updates/s")
+    print(f"Out of order:   {out_of_order} users")
+    
+    bot_server.should_exit = True
+    await bot_task
+    api_server.should_exit = True
+    await api_task
+    return 1 if out_of_order else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput run against the webhook endpoint with a fake Telegram")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--bot-port", type=int, default=8765)
+    parser.add_argument("--api-port", type=int, default=8766)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.users, args.messages, args.bot_port, args.api_port)))
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,209 @@
+"""Handler latency benchmark with synthetic users and an in-memory backend
+
+Drives every command registered in main.py (plus free-text expenses) with
+synthetic updates against an in-memory DatabaseManager and a stubbed Gemini
+model, and reports p50/p95/p99 latency and backend calls per command for
+each history size.
+
+    python -m benchmarks.handler_latency --history 100,1000,10000,100000 --db-latency 0.02
+
+--db-latency / --gemini-latency inject a fixed delay per backend call /
+Gemini request to approximate network round-trips.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+USER_BASE = 800000
+
+# Arguments each command is invoked with; adds run before removes (registration order)
+COMMAND_ARGS = {
+    "editsaving": ["500k"],
+    "income": ["salary", "20m", "lương"],
+    "wishadd": ["iPhone", "25m", "2"],
+    "wishremove": ["iphone"],
+    "subadd": ["Spotify", "59k"],
+    "subremove": ["1"],
+    "budget": ["ăn uống", "3m"],
+    "accountedit": ["fun", "1m"],
+    "allocation": []
+}
+
+# Free-text messages: the first shapes are parsed locally, the last needs Gemini (then the parse cache)
+FREE_TEXT = ["50k cà phê", "35k phở", "1.2m sofa", "mua 20k đồ linh tinh ở chợ"]
+
+class FakeMessage:
+    def __init__(self, text):
+        self.text = text
+        self.replies = []
+    
+    async def reply_text(self, text, parse_mode=None, **kwargs):
+        self.replies.append(text)
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.first_name = f"User{user_id}"
+        self.username = f"user{user_id}"
+
+class FakeChat:
+    def __init__(self, chat_id):
+        self.id = chat_id
+
+class FakeUpdate:
+    def __init__(self, user_id, text):
+        self.message = FakeMessage(text)
+        self.effective_user = FakeUser(user_id)
+        self.effective_chat = FakeChat(user_id)
+
+class FakeContext:
+    def __init__(self, args, user_data):
+        self.args = args
+        self.user_data = user_data
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def configure_environment(users):
+    """Point config at throwaway local files before the bot modules are imported"""
+    workdir = tempfile.mkdtemp(prefix="bench_")
+    os.environ["ALLOWED_USERS"] = ",".join(str(USER_BASE + i) for i in range(users))
+    os.environ["DATABASE_BACKEND"] = "sqlite"
+    os.environ["SQLITE_DATABASE_PATH"] = ":memory:"
+    os.environ["WRITE_JOURNAL_PATH"] = os.path.join(workdir, "write_journal.db")
+    os.environ["PARSE_CACHE_PATH"] = os.path.join(workdir, "parse_cache.db")
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "1:fake")
+    os.environ.setdefault("GEMINI_API_KEY", "fake")
+
+def seed_history(manager, user_id, expenses):
+    """Insert `expenses` rows for this month plus budgets, allocations, wishlist and a subscription"""
+    today = date.today()
+    categories = ["ăn uống", "di chuyển", "cá nhân", "linh tinh", "hóa đơn", "mèo"]
+    rng = random.Random(user_id)
+    
+    batch = []
+    for i in range(expenses):
+        batch.append({
+            "user_id": user_id,
+            "amount": rng.randrange(10, 500) * 1000,
+            "description": f"seed {i}",
+            "category": categories[i % len(categories)],
+            "date": today.replace(day=rng.randint(1, today.day)).isoformat()
+        })
+        if len(batch) == 1000:
+            manager.insert_expenses(batch)
+            batch = []
+    if batch:
+        manager.insert_expenses(batch)
+    
+    manager.insert_income({"user_id": user_id, "amount": 30000000, "income_type": "salary", "description": "seed", "date": today.isoformat()})
+    for category in categories:
+        manager.insert_budget_plan({"user_id": user_id, "category": category, "budget_amount": 5000000})
+    for account_type, percentage in [("need", 50), ("fun", 20), ("saving", 20), ("invest", 10)]:
+        manager.upsert_allocation_setting({"user_id": user_id, "account_type": account_type, "percentage": percentage})
+    for priority in range(1, 4):
+        manager.insert_wishlist_item({"user_id": user_id, "item_name": f"Item {priority}", "estimated_price": 1000000 * priority, "priority": priority, "purchased": False})
+    manager.insert_subscription({"user_id": user_id, "service_name": "Netflix", "amount": 220000, "billing_cycle": "monthly"})
+
+async def run_history_size(application, history, users, iterations, db_latency, stub_model):
+    import database
+    from write_journal import write_journal
+    from benchmarks.fake_backend import create_fake_backend
+    
+    # Fresh in-memory database behind the real async + cache layers
+    backend = create_fake_backend(db_latency)
+    database.async_db._manager = backend
+    database.db.clear()
+    write_journal._balances.clear()
+    
+    user_ids = [USER_BASE + i for i in range(users)]
+    for user_id in user_ids:
+        seed_history(backend._manager, user_id, history)
+    
+    from telegram.ext import CommandHandler, MessageHandler
+    steps = []
+    for handler in application.handlers[0]:
+        if isinstance(handler, CommandHandler):
+            for command in sorted(handler.commands):
+                steps.append((f"/{command}", handler.callback, COMMAND_ARGS.get(command, []), None))
+        elif isinstance(handler, MessageHandler) and handler.callback.__name__ == "handle_message":
+            for text in FREE_TEXT:
+                steps.append((f"text: {text}", handler.callback, [], text))
+    
+    latencies = {name: [] for name, _, _, _ in steps}
+    calls = {name: [] for name, _, _, _ in steps}
+    gemini = {name: 0 for name, _, _, _ in steps}
+    user_data = {user_id: {} for user_id in user_ids}
+    
+    for _ in range(iterations):
+        for user_id in user_ids:
+            for name, callback, args, text in steps:
+                update = FakeUpdate(user_id, text if text is not None else f"{name} {' '.join(args)}")
+                context = FakeContext(list(args), user_data[user_id])
+                
+                calls_before = backend.total_calls()
+                gemini_before = stub_model.calls
+                started = time.perf_counter()
+                await callback(update, context)
+                latencies[name].append((time.perf_counter() - started) * 1000)
+                calls[name].append(backend.total_calls() - calls_before)
+                gemini[name] += stub_model.calls - gemini_before
+                
+                # /endmonth leaves a pending confirmation; drop it so the next text is an expense
+                user_data[user_id].pop("pending_month_end", None)
+    
+    # Background work the replies no longer wait for
+    calls_before = backend.total_calls()
+    started = time.perf_counter()
+    flushed = await write_journal.flush()
+    flush_ms = (time.perf_counter() - started) * 1000
+    
+    print(f"\n=== history: {history} expenses/user, {users} users, {iterations} iterations, db latency {db_latency * 1000:.0f}ms ===")
+    print(f"{'handler':<34}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'db calls':>10}{'gemini':>8}")
+    for name, _, _, _ in steps:
+        samples = latencies[name]
+        print(f"{name:<34}{percentile(samples, 50):>9.2f}{percentile(samples, 95):>9.2f}{percentile(samples, 99):>9.2f}"
+              f"{statistics.mean(calls[name]):>10.1f}{gemini[name] / len(samples):>8.2f}")
+    print(f"{'(journal flush: ' + str(flushed) + ' entries)':<34}{flush_ms:>9.2f}{'':>18}{backend.total_calls() - calls_before:>10}")
+
+async def run(histories, users, iterations, db_latency, gemini_latency):
+    configure_environment(users)
+    
+    # Imported only now so config picks up the environment above
+    import ai_parser
+    from main import build_application
+    from benchmarks.fake_backend import StubGeminiModel
+    
+    logging.getLogger().setLevel(logging.WARNING)  # keep handler/scheduler INFO logs out of the report
+    
+    stub_model = StubGeminiModel(gemini_latency)
+    ai_parser.gemini_model = stub_model
+    ai_parser.parse_cache.clear()
+    
+    application = build_application(concurrent=False)
+    for history in histories:
+        await run_history_size(application, history, users, iterations, db_latency, stub_model)
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-handler latency and backend call counts")
+    parser.add_argument("--history", default="100,1000,10000", help="comma-separated expenses per user, e.g. 100,1000,10000,100000")
+    parser.add_argument("--users", type=int, default=3)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--db-latency", type=float, default=0.0, help="seconds added to every backend call")
+    parser.add_argument("--gemini-latency", type=float, default=0.0, help="seconds added to every Gemini request")
+    args = parser.parse_args()
+    
+    histories = [int(size) for size in args.history.split(",")]
+    asyncio.run(run(histories, args.users, args.iterations, args.db_latency, args.gemini_latency))
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
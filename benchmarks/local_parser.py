@@ -0,0 +1,78 @@
+"""Local expense parser: regression cases and how many messages skip Gemini
+
+Runs ai_parser.parse_message_locally over CASES and fails (exit 1) when a
+message is parsed to a different amount/category than expected, or parsed
+locally when it must go to Gemini (expected None).
+
+    python -m benchmarks.local_parser
+    python -m benchmarks.local_parser --repeat 10000   # also time the parser
+"""
+import argparse
+import os
+import sys
+import time
+
+# Message -> (amount, category) parsed locally, or None when Gemini must decide
+CASES = {
+    "50k cà phê": (50000, "ăn uống"),
+    "35k phở": (35000, "ăn uống"),
+    "1.2m sofa": (1200000, "công trình"),
+    "1,5tr sofa": (1500000, "công trình"),
+    "grab 45k": (45000, "di chuyển"),
+    "200000 grab": (200000, "di chuyển"),
+    
+    # Dots and commas in plain numbers are thousand separators
+    "50.000 cà phê": (50000, "ăn uống"),
+    "1,500 grab": (1500, "di chuyển"),
+    "1.250.000 tiền điện": (1250000, "hóa đơn"),
+    
+    # Too short or ambiguous to trust without Gemini
+    "cà phê 2": None,
+    "2 cà phê": None,
+    "1.5 cà phê": None,
+    "500 grab": None,
+    "1.500k cà phê": None,
+    "mua 20k đồ linh tinh ở chợ": None,
+    "50k": None
+}
+
+def check_cases(parse):
+    """List of (message, expected, got) for every case that parses differently"""
+    failures = []
+    for message, expected in CASES.items():
+        result = parse(message)
+        got = None
+        if result:
+            expense = result["expenses"][0]
+            got = (expense["amount"], expense["category"])
+        if got != expected:
+            failures.append((message, expected, got))
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Local parser regression cases and speed")
+    parser.add_argument("--repeat", type=int, default=0, help="also time this many passes over the cases")
+    args = parser.parse_args()
+    
+    for name, value in {"TELEGRAM_BOT_TOKEN": "1:fake", "GEMINI_API_KEY": "fake", "ALLOWED_USERS": "1"}.items():
+        os.environ.setdefault(name, value)
+    from ai_parser import parse_message_locally
+    
+    failures = check_cases(parse_message_locally)
+    local = sum(1 for message in CASES if parse_message_locally(message))
+    print(f"{len(CASES)} cases, {local} parsed locally, {len(CASES) - local} sent to Gemini, {len(failures)} failed")
+    for message, expected, got in failures:
+        print(f"  {message!r}: expected {expected}, got {got}")
+    
+    if args.repeat:
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            for message in CASES:
+                parse_message_locally(message)
+        elapsed = time.perf_counter() - started
+        print(f"{elapsed / (args.repeat * len(CASES)) * 1e6:.1f} µs per message")
+    
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
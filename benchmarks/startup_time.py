@@ -0,0 +1,95 @@
+"""Cold-start benchmark: import cost of the bot and time until it can take updates
+
+Runs each step in a fresh interpreter (like a Railway restart) and reports
+the median wall time plus the slowest imports from `python -X importtime`.
+
+    python -m benchmarks.startup_time --runs 5 --top 15
+    python -m benchmarks.startup_time --budget-ms 500   # exit 1 when import main is slower
+
+Clients that are created on first use (Gemini, Supabase) are timed
+separately under "first use", so a change that moves them back to import
+time shows up in the "import main" row.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Label -> code run in a fresh interpreter
+STEPS = {
+    "python startup": "pass",
+    "import main": "import main",
+    "build_application()": "import main; main.build_application()",
+    "first use: gemini model": "import ai_parser; ai_parser.get_gemini_model()",
+    "first use: supabase client": "import database; database.DatabaseManager().supabase"
+}
+
+def child_environment():
+    """Environment for the child interpreters: dummy credentials, no network needed"""
+    env = dict(os.environ)
+    env.setdefault("TELEGRAM_BOT_TOKEN", "1:fake")
+    env.setdefault("GEMINI_API_KEY", "fake")
+    env.setdefault("SUPABASE_URL", "https://example.supabase.co")
+    env.setdefault("SUPABASE_KEY", "fake")
+    env.setdefault("ALLOWED_USERS", "1")
+    return env
+
+def time_step(code, runs, env):
+    """Median wall time (ms) of running `code` in a new interpreter"""
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, check=True, stderr=subprocess.DEVNULL)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+def slowest_imports(env, top):
+    """(cumulative ms, module) for the slowest direct imports under `import main`"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=env, check=True, capture_output=True, text=True
+    )
+    
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header row
+        # Indentation marks nesting; keep the modules main (or site) imports directly
+        if len(name) - len(name.lstrip()) == 3:
+            imports.append((int(cumulative) / 1000, name.strip()))
+    
+    return sorted(imports, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description="Import and startup cost of the bot")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per step (median is reported)")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    parser.add_argument("--budget-ms", type=float, default=0, help="fail when 'import main' exceeds this")
+    args = parser.parse_args()
+    
+    env = child_environment()
+    timings = {label: time_step(code, args.runs, env) for label, code in STEPS.items()}
+    
+    print(f"{'step':<30}{'median ms':>12}{'minus startup':>15}")
+    for label, ms in timings.items():
+        print(f"{label:<30}{ms:>12.1f}{ms - timings['python startup']:>15.1f}")
+    
+    print("\nSlowest imports under 'import main' (cumulative):")
+    for ms, name in slowest_imports(env, args.top):
+        print(f"{ms:>10.1f} ms  {name}")
+    
+    import_ms = timings["import main"] - timings["python startup"]
+    if args.budget_ms and import_ms > args.budget_ms:
+        print(f"\n'import main' took {import_ms:.1f}ms, over the {args.budget_ms:.0f}ms budget")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -126,12 +126,14 @@ BOT_MESSAGES = {
 *💵 THU NHẬP:*
 • `/income salary 3m`
 • `/income construction 2m`
+• `/import` - Nhập chi tiêu từ file CSV
 
 *📊 XEM:*
 • `/list` - Tổng quan
 • `/list ăn uống` - Chi tiết danh mục  
 • `/list 15/08/2025` - Chi tiêu ngày
 • `/summary` - Báo cáo tháng
+• `/rebuildrollups` - Tính lại tổng theo tháng
 
 *💰 QUẢN LÝ:*
 • `/budget ăn uống 1.5m` - Đặt budget
@@ -167,18 +169,30 @@ VD: `50k cà phê`, `/help`"""
 # =============================================================================
 
 CATEGORIES = {
-    "ăn uống": {"emoji": "🍜", "keywords": ["food", "drink", "bún", "phở", "cơm"]},
+    "ăn uống": {"emoji": "🍜", "keywords": ["food", "drink", "bún", "phở", "cơm", "cà phê", "cafe", "coffee", "trà sữa"]},
     "di chuyển": {"emoji": "🚗", "keywords": ["transport", "taxi", "grab", "xăng"]},
-    "hóa đơn": {"emoji": "📄", "keywords": ["bill", "điện", "nước", "internet"]},
-    "cá nhân": {"emoji": "🎮", "keywords": ["entertainment", "shopping", "áo", "quần"]},
+    "hóa đơn": {"emoji": "📄", "keywords": ["bill", "tiền điện", "tiền nước", "internet", "wifi"]},
+    "cá nhân": {"emoji": "🎮", "keywords": ["entertainment", "shopping", "áo", "quần", "phim", "game"]},
     "mèo": {"emoji": "🐾", "keywords": ["cat", "pet", "mèo", "cát mèo"]},
     "công trình": {"emoji": "🗯️", "keywords": ["furniture", "sofa", "tủ lạnh", "giường"]},
-    "linh tinh": {"emoji": "🔧", "keywords": ["small items", "tools", "đèn nhỏ", "ly"]},
+    "linh tinh": {"emoji": "🔧", "keywords": ["small items", "tools", "đèn nhỏ", "ly", "dao"]},
     "khác": {"emoji": "📂", "keywords": ["other", "misc"]}
 }
 
 EXPENSE_CATEGORIES = list(CATEGORIES.keys())
 
+# Extra names commands accept for a category (matched without diacritics, see text_matching)
+CATEGORY_ALIASES = {
+    "ăn uống": ["food"],
+    "di chuyển": ["transport"],
+    "hóa đơn": ["bills"],
+    "cá nhân": ["personal"],
+    "mèo": ["cat"],
+    "công trình": ["construction"],
+    "linh tinh": ["misc"],
+    "khác": ["other"]
+}
+
 def get_category_emoji(category):
     return CATEGORIES.get(category, {}).get("emoji", "📂")
 
@@ -341,6 +355,69 @@ def get_error_message(key, **kwargs):
 
 ALLOWED_USERS = [int(uid) for uid in os.getenv("ALLOWED_USERS").split(",")]
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+# Storage backend: "supabase" (default) or "sqlite" for a local single-node file
+DATABASE_BACKEND = os.getenv("DATABASE_BACKEND", "supabase").lower()
+SQLITE_DATABASE_PATH = os.getenv("SQLITE_DATABASE_PATH", "wallet.db")
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
\ No newline at end of file
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+
+# Worker threads for blocking Supabase calls (keeps the event loop free)
+DB_MAX_WORKERS = int(os.getenv("DB_MAX_WORKERS", "8"))
+
+# In-process cache for budgets, allocations, subscriptions and wishlist
+DB_CACHE_TTL = float(os.getenv("DB_CACHE_TTL", "300"))
+DB_CACHE_MAX_ENTRIES = int(os.getenv("DB_CACHE_MAX_ENTRIES", "1000"))
+
+# Gemini request deadline (seconds) and max concurrent requests
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "15"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+
+# Local cache of Gemini parse results for repeated messages
+PARSE_CACHE_PATH = os.getenv("PARSE_CACHE_PATH", "parse_cache.db")
+PARSE_CACHE_MAX_ENTRIES = int(os.getenv("PARSE_CACHE_MAX_ENTRIES", "5000"))
+PARSE_CACHE_TTL_DAYS = float(os.getenv("PARSE_CACHE_TTL_DAYS", "30"))
+
+# Local write-behind journal for expense/income writes and how often it is drained
+WRITE_JOURNAL_PATH = os.getenv("WRITE_JOURNAL_PATH", "write_journal.db")
+WRITE_JOURNAL_FLUSH_INTERVAL = float(os.getenv("WRITE_JOURNAL_FLUSH_INTERVAL", "2"))
+WRITE_JOURNAL_BATCH_SIZE = int(os.getenv("WRITE_JOURNAL_BATCH_SIZE", "100"))
+
+# Webhook mode (python main.py --webhook): public base URL, local listen address and secret
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+
+# Handlers running at once across users (each user's updates still run one at a time)
+MAX_CONCURRENT_UPDATES = int(os.getenv("MAX_CONCURRENT_UPDATES", "64"))
+
+# Metrics: per-update trace log (TRACE_UPDATES=1) and a /metrics port for polling mode
+TRACE_UPDATES = os.getenv("TRACE_UPDATES", "").lower() in ("1", "true", "yes")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Bot API base URL override (e.g. the fake Telegram server in benchmarks/)
+TELEGRAM_API_BASE_URL = os.getenv("TELEGRAM_API_BASE_URL", "")
+
+# Supervisor: restart after crashes with exponential backoff (full jitter), giving
+# up (exit 1, so the platform restarts the container) after too many restarts
+SUPERVISOR_BACKOFF_BASE = float(os.getenv("SUPERVISOR_BACKOFF_BASE", "1"))
+SUPERVISOR_BACKOFF_MAX = float(os.getenv("SUPERVISOR_BACKOFF_MAX", "300"))
+SUPERVISOR_MAX_RESTARTS = int(os.getenv("SUPERVISOR_MAX_RESTARTS", "10"))
+SUPERVISOR_RESTART_WINDOW = int(os.getenv("SUPERVISOR_RESTART_WINDOW", "3600"))  # seconds
+SUPERVISOR_HEALTHY_AFTER = int(os.getenv("SUPERVISOR_HEALTHY_AFTER", "60"))  # a run this long resets the backoff
+
+# Seconds to keep flushing the write journal after SIGTERM before exiting
+SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "20"))
+
+# Outbound Telegram rate limits (messages/second; 0 disables). Telegram allows
+# ~30/s overall and about 1/s per private chat (short bursts are tolerated)
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+TELEGRAM_CHAT_BURST = int(os.getenv("TELEGRAM_CHAT_BURST", "3"))
+TELEGRAM_MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", "3"))
+
+# /import: expense rows per insert request and the largest CSV accepted (bytes)
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+IMPORT_MAX_FILE_SIZE = int(os.getenv("IMPORT_MAX_FILE_SIZE", str(5 * 1024 * 1024)))
\ No newline at end of file
@@ -1,25 +1,63 @@
-from supabase import create_client, Client
-from config import SUPABASE_URL, SUPABASE_KEY
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 
-# Initialize Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+from config import (
+    SUPABASE_URL, SUPABASE_KEY, DB_MAX_WORKERS, DB_CACHE_TTL, DB_CACHE_MAX_ENTRIES,
+    ACCOUNT_DESCRIPTIONS, DATABASE_BACKEND, SQLITE_DATABASE_PATH
+)
+from db_cache import CachedDatabaseManager
+from instrumentation import InstrumentedDatabaseManager, metrics
+from sqlite_database import SQLiteDatabaseManager
+
+# Columns needed by month views and summaries - avoids transferring whole rows
+EXPENSE_SUMMARY_COLUMNS = "amount, category, date, description"
+INCOME_SUMMARY_COLUMNS = "amount, income_type, date, description"
+
+# Every user has one account of each type
+ALL_ACCOUNT_TYPES = list(ACCOUNT_DESCRIPTIONS.keys())
 
 class DatabaseManager:
     def __init__(self):
-        self.supabase = supabase
+        self._supabase = None
+        self._client_lock = threading.Lock()
+    
+    @property
+    def supabase(self):
+        """Supabase client, created on first use (importing supabase is slow)"""
+        if self._supabase is None:
+            with self._client_lock:
+                if self._supabase is None:
+                    from supabase import create_client
+                    self._supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        return self._supabase
     
     def register_user(self, user_data):
         """Register or update user in database"""
         return self.supabase.table("users").upsert(user_data).execute()
     
     def insert_expense(self, expense_data):
-        """Insert expense record"""
+        """Insert expense record (its monthly rollup is bumped by a trigger, migrations/005)"""
         return self.supabase.table("expenses").insert(expense_data).execute()
     
+    def insert_expenses(self, expenses_data):
+        """Insert several expense records in one request (rollups bumped by a trigger, migrations/005)"""
+        return self.supabase.table("expenses").insert(expenses_data).execute()
+    
     def insert_income(self, income_data):
-        """Insert income record"""
+        """Insert income record (its monthly rollup is bumped by a trigger, migrations/005)"""
         return self.supabase.table("income").insert(income_data).execute()
     
+    def get_monthly_rollups(self, user_id, year, month):
+        """Get pre-aggregated expense/income totals for one month"""
+        return self.supabase.table("monthly_rollups").select("kind, category, total, entry_count").eq("user_id", user_id).eq("year", year).eq("month", month).execute()
+    
+    def rebuild_monthly_rollups(self, user_id):
+        """Recompute all of a user's monthly rollups from raw expenses and income"""
+        return self.supabase.rpc("rebuild_monthly_rollups", {"p_user_id": user_id}).execute()
+    
     def get_savings(self, user_id):
         """Get user's current savings"""
         return self.supabase.table("savings").select("*").eq("user_id", user_id).execute()
@@ -28,17 +66,24 @@ class DatabaseManager:
         """Update or insert savings record"""
         return self.supabase.table("savings").upsert(savings_data).execute()
     
-    def get_expenses_by_category(self, user_id, category, month_start):
-        """Get expenses by category for current month"""
-        return self.supabase.table("expenses").select("*").eq("user_id", user_id).eq("category", category).gte("date", month_start).execute()
+    def get_expenses_by_category(self, user_id, category, month_start, month_end, columns=EXPENSE_SUMMARY_COLUMNS):
+        """Get expenses by category between month_start and month_end (inclusive)"""
+        return self.supabase.table("expenses").select(columns).eq("user_id", user_id).eq("category", category).gte("date", month_start).lte("date", month_end).execute()
+    
+    def get_monthly_expenses(self, user_id, month_start, month_end, columns=EXPENSE_SUMMARY_COLUMNS):
+        """Get all expenses between month_start and month_end (inclusive)"""
+        return self.supabase.table("expenses").select(columns).eq("user_id", user_id).gte("date", month_start).lte("date", month_end).execute()
     
-    def get_monthly_expenses(self, user_id, month_start):
-        """Get all expenses for current month"""
-        return self.supabase.table("expenses").select("*").eq("user_id", user_id).gte("date", month_start).execute()
+    def get_expenses_by_date(self, user_id, target_date, category=None):
+        """Get expenses for a specific date, optionally for one category"""
+        query = self.supabase.table("expenses").select("*").eq("user_id", user_id).eq("date", target_date.isoformat())
+        if category:
+            query = query.eq("category", category)
+        return query.execute()
     
-    def get_monthly_income(self, user_id, month_start):
-        """Get all income for current month"""
-        return self.supabase.table("income").select("*").eq("user_id", user_id).gte("date", month_start).execute()
+    def get_monthly_income(self, user_id, month_start, month_end, columns=INCOME_SUMMARY_COLUMNS):
+        """Get all income between month_start and month_end (inclusive)"""
+        return self.supabase.table("income").select(columns).eq("user_id", user_id).gte("date", month_start).lte("date", month_end).execute()
     
     def insert_wishlist_item(self, wishlist_data):
         """Insert wishlist item"""
@@ -68,6 +113,22 @@ class DatabaseManager:
         """Get all subscriptions for monthly processing"""
         return self.supabase.table("subscriptions").select("*").execute()
     
+    def post_subscription_expenses(self, year, month, posting_date, category, description_suffix):
+        """Post every subscription not yet posted for the month; returns the inserted expenses
+        
+        Claiming (subscription_id, year, month) in subscription_postings and
+        inserting the expenses happen in one statement (the
+        post_subscription_expenses Postgres function, migrations/006), so
+        re-runs are no-ops and a crash can't leave a claim without its expense.
+        """
+        return self.supabase.rpc("post_subscription_expenses", {
+            "p_year": year,
+            "p_month": month,
+            "p_date": posting_date.isoformat(),
+            "p_category": category,
+            "p_description_suffix": description_suffix
+        }).execute()
+    
     def insert_budget_plan(self, budget_data):
         """Insert or update budget plan"""
         return self.supabase.table("budget_plans").upsert(budget_data).execute()
@@ -84,6 +145,36 @@ class DatabaseManager:
         """Get all accounts for user"""
         return self.supabase.table("accounts").select("*").eq("user_id", user_id).execute()
     
+    def get_account_balances(self, user_id):
+        """Get {account_type: balance} for all account types in one query
+        
+        Missing accounts are created with a 0 balance in a single bulk upsert
+        (only happens the first time for a user).
+        """
+        accounts_data = self.get_accounts(user_id)
+        balances = {acc["account_type"]: float(acc.get("current_balance", 0)) for acc in accounts_data.data or []}
+        
+        missing_types = [account_type for account_type in ALL_ACCOUNT_TYPES if account_type not in balances]
+        if missing_types:
+            now = datetime.now().isoformat()
+            new_accounts = [{
+                "user_id": user_id,
+                "account_type": account_type,
+                "current_balance": 0,
+                "last_updated": now
+            } for account_type in missing_types]
+            
+            self.supabase.table("accounts").upsert(
+                new_accounts,
+                on_conflict="user_id,account_type",
+                ignore_duplicates=True
+            ).execute()
+            
+            for account_type in missing_types:
+                balances[account_type] = 0.0
+        
+        return balances
+    
     def upsert_account(self, account_data):
         """Insert or update account record with proper conflict resolution - CONSOLIDATED"""
         try:
@@ -118,50 +209,50 @@ class DatabaseManager:
         """CONSOLIDATED account balance update with transaction logging
         
         This is the SINGLE SOURCE OF TRUTH for all account balance updates.
-        Replaces all duplicate functions from other files.
+        Calls the apply_account_delta Postgres function (migrations/001), which
+        applies the delta and logs the transaction atomically in one round-trip,
+        so concurrent updates can't overwrite each other's balance.
         """
-        from datetime import datetime
-        
         try:
-            # Get current balance
-            account_data = self.get_account_by_type(user_id, account_type)
-            current_balance = 0
-            
-            if account_data.data:
-                current_balance = float(account_data.data[0].get("current_balance", 0))
-            
-            # Calculate new balance
-            new_balance = current_balance + amount_change  # Negative amount_change for expenses
-            
-            # Update account with consolidated upsert method
-            account_update = {
-                "user_id": user_id,
-                "account_type": account_type,
-                "current_balance": new_balance,
-                "last_updated": datetime.now().isoformat()
-            }
-            
-            # Use the consolidated upsert method
-            result = self.upsert_account(account_update)
-            
-            # Log transaction
-            transaction_data = {
-                "user_id": user_id,
-                "account_type": account_type,
-                "transaction_type": transaction_type,
-                "amount": amount_change,
-                "description": description,
-                "reference_id": reference_id
-            }
-            
-            self.insert_account_transaction(transaction_data)
+            result = self.supabase.rpc("apply_account_delta", {
+                "p_user_id": user_id,
+                "p_account_type": account_type,
+                "p_amount": amount_change,  # Negative amount_change for expenses
+                "p_transaction_type": transaction_type,
+                "p_description": description,
+                "p_reference_id": reference_id
+            }).execute()
             
+            new_balance = float(result.data)
             return result, new_balance
             
         except Exception as e:
             print(f"Update account balance error: {e}")
             raise e
     
+    def apply_account_deltas(self, user_id, deltas):
+        """Apply several account balance changes in one atomic round-trip
+        
+        deltas: list of {"account_type", "amount", "transaction_type", "description", "reference_id"}
+        Returns (result, {account_type: new_balance}). Uses the apply_account_deltas
+        Postgres function (migrations/002).
+        """
+        if not deltas:
+            return None, {}
+        
+        try:
+            result = self.supabase.rpc("apply_account_deltas", {
+                "p_user_id": user_id,
+                "p_deltas": deltas
+            }).execute()
+            
+            new_balances = {account_type: float(balance) for account_type, balance in (result.data or {}).items()}
+            return result, new_balances
+            
+        except Exception as e:
+            print(f"Apply account deltas error: {e}")
+            raise e
+    
     def get_account_by_type(self, user_id, account_type):
         """Get specific account by type"""
         return self.supabase.table("accounts").select("*").eq("user_id", user_id).eq("account_type", account_type).execute()
@@ -217,5 +308,56 @@ class DatabaseManager:
         user_id_str = str(user_id)
         return self.supabase.table("account_balance_history").select("*").eq("user_id", user_id_str).order("year", desc=True).order("month", desc=True).limit(limit).execute()
 
-# Global database instance
-db = DatabaseManager()
\ No newline at end of file
+class AsyncDatabaseManager:
+    """Awaitable version of DatabaseManager with the same method surface.
+    
+    The Supabase client is synchronous, so every call is run on a bounded
+    thread pool instead of the bot's event loop. One slow round-trip then
+    only occupies a worker thread, not every other update.
+    """
+    
+    def __init__(self, manager, max_workers=DB_MAX_WORKERS):
+        self._manager = manager
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+    
+    def __getattr__(self, name):
+        attr = getattr(self._manager, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+        
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(attr, *args, **kwargs))
+        
+        call.__name__ = name
+        call.__doc__ = attr.__doc__
+        return call
+    
+    async def call_measured(self, name, measure, *args, **kwargs):
+        """Call a manager method on the pool; returns (result, measure(result)), measured on the worker too"""
+        attr = getattr(self._manager, name)
+        
+        def run():
+            result = attr(*args, **kwargs)
+            return result, measure(result)
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, run)
+    
+    def shutdown(self, wait=True):
+        """Stop the worker pool (waits for in-flight queries by default)"""
+        self._executor.shutdown(wait=wait)
+
+def create_database_manager(backend=DATABASE_BACKEND):
+    """Build the sync manager for the configured storage backend"""
+    if backend == "sqlite":
+        return SQLiteDatabaseManager(SQLITE_DATABASE_PATH)
+    if backend == "supabase":
+        return DatabaseManager()
+    raise ValueError(f"Unknown DATABASE_BACKEND: {backend}")
+
+# Global database instances - handlers use the async, instrumented, cached one
+sync_db = create_database_manager()
+async_db = AsyncDatabaseManager(sync_db)
+db = CachedDatabaseManager(InstrumentedDatabaseManager(async_db), ttl_seconds=DB_CACHE_TTL, max_entries=DB_CACHE_MAX_ENTRIES)
+metrics.register_stats("wallet_db_cache", "Database read cache", db.stats)
\ No newline at end of file
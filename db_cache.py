@@ -0,0 +1,113 @@
+import time
+from collections import OrderedDict
+
+# Cached read method -> table it reads. Each takes user_id as its only argument.
+CACHED_READS = {
+    "get_budget_plans": "budget_plans",
+    "get_allocation_settings": "allocation_settings",
+    "get_subscriptions": "subscriptions",
+    "get_wishlist": "wishlist"
+}
+
+# Write method -> table whose cached reads it invalidates
+INVALIDATING_WRITES = {
+    "insert_budget_plan": "budget_plans",
+    "upsert_allocation_setting": "allocation_settings",
+    "insert_subscription": "subscriptions",
+    "delete_subscription": "subscriptions",
+    "insert_wishlist_item": "wishlist",
+    "delete_wishlist_item": "wishlist"
+}
+
+class CachedDatabaseManager:
+    """Per-user read-through cache in front of AsyncDatabaseManager
+    
+    Budgets, allocation settings, subscriptions and wishlist rarely change but
+    are read by every /list, /summary and income message. Their reads are
+    cached per (table, user_id) with a TTL and LRU eviction. The matching
+    write methods invalidate the entry; writes that only carry a row id
+    (deletes) invalidate that table for every user. Everything else passes
+    straight through.
+    """
+    
+    def __init__(self, manager, ttl_seconds=300, max_entries=1000):
+        self._manager = manager
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generation = 0  # bumped on every invalidation
+        self.hits = 0
+        self.misses = 0
+    
+    def __getattr__(self, name):
+        if name in CACHED_READS:
+            return self._cached_read(name, CACHED_READS[name])
+        if name in INVALIDATING_WRITES:
+            return self._invalidating_write(name, INVALIDATING_WRITES[name])
+        return getattr(self._manager, name)
+    
+    def invalidate(self, table, user_id=None):
+        """Drop cached reads for a table, for one user or for all users"""
+        self._generation += 1
+        for key in list(self._entries):
+            if key[0] == table and (user_id is None or key[1] == user_id):
+                del self._entries[key]
+    
+    def clear(self):
+        """Drop every cached entry"""
+        self._generation += 1
+        self._entries.clear()
+    
+    def stats(self):
+        """Get hit/miss counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._entries)
+        }
+    
+    def _cached_read(self, name, table):
+        read = getattr(self._manager, name)
+        
+        async def call(user_id):
+            key = (table, user_id)
+            entry = self._entries.get(key)
+            
+            if entry and time.monotonic() - entry[0] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            
+            self.misses += 1
+            generation = self._generation
+            result = await read(user_id)
+            
+            # A write landed while we were reading - don't cache a possibly stale result
+            if generation != self._generation:
+                return result
+            
+            self._entries[key] = (time.monotonic(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            
+            return result
+        
+        call.__name__ = name
+        return call
+    
+    def _invalidating_write(self, name, table):
+        write = getattr(self._manager, name)
+        
+        async def call(*args, **kwargs):
+            try:
+                return await write(*args, **kwargs)
+            finally:
+                data = args[0] if args else None
+                user_id = data.get("user_id") if isinstance(data, dict) else None
+                self.invalidate(table, user_id)
+        
+        call.__name__ = name
+        return call
\ No newline at end of file
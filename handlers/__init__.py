@@ -1,62 +1,72 @@
-# Main handlers (cleaned up - without list functionality)
-from .main_handlers import (
-    start,
-    handle_message,
-    savings_command,
-    edit_savings_command,
-    help_command,
-    monthly_summary
-)
+# Handler modules are imported on first access (PEP 562), so importing one
+# handler doesn't pull in every module and its dependencies at startup
+import importlib
 
-# NEW: Dedicated list handlers module
-from .list_handlers import (
-    list_expenses_command
-)
-
-from .wishlist_handlers import (
-    wishlist_add_command,
-    wishlist_view_command,
-    wishlist_remove_command,
-    get_wishlist_priority_sums,
-    get_wishlist_priority1_sum  # Backward compatibility
-)
-
-from .subscription_handlers import (
-    subscription_add_command,
-    subscription_list_command,
-    subscription_remove_command
-)
-
-from .budget_handlers import (
-    budget_command,
-    budget_list_command,
-    calculate_remaining_budget,
-    get_total_budget
-)
-
-from .income_handlers import (
-    income_command,
-    calculate_income_by_type,
-    calculate_expenses_by_income_type
-)
-
-from .account_handlers import (
-    account_command,
-    account_edit_command
-)
+# Exported name -> module that defines it
+_EXPORTS = {
+    # Main handlers (cleaned up - without list functionality)
+    "start": "main_handlers",
+    "handle_message": "main_handlers",
+    "savings_command": "main_handlers",
+    "edit_savings_command": "main_handlers",
+    "help_command": "main_handlers",
+    "monthly_summary": "main_handlers",
+    "rebuild_rollups_command": "main_handlers",
+    
+    # NEW: Dedicated list handlers module
+    "list_expenses_command": "list_handlers",
+    
+    "wishlist_add_command": "wishlist_handlers",
+    "wishlist_view_command": "wishlist_handlers",
+    "wishlist_remove_command": "wishlist_handlers",
+    "get_wishlist_priority_sums": "wishlist_handlers",
+    "get_wishlist_priority1_sum": "wishlist_handlers",  # Backward compatibility
+    
+    "subscription_add_command": "subscription_handlers",
+    "subscription_list_command": "subscription_handlers",
+    "subscription_remove_command": "subscription_handlers",
+    "post_monthly_subscriptions": "subscription_handlers",
+    
+    "budget_command": "budget_handlers",
+    "budget_list_command": "budget_handlers",
+    "calculate_remaining_budget": "budget_handlers",
+    "get_total_budget": "budget_handlers",
+    
+    "income_command": "income_handlers",
+    "calculate_income_by_type": "income_handlers",
+    "calculate_expenses_by_income_type": "income_handlers",
+    
+    "account_command": "account_handlers",
+    "account_edit_command": "account_handlers",
+    
+    "allocation_command": "allocation_handlers",
+    "get_user_allocations": "allocation_handlers",
+    "validate_allocations": "allocation_handlers",
+    
+    # Per-request month data shared by the breakdown helpers
+    "MonthSnapshot": "month_snapshot",
+    
+    # Month-end handlers
+    "endmonth_command": "month_end_handlers",
+    "monthhistory_command": "month_end_handlers",
+    "balancehistory_command": "month_end_handlers",
+    
+    # CSV import
+    "import_command": "import_handlers",
+    "import_csv_document": "import_handlers"
+}
 
-from .allocation_handlers import (
-    allocation_command,
-    get_user_allocations,
-    validate_allocations
-)
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value  # later lookups skip __getattr__
+    return value
 
-# Month-end handlers
-from .month_end_handlers import (
-    endmonth_command,
-    monthhistory_command,
-    balancehistory_command
-)
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
 
 __all__ = [
     # Main handlers (cleaned)
@@ -66,6 +76,7 @@ __all__ = [
     "edit_savings_command",
     "help_command",
     "monthly_summary",
+    "rebuild_rollups_command",
     
     # List handlers (NEW MODULE)
     "list_expenses_command",
@@ -81,6 +92,7 @@ __all__ = [
     "subscription_add_command",
     "subscription_list_command",
     "subscription_remove_command",
+    "post_monthly_subscriptions",
     
     # Budget handlers
     "budget_command",
@@ -102,8 +114,15 @@ __all__ = [
     "get_user_allocations",
     "validate_allocations",
     
+    # Month snapshot
+    "MonthSnapshot",
+    
     # Month-end handlers
     "endmonth_command",
     "monthhistory_command",
-    "balancehistory_command"
+    "balancehistory_command",
+    
+    # Import handlers
+    "import_command",
+    "import_csv_document"
 ]
\ No newline at end of file
@@ -1,13 +1,16 @@
 from telegram import Update
 from telegram.ext import ContextTypes
 from datetime import datetime
+import asyncio
 
 from database import db
+from write_journal import write_journal
 from utils import check_authorization, send_formatted_message, safe_parse_amount, format_currency
 from config import (
     ACCOUNT_DESCRIPTIONS, get_account_emoji_enhanced, 
     get_account_description_enhanced, get_account_name_enhanced
 )
+from text_matching import resolve_account
 
 async def account_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Enhanced accounts view with allocation info: /account [account_type]"""
@@ -17,10 +20,9 @@ async def account_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     args = context.args
     
-    # If specific account requested, show details
+    # If specific account requested, show details (names may be several words: "tiết kiệm")
     if args:
-        account_type = args[0].lower()
-        await _show_account_details(update, user_id, account_type)
+        await _show_account_details(update, user_id, " ".join(args))
         return
     
     # Show all accounts overview
@@ -29,20 +31,12 @@ async def account_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def _show_all_accounts_enhanced(update: Update, user_id: int):
     """Show enhanced view of all 5 accounts with allocation info"""
     
-    # Get account balances
-    accounts_data = db.get_accounts(user_id)
-    
-    # Initialize accounts if needed
-    if not accounts_data.data:
-        await _initialize_all_accounts(user_id)
-        accounts_data = db.get_accounts(user_id)
-    
-    # Get allocation settings
+    # Get all account balances (incl. journaled writes) and allocation settings together
     from .allocation_handlers import get_user_allocations
-    allocations = get_user_allocations(user_id)
-    
-    # Build accounts dict
-    accounts_dict = {acc["account_type"]: acc for acc in accounts_data.data}
+    balances, allocations = await asyncio.gather(
+        write_journal.balances(user_id),
+        get_user_allocations(user_id)
+    )
     
     # Build message
     message = "💳 *TÀI KHOẢN CỦA BẠN*\n\n"
@@ -54,10 +48,7 @@ async def _show_all_accounts_enhanced(update: Update, user_id: int):
     for account_type in ["need", "fun", "saving", "invest", "construction"]:
         account_info = ACCOUNT_DESCRIPTIONS[account_type]
         
-        balance = 0
-        if account_type in accounts_dict:
-            balance = float(accounts_dict[account_type].get("current_balance", 0))
-        
+        balance = balances.get(account_type, 0)
         account_balances[account_type] = balance
         total_balance += balance
         
@@ -83,23 +74,22 @@ async def _show_all_accounts_enhanced(update: Update, user_id: int):
     
     await send_formatted_message(update, message)
 
-async def _show_account_details(update: Update, user_id: int, account_type: str):
+async def _show_account_details(update: Update, user_id: int, account_input: str):
     """Show detailed view of specific account with recent transactions"""
     
-    # Validate account type
+    # Find matching account type (key, Vietnamese name or a prefix: "sav", "tiết kiệm")
     valid_types = ["need", "fun", "saving", "invest", "construction"]
-    if account_type not in valid_types:
-        await send_formatted_message(update, f"⌘ Loại tài khoản không hợp lệ. Có sẵn: {', '.join(valid_types)}")
+    account_type = resolve_account(account_input)
+    if not account_type:
+        await send_formatted_message(update, f"⌘ Không tìm thấy tài khoản '{account_input}'\n\n📋 *Có sẵn:* {', '.join(valid_types)}")
         return
     
-    # Get account balance
-    account_data = db.get_account_by_type(user_id, account_type)
-    balance = 0
-    if account_data.data:
-        balance = float(account_data.data[0].get("current_balance", 0))
+    # Get account balance (incl. journaled writes, same as the overview)
+    balances = await write_journal.balances(user_id)
+    balance = balances.get(account_type, 0)
     
     # Get recent transactions
-    transactions_data = db.get_account_transactions(user_id, account_type, limit=10)
+    transactions_data = await db.get_account_transactions(user_id, account_type, limit=10)
     
     # Get account info
     account_info = ACCOUNT_DESCRIPTIONS.get(account_type, {"emoji": "💳", "name": account_type.title(), "description": ""})
@@ -157,14 +147,10 @@ async def account_edit_command(update: Update, context: ContextTypes.DEFAULT_TYP
     
     # Parse account type
     account_input = args[0].lower().strip()
-    matched_account = None
     
-    # Find matching account type
+    # Find matching account type (key, Vietnamese name or a prefix: "sav", "tiết kiệm")
     valid_types = ["need", "fun", "saving", "invest", "construction"]
-    for account_type in valid_types:
-        if account_input == account_type or account_input in account_type:
-            matched_account = account_type
-            break
+    matched_account = resolve_account(account_input)
     
     if not matched_account:
         await send_formatted_message(update, f"⌘ Không tìm thấy tài khoản '{account_input}'\n\n📋 *Có sẵn:* {', '.join(valid_types)}")
@@ -176,16 +162,20 @@ async def account_edit_command(update: Update, context: ContextTypes.DEFAULT_TYP
         await send_formatted_message(update, "⌘ Số tiền không hợp lệ. VD: `/accountedit need 500k`")
         return
     
-    # Get current balance for calculating the difference
-    current_balance = db.get_account_balance(user_id, matched_account)
+    # Current balance including journaled writes the database hasn't seen yet
+    # (a failed flush keeps them pending), so the change lands on the real total
+    balances = await write_journal.balances(user_id)
+    current_balance = balances.get(matched_account, 0.0)
     balance_change = new_balance - current_balance
     
     try:
         # Update account using CONSOLIDATED database function
-        result, final_balance = db.update_account_balance(
+        await db.update_account_balance(
             user_id, matched_account, balance_change, "manual_adjustment",
             f"Manual adjustment to {format_currency(new_balance)}"
         )
+        write_journal.invalidate(user_id)
+        final_balance = current_balance + balance_change  # the database reaches it once pending writes flush
         
         # Response
         account_info = ACCOUNT_DESCRIPTIONS.get(matched_account, {"emoji": "💳", "name": matched_account.title()})
@@ -203,27 +193,4 @@ async def account_edit_command(update: Update, context: ContextTypes.DEFAULT_TYP
     except Exception as e:
         import logging
         logging.error(f"Account edit error: {e}")
-        await send_formatted_message(update, "⌘ Lỗi khi cập nhật tài khoản. Vui lòng thử lại.")
-
-async def _initialize_all_accounts(user_id):
-    """Initialize all account types with 0 balance - SINGLE SOURCE (removed duplicate)"""
-    all_account_types = ["need", "fun", "saving", "invest", "construction"]
-    
-    for account_type in all_account_types:
-        # Check if account already exists
-        existing_account = db.get_account_by_type(user_id, account_type)
-        
-        if not existing_account.data:
-            # Only create if it doesn't exist
-            account_data = {
-                "user_id": user_id,
-                "account_type": account_type,
-                "current_balance": 0,
-                "last_updated": datetime.now().isoformat()
-            }
-            try:
-                db.supabase.table("accounts").insert(account_data).execute()
-            except Exception as e:
-                import logging
-                logging.error(f"Error initializing account {account_type} for user {user_id}: {e}")
-                # Continue with other accounts even if one fails
\ No newline at end of file
+        await send_formatted_message(update, "⌘ Lỗi khi cập nhật tài khoản. Vui lòng thử lại.")
\ No newline at end of file
@@ -47,7 +47,7 @@ async def allocation_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         "percentage": percentage
     }
     
-    db.upsert_allocation_setting(allocation_data)
+    await db.upsert_allocation_setting(allocation_data)
     
     # Show updated allocations
     await _show_current_allocations(update, user_id, f"✅ Đã cập nhật {account_type}: {percentage}%\n\n")
@@ -56,7 +56,7 @@ async def _show_current_allocations(update: Update, user_id: int, prefix_message
     """Show current allocation percentages with validation"""
     
     # Get current settings from database
-    allocations_data = db.get_allocation_settings(user_id)
+    allocations_data = await db.get_allocation_settings(user_id)
     
     if not allocations_data.data:
         message = f"{prefix_message}❌ *CHƯA CÓ CÀI ĐẶT PHÂN BỔ*\n\n"
@@ -107,9 +107,9 @@ async def _show_current_allocations(update: Update, user_id: int, prefix_message
     
     await send_formatted_message(update, message)
 
-def get_user_allocations(user_id):
+async def get_user_allocations(user_id):
     """Get user allocations as dict from database"""
-    allocations_data = db.get_allocation_settings(user_id)
+    allocations_data = await db.get_allocation_settings(user_id)
     
     if not allocations_data.data:
         return {}  # Return empty dict if no settings
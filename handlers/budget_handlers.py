@@ -5,6 +5,7 @@ from datetime import datetime, date
 from database import db
 from utils import check_authorization, send_formatted_message, safe_parse_amount, format_currency
 from config import EXPENSE_CATEGORIES, get_category_emoji
+from text_matching import resolve_category
 
 async def budget_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Set budget for category: /budget ăn uống 1.5m"""
@@ -28,11 +29,7 @@ async def budget_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     category_input = " ".join(args[:-1]).lower().strip()
     
     # Find matching category
-    matched_category = None
-    for category in EXPENSE_CATEGORIES:
-        if category_input == category or category_input in category:
-            matched_category = category
-            break
+    matched_category = resolve_category(category_input)
     
     if not matched_category:
         categories_list = ", ".join(EXPENSE_CATEGORIES)
@@ -46,7 +43,7 @@ async def budget_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "budget_amount": budget_amount
     }
     
-    db.insert_budget_plan(budget_data)
+    await db.insert_budget_plan(budget_data)
     
     category_emoji = get_category_emoji(matched_category)
     message = f"✅ Đã đặt budget!\n{category_emoji} *{matched_category}*: {format_currency(budget_amount)}/tháng"
@@ -58,7 +55,7 @@ async def budget_list_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         return
     
     user_id = update.effective_user.id
-    budget_data = db.get_budget_plans(user_id)
+    budget_data = await db.get_budget_plans(user_id)
     
     if not budget_data.data:
         await send_formatted_message(update, "💰 Chưa có budget!\nDùng `/budget ăn uống 1.5m` để đặt budget")
@@ -82,28 +79,17 @@ async def budget_list_command(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     await send_formatted_message(update, budget_text)
 
-def calculate_remaining_budget(user_id, month_start):
-    """Calculate remaining budget for all categories - simplified"""
+def calculate_remaining_budget(snapshot):
+    """Calculate remaining budget for all categories from a MonthSnapshot"""
     try:
-        # Get budget plans
-        budget_data = db.get_budget_plans(user_id)
-        if not budget_data.data:
+        if not snapshot.budgets:
             return {}
         
-        # Get expenses
-        expenses_data = db.get_monthly_expenses(user_id, month_start)
-        
-        # Calculate spent by category
-        spent_by_category = {}
-        if expenses_data.data:
-            for expense in expenses_data.data:
-                category = expense["category"]
-                amount = float(expense["amount"])
-                spent_by_category[category] = spent_by_category.get(category, 0) + amount
+        spent_by_category = snapshot.expense_totals()
         
         # Calculate remaining
         remaining_budget = {}
-        for budget in budget_data.data:
+        for budget in snapshot.budgets:
             category = budget["category"]
             budget_amount = float(budget["budget_amount"])
             spent_amount = spent_by_category.get(category, 0)
@@ -120,14 +106,13 @@ def calculate_remaining_budget(user_id, month_start):
     except Exception:
         return {}
 
-def get_total_budget(user_id):
-    """Get total monthly budget for user - simplified"""
+def get_total_budget(snapshot):
+    """Get total monthly budget from a MonthSnapshot"""
     try:
-        budget_data = db.get_budget_plans(user_id)
-        if not budget_data.data:
+        if not snapshot.budgets:
             return 0
         
-        total = sum(float(budget["budget_amount"]) for budget in budget_data.data)
+        total = sum(float(budget["budget_amount"]) for budget in snapshot.budgets)
         return total
     except Exception:
         return 0
\ No newline at end of file
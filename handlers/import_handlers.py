@@ -0,0 +1,251 @@
+from telegram import Update
+from telegram.ext import ContextTypes
+from datetime import datetime
+import codecs
+import csv
+import logging
+import re
+import time
+
+from database import db
+from write_journal import write_journal
+from utils import check_authorization, send_formatted_message, parse_amount, format_currency, MessageBuilder
+from config import EXPENSE_CATEGORIES, ACCOUNT_DESCRIPTIONS, IMPORT_BATCH_SIZE, IMPORT_MAX_FILE_SIZE, get_account_for_category
+from text_matching import resolve_category
+
+# A CSV sent within this many seconds after /import is imported
+IMPORT_WINDOW = 600
+
+# Row errors listed in the reply (the rest are only counted)
+MAX_REPORTED_ERRORS = 10
+
+# Header names accepted for each column (matched lowercase, without surrounding spaces)
+IMPORT_COLUMNS = {
+    "date": ["date", "ngày", "ngay"],
+    "amount": ["amount", "số tiền", "so tien", "tiền", "tien"],
+    "description": ["description", "mô tả", "mo ta", "note", "ghi chú", "ghi chu"],
+    "category": ["category", "danh mục", "danh muc"]
+}
+
+DATE_FORMATS = ["%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d/%m/%y"]
+
+# "50,000" / "1.250.000" (thousand separators) -> digits only
+_GROUPED_NUMBER = re.compile(r"\d{1,3}([.,]\d{3})+")
+
+IMPORT_USAGE = f"""📥 *NHẬP CHI TIÊU TỪ CSV*
+
+Gửi file `.csv` (trong {IMPORT_WINDOW // 60} phút sau lệnh này, hoặc kèm chú thích `/import`) với các cột:
+`date,amount,description,category`
+
+VD:
+`2025-08-01,50k,bún bò,ăn uống`
+`02/08/2025,1.2m,sofa,công trình`
+
+💡 Ngày: `yyyy-mm-dd` hoặc `dd/mm/yyyy`
+📂 Danh mục: {', '.join(EXPENSE_CATEGORIES)}
+⚠️ Số dư tài khoản bị trừ theo tổng chi tiêu đã nhập."""
+
+async def import_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Start a CSV import: /import, then send the file"""
+    if not await check_authorization(update):
+        return
+    
+    context.user_data["pending_import"] = time.monotonic()
+    await send_formatted_message(update, IMPORT_USAGE)
+
+async def import_csv_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Import an uploaded CSV of expenses (after /import or with an /import caption)"""
+    if not await check_authorization(update):
+        return
+    
+    document = update.message.document
+    caption = (update.message.caption or "").strip().lower()
+    requested_at = context.user_data.pop("pending_import", None)
+    if not caption.startswith("/import") and (requested_at is None or time.monotonic() - requested_at > IMPORT_WINDOW):
+        await send_formatted_message(update, "💡 Muốn nhập chi tiêu từ file này? Dùng `/import` rồi gửi lại file.")
+        return
+    
+    if document.file_size and document.file_size > IMPORT_MAX_FILE_SIZE:
+        await send_formatted_message(update, f"⛔ File quá lớn (tối đa {IMPORT_MAX_FILE_SIZE // (1024 * 1024)}MB)")
+        return
+    
+    try:
+        telegram_file = await context.bot.get_file(document.file_id)
+        content = await telegram_file.download_as_bytearray()
+    except Exception as e:
+        logging.error(f"Import download error: {e}")
+        await send_formatted_message(update, "⛔ Không tải được file. Vui lòng thử lại.")
+        return
+    
+    await send_formatted_message(update, f"⏳ Đang nhập `{document.file_name or 'file.csv'}`...")
+    await _import_expenses(update, update.effective_user.id, content)
+
+def _iter_lines(content, chunk_size=64 * 1024):
+    """Decode the upload chunk by chunk into lines (UTF-8, with or without BOM)"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    for start in range(0, len(content), chunk_size):
+        pending += decoder.decode(bytes(content[start:start + chunk_size]))
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+def _column_positions(header):
+    """Map column -> index from a header row, or None when the row isn't a header"""
+    names = [cell.strip().lower() for cell in header]
+    positions = {}
+    for column, aliases in IMPORT_COLUMNS.items():
+        for index, name in enumerate(names):
+            if name in aliases:
+                positions[column] = index
+                break
+    if "amount" not in positions:
+        return None
+    return positions
+
+def _parse_import_date(text):
+    text = text.strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+def _parse_import_amount(text):
+    """parse_amount after dropping currency marks and thousand separators"""
+    text = text.strip().lower().replace(" ", "").replace("₫", "").replace("vnd", "").replace("đ", "")
+    if _GROUPED_NUMBER.fullmatch(text):
+        text = text.replace(",", "").replace(".", "")
+    else:
+        text = text.replace(",", ".")
+    return parse_amount(text)
+
+def _parse_row(row, positions, user_id):
+    """Build an expense row from a CSV row; returns (expense, error)"""
+    def cell(column):
+        index = positions.get(column)
+        return row[index].strip() if index is not None and index < len(row) else ""
+    
+    expense_date = _parse_import_date(cell("date"))
+    if expense_date is None:
+        return None, f"ngày không hợp lệ '{cell('date')}'"
+    
+    try:
+        amount = _parse_import_amount(cell("amount"))
+    except ValueError:
+        return None, f"số tiền không hợp lệ '{cell('amount')}'"
+    if amount <= 0:
+        return None, f"số tiền phải lớn hơn 0 '{cell('amount')}'"
+    
+    category_text = cell("category")
+    # No prefix/fuzzy guessing in bulk files - a typo is reported, not re-filed
+    category = resolve_category(category_text, exact=True) if category_text else None
+    if category not in EXPENSE_CATEGORIES:
+        return None, f"danh mục không hợp lệ '{category_text}'"
+    
+    return {
+        "user_id": user_id,
+        "amount": amount,
+        "description": cell("description") or category,
+        "category": category,
+        "date": expense_date.isoformat()
+    }, None
+
+async def _import_expenses(update, user_id, content):
+    """Stream-parse the CSV and insert it in batches, then settle balances once
+    
+    Rows are inserted IMPORT_BATCH_SIZE at a time (each batch also bumps its
+    monthly rollups). Per-account totals are summed while parsing and applied
+    in a single apply_account_deltas call at the end instead of one balance
+    write per row. Invalid rows are skipped and reported.
+    """
+    positions = {"date": 0, "amount": 1, "description": 2, "category": 3}
+    account_totals = {}
+    batch = []
+    errors = []
+    imported = 0
+    failed = False
+    
+    async def insert_batch(rows):
+        await db.insert_expenses(rows)
+        for expense in rows:
+            account_type = get_account_for_category(expense["category"])
+            account_totals[account_type] = account_totals.get(account_type, 0) + expense["amount"]
+        return len(rows)
+    
+    try:
+        reader = csv.reader(_iter_lines(content))
+        first_row = True
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            line_number = reader.line_num
+            if first_row:
+                first_row = False
+                header_positions = _column_positions(row)
+                if header_positions:
+                    positions = header_positions
+                    continue
+            
+            expense, error = _parse_row(row, positions, user_id)
+            if error:
+                errors.append((line_number, error))
+                continue
+            
+            batch.append(expense)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                imported += await insert_batch(batch)
+                batch = []
+        
+        if batch:
+            imported += await insert_batch(batch)
+    except Exception as e:
+        logging.error(f"Import error after {imported} rows: {e}")
+        failed = True
+    
+    # One balance write for the whole import; re-seeding after invalidate adds
+    # back any journaled deltas the database hasn't applied yet
+    new_balances = {}
+    if account_totals:
+        deltas = [{
+            "account_type": account_type,
+            "amount": -total,  # Negative for expense
+            "transaction_type": "expense",
+            "description": f"Import: {imported} expenses",
+            "reference_id": None
+        } for account_type, total in account_totals.items()]
+        try:
+            await db.apply_account_deltas(user_id, deltas)
+            write_journal.invalidate(user_id)
+            new_balances = await write_journal.balances(user_id)
+        except Exception as e:
+            logging.error(f"Import balance update error: {e}")
+            write_journal.invalidate(user_id)
+            failed = True
+    
+    async with MessageBuilder(update) as builder:
+        if failed:
+            builder.add(f"⚠️ *NHẬP CHƯA HOÀN TẤT* - đã lưu {imported} chi tiêu trước khi gặp lỗi")
+        elif imported:
+            builder.add(f"✅ *ĐÃ NHẬP {imported} CHI TIÊU*")
+        else:
+            builder.add("⛔ Không có dòng hợp lệ nào để nhập")
+        
+        for account_type, total in sorted(account_totals.items(), key=lambda item: -item[1]):
+            account_info = ACCOUNT_DESCRIPTIONS.get(account_type, {"emoji": "💳", "name": account_type.title()})
+            line = f"{account_info['emoji']} {account_info['name']}: -{format_currency(total)}"
+            if account_type in new_balances:
+                line += f" → `{format_currency(new_balances[account_type])}`"
+            builder.add(line)
+        
+        if errors:
+            builder.add(f"\n⚠️ *Bỏ qua {len(errors)} dòng:*")
+            for line_number, error in errors[:MAX_REPORTED_ERRORS]:
+                builder.add(f"• Dòng {line_number}: {error}")
+            if len(errors) > MAX_REPORTED_ERRORS:
+                builder.add(f"• ... và {len(errors) - MAX_REPORTED_ERRORS} dòng khác")
\ No newline at end of file
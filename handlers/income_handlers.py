@@ -2,7 +2,7 @@ from telegram import Update
 from telegram.ext import ContextTypes
 from datetime import datetime, date
 
-from database import db
+from write_journal import write_journal
 from utils import check_authorization, send_formatted_message, safe_parse_amount, format_currency
 from config import INCOME_TYPES, get_income_emoji, get_message
 
@@ -48,11 +48,9 @@ async def income_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "date": date.today().isoformat()
     }
     
-    income_result = db.insert_income(income_data)
-    income_id = income_result.data[0]["id"] if income_result.data else None
-    
-    # Process allocation
-    allocation_message = await _process_income_allocation(user_id, income_type, amount, description, income_id)
+    # Build allocation, then journal the income and its deltas together
+    deltas, allocation_message = await _build_income_allocation(user_id, income_type, amount, description)
+    await write_journal.append_income(income_data, deltas)
     
     # Response
     emoji = get_income_emoji(income_type)
@@ -65,70 +63,68 @@ async def income_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     await send_formatted_message(update, message)
 
-async def _process_income_allocation(user_id, income_type, amount, description, income_id):
-    """Process income allocation to accounts - USES CONSOLIDATED DB FUNCTIONS"""
+async def _build_income_allocation(user_id, income_type, amount, description):
+    """Build income allocation deltas; returns (deltas, message)"""
     
     if income_type == "construction":
-        # Construction income goes directly to construction account using CONSOLIDATED function
-        db.update_account_balance(
-            user_id, "construction", amount, "income_allocation", 
-            f"Construction income: {description}", income_id
-        )
+        # Construction income goes directly to construction account
+        deltas = [{
+            "account_type": "construction",
+            "amount": amount,
+            "transaction_type": "income_allocation",
+            "description": f"Construction income: {description}"
+        }]
         
-        return f"🗯️ *Đã thêm vào tài khoản xây dựng*: {format_currency(amount)}"
+        return deltas, f"🗯️ *Đã thêm vào tài khoản xây dựng*: {format_currency(amount)}"
     
     else:
         # Salary/random income gets allocated by percentages
         from .allocation_handlers import get_user_allocations, validate_allocations
         from config import ACCOUNT_DESCRIPTIONS
         
-        allocations = get_user_allocations(user_id)
+        allocations = await get_user_allocations(user_id)
         
         # Check if user has allocations set up
         if not allocations:
-            return f"⚠️ *Chưa thiết lập phân bổ!*\nDùng `/allocation` để thiết lập phân bổ thu nhập"
+            return [], f"⚠️ *Chưa thiết lập phân bổ!*\nDùng `/allocation` để thiết lập phân bổ thu nhập"
         
         # Validate allocations
         if not validate_allocations(allocations):
             total_pct = sum(allocations.values())
-            return f"⚠️ *Cảnh báo*: Tổng phân bổ = {total_pct}% (không phải 100%)\n*Vui lòng kiểm tra `/allocation`*"
+            return [], f"⚠️ *Cảnh báo*: Tổng phân bổ = {total_pct}% (không phải 100%)\n*Vui lòng kiểm tra `/allocation`*"
         
-        # Allocate to accounts using CONSOLIDATED database function
+        # Build all account shares (posted as one batched write when the journal flushes)
         allocation_details = []
+        deltas = []
         
         for account_type in ["need", "fun", "saving", "invest"]:
             percentage = allocations[account_type]
             if percentage > 0:
                 allocated_amount = amount * (percentage / 100)
                 
-                # Use CONSOLIDATED database function
-                db.update_account_balance(
-                    user_id, account_type, allocated_amount, "income_allocation",
-                    f"{description} ({percentage}%)", income_id
-                )
+                deltas.append({
+                    "account_type": account_type,
+                    "amount": allocated_amount,
+                    "transaction_type": "income_allocation",
+                    "description": f"{description} ({percentage}%)"
+                })
                 
                 account_info = ACCOUNT_DESCRIPTIONS[account_type]
                 allocation_details.append(f"{account_info['emoji']} *{account_info['name']}* ({percentage}%): {format_currency(allocated_amount)}")
         
-        return "💰 *PHÂN BỔ TÀI KHOẢN*:\n" + "\n".join(allocation_details)
+        return deltas, "💰 *PHÂN BỔ TÀI KHOẢN*:\n" + "\n".join(allocation_details)
 
-def calculate_income_by_type(user_id, month_start):
-    """Calculate income by construction vs general - simplified"""
+def calculate_income_by_type(snapshot):
+    """Calculate income by construction vs general from a MonthSnapshot"""
     try:
-        income_data = db.get_monthly_income(user_id, month_start)
-        
         construction_income = 0
         general_income = 0
         
-        if income_data.data:
-            for income in income_data.data:
-                amount = float(income["amount"])
-                income_type = income.get("income_type", "random")
-                
-                if income_type == "construction":
-                    construction_income += amount
-                else:  # salary or random
-                    general_income += amount
+        for income_type, amount in snapshot.income_totals().items():
+            if income_type == "construction":
+                construction_income += amount
+            else:  # salary or random
+                general_income += amount
         
         return {
             "construction": construction_income,
@@ -138,23 +134,17 @@ def calculate_income_by_type(user_id, month_start):
     except Exception:
         return {"construction": 0, "general": 0, "total": 0}
 
-def calculate_expenses_by_income_type(user_id, month_start):
-    """Calculate expenses by construction vs general categories - simplified"""
+def calculate_expenses_by_income_type(snapshot):
+    """Calculate expenses by construction vs general categories from a MonthSnapshot"""
     try:
-        expenses_data = db.get_monthly_expenses(user_id, month_start)
-        
         construction_expenses = 0
         general_expenses = 0
         
-        if expenses_data.data:
-            for expense in expenses_data.data:
-                amount = float(expense["amount"])
-                category = expense["category"]
-                
-                if category == "công trình":
-                    construction_expenses += amount
-                else:  # all other categories
-                    general_expenses += amount
+        for category, amount in snapshot.expense_totals().items():
+            if category == "công trình":
+                construction_expenses += amount
+            else:  # all other categories
+                general_expenses += amount
         
         return {
             "construction": construction_expenses,
@@ -7,13 +7,15 @@ import logging
 
 from database import db
 from utils import (
-    check_authorization, send_formatted_message, send_long_message,
+    check_authorization, send_formatted_message,
     get_current_month, get_month_date_range, get_month_display,
-    format_currency
+    format_currency, MessageBuilder
 )
 from config import (
     EXPENSE_CATEGORIES, get_category_emoji
 )
+from text_matching import resolve_category
+from .month_snapshot import MonthSnapshot
 
 def format_expense_item_simple(expense):
     """Simple expense formatting without templates"""
@@ -168,11 +170,11 @@ VD: `/list ăn uống`, `/list 15/08/2025`"""
 async def _show_category_expenses_for_month(update: Update, user_id: int, category: str, target_month: int, target_year: int):
     """Show all expenses for specific category in calendar month"""
     
-    # Get expenses for this category and calendar month
-    month_start, month_end = get_month_date_range(target_year, target_month)
-    expenses = db.get_expenses_by_category(user_id, category, month_start)
+    # Load the month once - category expenses, budget and balance all come from it
+    snapshot = await MonthSnapshot.load(user_id, target_year, target_month, include_rows=True)
+    category_expenses = snapshot.expenses_for_category(category)
     
-    if not expenses.data:
+    if not category_expenses:
         category_emoji = get_category_emoji(category)
         date_range = get_month_display(target_year, target_month)
         message = f"""📂 {category_emoji} *{category.upper()}*
@@ -186,16 +188,16 @@ Không có chi tiêu nào."""
     # Get budget and account info
     try:
         from .budget_handlers import calculate_remaining_budget
-        remaining_budget = calculate_remaining_budget(user_id, month_start)
+        remaining_budget = calculate_remaining_budget(snapshot)
     except ImportError:
         remaining_budget = {}
     
     from config import get_account_for_category
     account_type = get_account_for_category(category)
-    account_balance = db.get_account_balance(user_id, account_type)
+    account_balance = snapshot.account_balance(account_type)
     
     # Calculate total spent
-    total_spent = sum(float(expense["amount"]) for expense in expenses.data)
+    total_spent = sum(float(expense["amount"]) for expense in category_expenses)
     
     # Budget status (detailed)
     budget_info = ""
@@ -224,28 +226,29 @@ Không có chi tiêu nào."""
         budget_info = f"\n💡 *Chưa đặt budget cho {category}*\nDùng `/budget {category} [số tiền]` để đặt budget"
     
     # Sort expenses by date (newest first)
-    sorted_expenses = sorted(expenses.data, key=lambda x: x["date"], reverse=True)
-    expense_lines = [format_expense_item_simple(expense) for expense in sorted_expenses]
+    sorted_expenses = sorted(category_expenses, key=lambda x: x["date"], reverse=True)
     
     category_emoji = get_category_emoji(category)
     date_range = get_month_display(target_year, target_month)
     
-    message = f"""{category_emoji} *{category.upper()}*
+    async with MessageBuilder(update) as message:
+        message.add(f"""{category_emoji} *{category.upper()}*
 
 📅 {date_range}
 💳 Tài khoản: `{format_currency(account_balance)}`{budget_info}
-
-{chr(10).join(expense_lines)}
-
-💰 Tổng: `{format_currency(total_spent)}` ({len(sorted_expenses)} giao dịch)"""
-    
-    await send_long_message(update, message)
+""")
+        
+        # Long months go out chunk by chunk while the rest is formatted
+        for expense in sorted_expenses:
+            message.add(format_expense_item_simple(expense))
+        
+        message.add(f"\n💰 Tổng: `{format_currency(total_spent)}` ({len(sorted_expenses)} giao dịch)")
 
 async def _show_all_expenses_for_date(update: Update, user_id: int, target_date: date):
     """Show all expenses for a specific date"""
     
     # Get all expenses for the target date
-    expenses_data = db.supabase.table("expenses").select("*").eq("user_id", user_id).eq("date", target_date.isoformat()).execute()
+    expenses_data = await db.get_expenses_by_date(user_id, target_date)
     
     formatted_date = target_date.strftime("%d/%m/%Y")
     weekday = target_date.strftime("%A")
@@ -273,37 +276,34 @@ Không có chi tiêu nào."""
         total_day += amount
     
     # Build message
-    message = f"""📅 *{formatted_date} ({vn_weekday})*
-
-"""
-    
-    # Sort categories by total spending
-    category_totals = {cat: sum(float(exp["amount"]) for exp in items) 
-                      for cat, items in expenses_by_category.items()}
-    sorted_categories = sorted(category_totals.items(), key=lambda x: x[1], reverse=True)
-    
-    for category, category_total in sorted_categories:
-        category_emoji = get_category_emoji(category)
+    async with MessageBuilder(update) as message:
+        message.add(f"📅 *{formatted_date} ({vn_weekday})*\n")
         
-        message += f"{category_emoji} *{category}* `{format_currency(category_total)}`\n"
+        # Sort categories by total spending
+        category_totals = {cat: sum(float(exp["amount"]) for exp in items) 
+                          for cat, items in expenses_by_category.items()}
+        sorted_categories = sorted(category_totals.items(), key=lambda x: x[1], reverse=True)
         
-        # Show items for this category
-        items = sorted(expenses_by_category[category], key=lambda x: x["id"])
-        for item in items:
-            description = item["description"]
-            amount = float(item["amount"])
-            message += f"• {description} `{format_currency(amount)}`\n"
-        message += "\n"
-    
-    message += f"💰 Tổng: `{format_currency(total_day)}` ({len(expenses_data.data)} giao dịch)"
-    
-    await send_formatted_message(update, message)
+        for category, category_total in sorted_categories:
+            category_emoji = get_category_emoji(category)
+            
+            message.add(f"{category_emoji} *{category}* `{format_currency(category_total)}`")
+            
+            # Show items for this category
+            items = sorted(expenses_by_category[category], key=lambda x: x["id"])
+            for item in items:
+                description = item["description"]
+                amount = float(item["amount"])
+                message.add(f"• {description} `{format_currency(amount)}`")
+            message.add()
+        
+        message.add(f"💰 Tổng: `{format_currency(total_day)}` ({len(expenses_data.data)} giao dịch)")
 
 async def _show_category_expenses_for_date(update: Update, user_id: int, category: str, target_date: date):
     """Show expenses for specific category on specific date"""
     
     # Get expenses for this category and date
-    expenses_data = db.supabase.table("expenses").select("*").eq("user_id", user_id).eq("category", category).eq("date", target_date.isoformat()).execute()
+    expenses_data = await db.get_expenses_by_date(user_id, target_date, category)
     
     formatted_date = target_date.strftime("%d/%m/%Y")
     weekday = target_date.strftime("%A") 
@@ -327,29 +327,26 @@ Không có chi tiêu nào."""
     total_spent = sum(float(expense["amount"]) for expense in expenses_data.data)
     sorted_expenses = sorted(expenses_data.data, key=lambda x: x["id"])
     
-    message = f"""{category_emoji} *{category.upper()}*
+    async with MessageBuilder(update) as message:
+        message.add(f"""{category_emoji} *{category.upper()}*
 
 📅 {formatted_date} ({vn_weekday})
-
-"""
-    
-    for expense in sorted_expenses:
-        description = expense["description"]
-        amount = float(expense["amount"])
-        message += f"• {description} `{format_currency(amount)}`\n"
-    
-    message += f"\n💰 Tổng: `{format_currency(total_spent)}` ({len(sorted_expenses)} giao dịch)"
-    
-    await send_formatted_message(update, message)
+""")
+        
+        for expense in sorted_expenses:
+            description = expense["description"]
+            amount = float(expense["amount"])
+            message.add(f"• {description} `{format_currency(amount)}`")
+        
+        message.add(f"\n💰 Tổng: `{format_currency(total_spent)}` ({len(sorted_expenses)} giao dịch)")
 
 async def _show_all_categories_expenses(update: Update, user_id: int):
     """Show overview - MUCH more concise"""
     target_month, target_year = get_current_month()
-    month_start, month_end = get_month_date_range(target_year, target_month)
     
-    expenses = db.get_monthly_expenses(user_id, month_start)
+    snapshot = await MonthSnapshot.load(user_id, target_year, target_month, include_rows=True)
     
-    if not expenses.data:
+    if not snapshot.expenses:
         date_range = get_month_display(target_year, target_month)
         message = f"""📋 Tháng {target_month}/{target_year}
 📅 {date_range}
@@ -361,168 +358,118 @@ Chưa có chi tiêu nào."""
     # Get required data with error handling
     try:
         from .budget_handlers import calculate_remaining_budget, get_total_budget
-        remaining_budget = calculate_remaining_budget(user_id, month_start)
-        total_budget = get_total_budget(user_id)
+        remaining_budget = calculate_remaining_budget(snapshot)
+        total_budget = get_total_budget(snapshot)
     except ImportError:
         remaining_budget = {}
         total_budget = 0
     
     try:
         from .wishlist_handlers import get_wishlist_priority_sums
-        wishlist_sums = get_wishlist_priority_sums(user_id)
+        wishlist_sums = get_wishlist_priority_sums(snapshot)
     except ImportError:
         wishlist_sums = {"level1": 0, "level2": 0, "level1_and_2": 0}
     
     try:
         from .income_handlers import calculate_income_by_type, calculate_expenses_by_income_type
-        income_breakdown = calculate_income_by_type(user_id, month_start)
-        expense_breakdown = calculate_expenses_by_income_type(user_id, month_start)
+        income_breakdown = calculate_income_by_type(snapshot)
+        expense_breakdown = calculate_expenses_by_income_type(snapshot)
     except ImportError:
         income_breakdown = {"total": 0, "construction": 0, "general": 0}
         expense_breakdown = {"total": 0, "construction": 0, "general": 0}
     
-    # Get account balances
-    account_balances = {}
-    all_account_types = ["need", "fun", "construction", "saving", "invest"]
-    
-    accounts_data = db.get_accounts(user_id)
-    if not accounts_data.data:
-        # Import from account_handlers (SINGLE SOURCE - removed duplicate)
-        from .account_handlers import _initialize_all_accounts
-        await _initialize_all_accounts(user_id)
-    
-    for account_type in all_account_types:
-        account_balances[account_type] = db.get_account_balance(user_id, account_type)
+    # Account balances (missing accounts were created while loading the snapshot)
+    account_balances = snapshot.balances
 
     # Group expenses by category
     expenses_by_category = defaultdict(list)
     total_month = 0
     
-    for expense in expenses.data:
+    for expense in snapshot.expenses:
         category = expense["category"]
         amount = float(expense["amount"])
         expenses_by_category[category].append(expense)
         total_month += amount
     
-    # Build categories content - FIXED STRUCTURE
-    categories_content = []
-    category_totals = {cat: sum(float(exp["amount"]) for exp in items) 
-                      for cat, items in expenses_by_category.items()}
-    
-    sorted_categories = sorted(category_totals.items(), key=lambda x: x[1], reverse=True)
+    date_range = get_month_display(target_year, target_month)
     
-    for category, category_total in sorted_categories:
-        category_emoji = get_category_emoji(category)
+    async with MessageBuilder(update) as message:
+        message.add(f"""📋 *THÁNG {target_month}/{target_year}*
+📅 {date_range}
+""")
         
-        # Build budget info for this category
-        budget_text = ""
-        if category in remaining_budget:
-            budget_data = remaining_budget[category]
-            budget_amount = budget_data["budget"]
-            spent_amount = budget_data["spent"]
-            remaining = budget_data["remaining"]
+        # Build categories content - FIXED STRUCTURE
+        category_totals = {cat: sum(float(exp["amount"]) for exp in items) 
+                          for cat, items in expenses_by_category.items()}
+        
+        sorted_categories = sorted(category_totals.items(), key=lambda x: x[1], reverse=True)
+        
+        for category, category_total in sorted_categories:
+            category_emoji = get_category_emoji(category)
             
-            if remaining >= 0:
-                budget_text = f"\n  💰 Budget: `{format_currency(budget_amount)}` | Dùng: `{format_currency(spent_amount)}` | Còn: `{format_currency(remaining)}`"
-            else:
-                budget_text = f"\n  💰 Budget: `{format_currency(budget_amount)}` | Dùng: `{format_currency(spent_amount)}` | ⚠️ Vượt: `{format_currency(abs(remaining))}`"
+            # Build budget info for this category
+            budget_text = ""
+            if category in remaining_budget:
+                budget_data = remaining_budget[category]
+                budget_amount = budget_data["budget"]
+                spent_amount = budget_data["spent"]
+                remaining = budget_data["remaining"]
+                
+                if remaining >= 0:
+                    budget_text = f"\n  💰 Budget: `{format_currency(budget_amount)}` | Dùng: `{format_currency(spent_amount)}` | Còn: `{format_currency(remaining)}`"
+                else:
+                    budget_text = f"\n  💰 Budget: `{format_currency(budget_amount)}` | Dùng: `{format_currency(spent_amount)}` | ⚠️ Vượt: `{format_currency(abs(remaining))}`"
+            
+            # Category header on its own line
+            message.add(f"{category_emoji} *{category}* `{format_currency(category_total)}`{budget_text}")
+            
+            # Show only top 3 items
+            items = sorted(expenses_by_category[category], key=lambda x: x["date"], reverse=True)[:3]
+            for item in items:
+                message.add(f"  {format_expense_item_simple(item)}")
+            
+            # Add count if more items - on separate line
+            if len(expenses_by_category[category]) > 3:
+                remaining_count = len(expenses_by_category[category]) - 3
+                message.add(f"  _... +{remaining_count} giao dịch_")
         
-        # Category header on its own line
-        header = f"{category_emoji} *{category}* `{format_currency(category_total)}`{budget_text}"
+        # Financial summary - CONCISE
+        total_income = income_breakdown["total"]
+        net_savings = total_income - total_month
         
-        # Show only top 3 items
-        items = sorted(expenses_by_category[category], key=lambda x: x["date"], reverse=True)[:3]
-        expense_items = []
+        # Account summary - SIMPLE
+        spending_total = account_balances.get('need', 0) + account_balances.get('fun', 0)
         
-        for item in items:
-            expense_items.append(f"  {format_expense_item_simple(item)}")
+        # Wishlist summary - BRIEF
+        wishlist_info = ""
+        if wishlist_sums["level1"] > 0:
+            after_level1 = net_savings - wishlist_sums["level1"]
+            if after_level1 >= 0:
+                wishlist_info = f"\n🔒 Sau Level 1: `{format_currency(after_level1)}`"
+            else:
+                wishlist_info = f"\n🔒 Thiếu Level 1: `{format_currency(abs(after_level1))}`"
         
-        # Add count if more items - on separate line
-        if len(expenses_by_category[category]) > 3:
-            remaining_count = len(expenses_by_category[category]) - 3
-            expense_items.append(f"  _... +{remaining_count} giao dịch_")
+        # Budget summary - BRIEF
+        budget_info = ""
+        if total_budget > 0:
+            budget_remaining = total_budget - total_month
+            if budget_remaining >= 0:
+                budget_info = f"\n💰 Budget còn: `{format_currency(budget_remaining)}`"
+            else:
+                budget_info = f"\n⚠️ Vượt budget: `{format_currency(abs(budget_remaining))}`"
         
-        # Combine header with items
-        category_section = header + "\n" + "\n".join(expense_items)
-        categories_content.append(category_section)
-    
-    # Financial summary - CONCISE
-    total_income = income_breakdown["total"]
-    net_savings = total_income - total_month
-    
-    # Account summary - SIMPLE
-    spending_total = account_balances.get('need', 0) + account_balances.get('fun', 0)
-    
-    # Wishlist summary - BRIEF
-    wishlist_info = ""
-    if wishlist_sums["level1"] > 0:
-        after_level1 = net_savings - wishlist_sums["level1"]
-        if after_level1 >= 0:
-            wishlist_info = f"\n🔒 Sau Level 1: `{format_currency(after_level1)}`"
-        else:
-            wishlist_info = f"\n🔒 Thiếu Level 1: `{format_currency(abs(after_level1))}`"
-    
-    # Budget summary - BRIEF
-    budget_info = ""
-    if total_budget > 0:
-        budget_remaining = total_budget - total_month
-        if budget_remaining >= 0:
-            budget_info = f"\n💰 Budget còn: `{format_currency(budget_remaining)}`"
-        else:
-            budget_info = f"\n⚠️ Vượt budget: `{format_currency(abs(budget_remaining))}`"
-    
-    date_range = get_month_display(target_year, target_month)
-    
-    message = f"""📋 *THÁNG {target_month}/{target_year}*
-📅 {date_range}
-
-{chr(10).join(categories_content)}
-
+        message.add(f"""
 💰 *TỔNG: {format_currency(total_month)}*
 
 💵 Thu: `{format_currency(total_income)}`
 📈 Tiết kiệm: `{format_currency(net_savings)}`{wishlist_info}{budget_info}
 
 💳 Tài khoản tiêu dùng: `{format_currency(spending_total)}`
-💰 Tiết kiệm: `{format_currency(account_balances.get('saving', 0))}`"""
-    
-    await send_long_message(update, message)
+💰 Tiết kiệm: `{format_currency(account_balances.get('saving', 0))}`""")
 
 def _find_matching_category(category_input: str) -> str:
-    """Find matching category - simplified"""
-    from difflib import get_close_matches
-    
+    """Find matching category (accents optional, aliases and prefixes accepted)"""
     if not category_input:
         return None
     
-    category_input = category_input.strip().lower()
-    
-    # Try exact match first
-    if category_input in EXPENSE_CATEGORIES:
-        return category_input
-    
-    # Try fuzzy matching
-    try:
-        close_matches = get_close_matches(category_input, EXPENSE_CATEGORIES, n=1, cutoff=0.4)
-        if close_matches:
-            return close_matches[0]
-    except Exception:
-        pass
-    
-    # Try partial matching
-    for category in EXPENSE_CATEGORIES:
-        if category_input in category or category in category_input:
-            return category
-    
-    # Try common variations
-    variations = {
-        "an": "ăn uống", "anuong": "ăn uống", "food": "ăn uống",
-        "meo": "mèo", "cat": "mèo",
-        "congtrinh": "công trình", "construction": "công trình",
-        "dichuyen": "di chuyển", "transport": "di chuyển",
-        "hoadon": "hóa đơn", "bills": "hóa đơn",
-        "canhan": "cá nhân", "personal": "cá nhân",
-        "linhtinh": "linh tinh", "misc": "linh tinh"
-    }
-    
-    return variations.get(category_input)
\ No newline at end of file
+    return resolve_category(category_input)
\ No newline at end of file
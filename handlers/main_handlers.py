@@ -4,14 +4,15 @@ from telegram import Update
 from telegram.ext import ContextTypes
 
 from database import db
-from ai_parser import parse_message_with_gemini, generate_monthly_summary
+from write_journal import write_journal
+from ai_parser import parse_message, generate_monthly_summary
 from utils import (
     check_authorization, send_formatted_message, send_long_message,
     parse_amount, safe_parse_amount, parse_date_argument, get_month_date_range,
     get_current_month, get_month_display, format_currency  # UPDATED IMPORT
 )
 from config import (
-    get_message, get_template, DEFAULT_SUBSCRIPTION_CATEGORY
+    get_message, get_template
 )
 
 # Set up logging
@@ -28,7 +29,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "username": update.effective_user.username
     }
     
-    db.register_user(user_data)
+    await db.register_user(user_data)
     await send_formatted_message(update, get_message("welcome"))
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -44,8 +45,8 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if await handle_month_end_confirmation(update, context, message_text):
         return  # Message was handled as month-end confirmation
     
-    # Parse with Gemini for regular expense processing
-    parsed_data = parse_message_with_gemini(message_text, user_id)
+    # Parse locally when possible, falling back to Gemini
+    parsed_data = await parse_message(message_text, user_id)
     
     responses = []
     message_type = parsed_data.get("type", "unknown")
@@ -71,7 +72,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("\n".join(responses))
         
 async def _process_expense_simple(user_id, amount, description, category):
-    """Simple expense processing - USES CONSOLIDATED DATABASE FUNCTION"""
+    """Simple expense processing - journaled locally, flushed to the database in the background"""
     from config import get_account_for_category, get_account_emoji_enhanced, get_account_name_enhanced, get_category_emoji
     from datetime import date
     
@@ -87,14 +88,9 @@ async def _process_expense_simple(user_id, amount, description, category):
         "date": date.today().isoformat()
     }
     
-    expense_result = db.insert_expense(expense_data)
-    expense_id = expense_result.data[0]["id"] if expense_result.data else None
-    
-    # Deduct from account using CONSOLIDATED database function (allow negative balance - no validation)
-    result, new_balance = db.update_account_balance(
-        user_id, account_type, -amount,  # Negative for expense
-        "expense", f"Expense: {description}", expense_id
-    )
+    # Journal the expense and its deduction (allow negative balance - no validation);
+    # the balance comes from the journal's local copy, no database round-trip
+    new_balance = await write_journal.append_expense(expense_data, account_type, f"Expense: {description}")
     
     # Get display info
     account_emoji = get_account_emoji_enhanced(account_type)
@@ -129,7 +125,7 @@ async def savings_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     user_id = update.effective_user.id
-    savings_data = db.get_savings(user_id)
+    savings_data = await db.get_savings(user_id)
     
     if savings_data.data:
         current_savings = float(savings_data.data[0]["current_amount"])
@@ -165,11 +161,25 @@ async def edit_savings_command(update: Update, context: ContextTypes.DEFAULT_TYP
         "last_updated": datetime.now().isoformat()
     }
     
-    db.upsert_savings(savings_data)
+    await db.upsert_savings(savings_data)
     
     message = get_template("savings_update", amount=format_currency(new_amount))
     await send_formatted_message(update, message)
 
+async def rebuild_rollups_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Recompute monthly totals from raw expenses/income: /rebuildrollups"""
+    if not await check_authorization(update):
+        return
+    
+    user_id = update.effective_user.id
+    
+    try:
+        await db.rebuild_monthly_rollups(user_id)
+        await send_formatted_message(update, "✅ Đã tính lại tổng chi tiêu/thu nhập theo tháng!")
+    except Exception as e:
+        logging.error(f"Error rebuilding rollups for user {user_id}: {e}")
+        await send_formatted_message(update, "❌ Không thể tính lại tổng theo tháng. Thử lại sau!")
+
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show quick help in Vietnamese"""
     if not await check_authorization(update):
@@ -195,25 +205,20 @@ async def monthly_summary(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Use current calendar month
         target_month, target_year = get_current_month()
     
-    # Get data for the target calendar month
-    month_start, month_end = get_month_date_range(target_year, target_month)
-    expenses = db.get_monthly_expenses(user_id, month_start)
-    income = db.get_monthly_income(user_id, month_start)
-    
-    # Auto-add subscriptions on 1st
-    subscription_expenses = await _add_monthly_subscriptions(user_id, target_year, target_month, month_start, expenses)
-    if subscription_expenses:
-        expenses = db.get_monthly_expenses(user_id, month_start)
+    # Get all data for the target calendar month in one concurrent load
+    # (subscriptions are posted by the post_monthly_subscriptions job, not here)
+    from .month_snapshot import MonthSnapshot
+    snapshot = await MonthSnapshot.load(user_id, target_year, target_month, include_subscriptions=True)
     
     # Calculate breakdown
     from .budget_handlers import get_total_budget
     from .income_handlers import calculate_income_by_type, calculate_expenses_by_income_type
     from .wishlist_handlers import get_wishlist_priority_sums
     
-    total_budget = get_total_budget(user_id)
-    income_breakdown = calculate_income_by_type(user_id, month_start)
-    expense_breakdown = calculate_expenses_by_income_type(user_id, month_start)
-    wishlist_sums = get_wishlist_priority_sums(user_id)
+    total_budget = get_total_budget(snapshot)
+    income_breakdown = calculate_income_by_type(snapshot)
+    expense_breakdown = calculate_expenses_by_income_type(snapshot)
+    wishlist_sums = get_wishlist_priority_sums(snapshot)
     
     total_expenses = expense_breakdown["total"]
     total_income = income_breakdown["total"]
@@ -227,10 +232,11 @@ async def monthly_summary(update: Update, context: ContextTypes.DEFAULT_TYPE):
     budget_remaining = total_budget - total_expenses if total_budget > 0 else 0
     money_after_all = budget_remaining - wishlist_sums["level1_and_2"]
     
-    # Format subscription info
+    # Format subscription info (the subscription expenses posted for this month)
     subscription_info = ""
-    if subscription_expenses:
-        sub_names = [sub["description"].replace(" (subscription)", "") for sub in subscription_expenses]
+    if snapshot.subscription_expenses:
+        from .month_snapshot import SUBSCRIPTION_SUFFIX
+        sub_names = [expense["description"][:-len(SUBSCRIPTION_SUFFIX)] for expense in snapshot.subscription_expenses]
         subscription_info = f"\n📄 _Đã thêm subscriptions: {', '.join(sub_names)}_"
     
     # Format budget info
@@ -298,42 +304,8 @@ async def monthly_summary(update: Update, context: ContextTypes.DEFAULT_TYPE):
         general_expense=format_currency(expense_breakdown["general"]),
         general_net=format_currency(income_breakdown["general"] - expense_breakdown["general"]),
         budget_info=budget_info,
-        expense_count=len(expenses.data),
-        income_count=len(income.data)
+        expense_count=snapshot.expense_count(),
+        income_count=snapshot.income_count()
     )
     
-    await send_formatted_message(update, message)
-
-async def _add_monthly_subscriptions(user_id, target_year, target_month, month_start, expenses):
-    """Add monthly subscriptions to expenses if not already added - uses inline date check"""
-    # Inline month start check (previously is_month_start_today function)
-    is_month_start_today = datetime.now().day == 1
-    
-    subscriptions = db.get_subscriptions(user_id)
-    subscription_expenses = []
-    
-    if subscriptions.data:
-        for subscription in subscriptions.data:
-            # Check if subscription expense already exists for this calendar month
-            existing_sub_expense = None
-            for expense in expenses.data:
-                if (expense["description"] == f"{subscription['service_name']} (subscription)" and
-                    expense["date"] >= month_start.isoformat() and
-                    expense["date"] <= month_start.replace(day=31).isoformat()):
-                    existing_sub_expense = expense
-                    break
-            
-            # If not exists, add it (using month_start which is the 1st)
-            if not existing_sub_expense:
-                subscription_expense = {
-                    "user_id": user_id,
-                    "amount": subscription["amount"],
-                    "description": f"{subscription['service_name']} (subscription)",
-                    "category": DEFAULT_SUBSCRIPTION_CATEGORY,
-                    "date": month_start.isoformat()  # This is the 1st of the month
-                }
-                
-                db.insert_expense(subscription_expense)
-                subscription_expenses.append(subscription_expense)
-    
-    return subscription_expenses
\ No newline at end of file
+    await send_formatted_message(update, message)
\ No newline at end of file
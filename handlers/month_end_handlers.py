@@ -4,9 +4,10 @@ from datetime import datetime, date
 import logging
 
 from database import db
+from write_journal import write_journal
 from utils import (
     check_authorization, send_formatted_message, format_currency,
-    get_current_month, get_month_date_range, get_month_display
+    get_current_month, get_month_date_range, get_month_display, MessageBuilder
 )
 from config import ACCOUNT_DESCRIPTIONS
 
@@ -21,7 +22,7 @@ async def endmonth_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     current_month, current_year = get_current_month()
     
     # Check if calendar month is already closed - USES CONSOLIDATED FUNCTION
-    existing_closure = db.check_monthly_closure(user_id, current_year, current_month)
+    existing_closure = await db.check_monthly_closure(user_id, current_year, current_month)
     if existing_closure.data:
         closure_date = existing_closure.data[0]["created_at"][:10]
         date_range = get_month_display(current_year, current_month)
@@ -32,21 +33,18 @@ async def endmonth_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"💡 *Xem lịch sử*: `/monthhistory`")
         return
     
-    # Get current account balances
-    accounts_data = db.get_accounts(user_id)
-    if not accounts_data.data:
+    # Get current account balances (incl. journaled writes the database hasn't seen yet)
+    balances = await write_journal.balances(user_id)
+    if not balances:
         await send_formatted_message(update, "⛔ Không tìm thấy tài khoản. Vui lòng thử lại.")
         return
     
-    # Build accounts dict
-    accounts_dict = {acc["account_type"]: acc for acc in accounts_data.data}
-    
     # Calculate month-end summary
-    need_balance = float(accounts_dict.get("need", {}).get("current_balance", 0))
-    fun_balance = float(accounts_dict.get("fun", {}).get("current_balance", 0))
-    saving_balance = float(accounts_dict.get("saving", {}).get("current_balance", 0))
-    invest_balance = float(accounts_dict.get("invest", {}).get("current_balance", 0))
-    construction_balance = float(accounts_dict.get("construction", {}).get("current_balance", 0))
+    need_balance = balances.get("need", 0.0)
+    fun_balance = balances.get("fun", 0.0)
+    saving_balance = balances.get("saving", 0.0)
+    invest_balance = balances.get("invest", 0.0)
+    construction_balance = balances.get("construction", 0.0)
     
     # Calculate transfer amounts
     excess_need = max(0, need_balance)  # All remaining need money goes to savings
@@ -56,8 +54,8 @@ async def endmonth_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # Get monthly financial summary for calendar month
     month_start, month_end = get_month_date_range(current_year, current_month)
-    monthly_expenses = db.get_monthly_expenses(user_id, month_start)
-    monthly_income = db.get_monthly_income(user_id, month_start)
+    monthly_expenses = await db.get_monthly_expenses(user_id, month_start, month_end)
+    monthly_income = await db.get_monthly_income(user_id, month_start, month_end)
     
     total_expenses = sum(float(exp["amount"]) for exp in monthly_expenses.data) if monthly_expenses.data else 0
     total_income = sum(float(inc["amount"]) for inc in monthly_income.data) if monthly_income.data else 0
@@ -157,11 +155,15 @@ async def _execute_month_end_processing(user_id: int, pending_data: dict):
     try:
         month = pending_data['month']
         year = pending_data['year']
-        need_balance = pending_data['need_balance']
-        fun_balance = pending_data['fun_balance']
-        saving_balance = pending_data['saving_balance']
-        invest_balance = pending_data['invest_balance']
-        construction_balance = pending_data['construction_balance']
+        
+        # Re-read balances (incl. journaled writes): expenses logged between
+        # /endmonth and CONFIRM must be reset too, so need/fun really end at 0
+        balances = await write_journal.balances(user_id)
+        need_balance = balances.get("need", 0.0)
+        fun_balance = balances.get("fun", 0.0)
+        saving_balance = balances.get("saving", 0.0)
+        invest_balance = balances.get("invest", 0.0)
+        construction_balance = balances.get("construction", 0.0)
         
         # Convert user_id to string for database
         user_id_str = str(user_id)
@@ -181,7 +183,7 @@ async def _execute_month_end_processing(user_id: int, pending_data: dict):
         }
         
         # Insert balance history
-        db.supabase.table("account_balance_history").insert(balance_history_data).execute()
+        await db.insert_account_balance_history(balance_history_data)
         logging.info(f"Saved balance history for {month}/{year}")
         
         # 2. Calculate transfers (only positive amounts go to savings)
@@ -205,7 +207,7 @@ async def _execute_month_end_processing(user_id: int, pending_data: dict):
             "transferred_to_savings": float(total_transfer)
         }
         
-        closure_result = db.insert_monthly_closure(closure_data)
+        closure_result = await db.insert_monthly_closure(closure_data)
         closure_id = closure_result.data[0]["id"] if closure_result.data else None
         logging.info(f"Created monthly closure with ID: {closure_id}")
         
@@ -213,7 +215,7 @@ async def _execute_month_end_processing(user_id: int, pending_data: dict):
         
         # Reset need account to 0
         if need_balance != 0:
-            db.update_account_balance(
+            await db.update_account_balance(
                 user_id, "need", -need_balance, "month_end_reset",
                 f"Month-end reset: {format_currency(need_balance)} → 0đ", closure_id
             )
@@ -221,7 +223,7 @@ async def _execute_month_end_processing(user_id: int, pending_data: dict):
         
         # Reset fun account to 0  
         if fun_balance != 0:
-            db.update_account_balance(
+            await db.update_account_balance(
                 user_id, "fun", -fun_balance, "month_end_reset",
                 f"Month-end reset: {format_currency(fun_balance)} → 0đ", closure_id
             )
@@ -229,18 +231,20 @@ async def _execute_month_end_processing(user_id: int, pending_data: dict):
         
         # 5. Transfer positive amounts to savings (if any)
         if total_transfer > 0:
-            db.update_account_balance(
+            await db.update_account_balance(
                 user_id, "saving", total_transfer, "month_end_transfer",
                 f"Month-end transfer: {format_currency(total_transfer)} from need+fun", closure_id
             )
             logging.info(f"Transferred {total_transfer} to savings")
         
         # 6. Get final balances
+        write_journal.invalidate(user_id)
         final_need_balance = 0  # Always 0 after reset
         final_fun_balance = 0   # Always 0 after reset
-        final_saving_balance = db.get_account_balance(user_id, "saving")
-        final_invest_balance = db.get_account_balance(user_id, "invest")
-        final_construction_balance = db.get_account_balance(user_id, "construction")
+        final_balances = await write_journal.balances(user_id)
+        final_saving_balance = final_balances["saving"]
+        final_invest_balance = final_balances["invest"]
+        final_construction_balance = final_balances["construction"]
         
         # 7. Build success message
         date_range = get_month_display(year, month)
@@ -305,10 +309,9 @@ async def balancehistory_command(update: Update, context: ContextTypes.DEFAULT_T
         return
     
     user_id = update.effective_user.id
-    user_id_str = str(user_id)
     
     # Get past 6 months of balance history
-    history_data = db.supabase.table("account_balance_history").select("*").eq("user_id", user_id_str).order("year", desc=True).order("month", desc=True).limit(6).execute()
+    history_data = await db.get_balance_history(user_id, limit=6)
     
     if not history_data.data:
         await send_formatted_message(update, 
@@ -316,32 +319,31 @@ async def balancehistory_command(update: Update, context: ContextTypes.DEFAULT_T
             "💡 Dùng `/endmonth` để đóng tháng và lưu lịch sử")
         return
     
-    message = "📊 **LỊCH SỬ SỐ DƯ TÀI KHOẢN**\n\n"
-    
-    for record in history_data.data:
-        month = record["month"]
-        year = record["year"]
-        date_range = get_month_display(year, month)
-        
-        need_bal = float(record.get("need_balance", 0))
-        fun_bal = float(record.get("fun_balance", 0))
-        saving_bal = float(record.get("saving_balance", 0))
-        invest_bal = float(record.get("invest_balance", 0))
-        construction_bal = float(record.get("construction_balance", 0))
+    async with MessageBuilder(update) as message:
+        message.add("📊 **LỊCH SỬ SỐ DƯ TÀI KHOẢN**\n")
         
-        total_bal = need_bal + fun_bal + saving_bal + invest_bal + construction_bal
+        for record in history_data.data:
+            month = record["month"]
+            year = record["year"]
+            date_range = get_month_display(year, month)
+            
+            need_bal = float(record.get("need_balance", 0))
+            fun_bal = float(record.get("fun_balance", 0))
+            saving_bal = float(record.get("saving_balance", 0))
+            invest_bal = float(record.get("invest_balance", 0))
+            construction_bal = float(record.get("construction_balance", 0))
+            
+            total_bal = need_bal + fun_bal + saving_bal + invest_bal + construction_bal
+            
+            message.add(f"📅 **THÁNG {month}/{year}** _{date_range}_")
+            message.add(f"🏠 Thiết yếu: `{format_currency(need_bal)}`")
+            message.add(f"🎮 Giải trí: `{format_currency(fun_bal)}`")
+            message.add(f"💰 Tiết kiệm: `{format_currency(saving_bal)}`")
+            message.add(f"📈 Đầu tư: `{format_currency(invest_bal)}`")
+            message.add(f"🏗️ Xây dựng: `{format_currency(construction_bal)}`")
+            message.add(f"💎 **Tổng tài sản:** `{format_currency(total_bal)}`\n")
         
-        message += f"📅 **THÁNG {month}/{year}** _{date_range}_\n"
-        message += f"🏠 Thiết yếu: `{format_currency(need_bal)}`\n"
-        message += f"🎮 Giải trí: `{format_currency(fun_bal)}`\n"
-        message += f"💰 Tiết kiệm: `{format_currency(saving_bal)}`\n"
-        message += f"📈 Đầu tư: `{format_currency(invest_bal)}`\n"
-        message += f"🏗️ Xây dựng: `{format_currency(construction_bal)}`\n"
-        message += f"💎 **Tổng tài sản:** `{format_currency(total_bal)}`\n\n"
-    
-    message += "💡 _Chỉ hiển thị 6 tháng gần nhất_"
-    
-    await send_formatted_message(update, message)
+        message.add("💡 _Chỉ hiển thị 6 tháng gần nhất_")
     
 async def monthhistory_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """View past month closures: /monthhistory - now shows calendar months"""
@@ -351,7 +353,7 @@ async def monthhistory_command(update: Update, context: ContextTypes.DEFAULT_TYP
     user_id = update.effective_user.id
     
     # Get past 6 month closures
-    closures_data = db.get_monthly_closures_history(user_id, limit=6)
+    closures_data = await db.get_monthly_closures_history(user_id, limit=6)
     
     if not closures_data.data:
         await send_formatted_message(update, 
@@ -360,33 +362,32 @@ async def monthhistory_command(update: Update, context: ContextTypes.DEFAULT_TYP
         return
     
     # Build history message
-    message = "📅 *LỊCH SỬ TIẾT KIỆM THÁNG*\n\n"
-    
-    for closure in closures_data.data:
-        month = closure["month"]
-        year = closure["year"]
-        created_date = closure["created_at"][:10]
+    async with MessageBuilder(update) as message:
+        message.add("📅 *LỊCH SỬ TIẾT KIỆM THÁNG*\n")
         
-        total_income = float(closure["total_income"])
-        total_expenses = float(closure["total_expenses"])
-        net_savings = float(closure["net_savings"])
-        transferred = float(closure.get("transferred_to_savings", 0))
-        
-        # Calculate final saving balance after this closure
-        saving_before = float(closure.get("saving_balance_before", 0))
-        saving_after = saving_before + transferred
-        
-        # Get calendar month display range
-        date_range = get_month_display(year, month)
-        
-        message += f"📊 *THÁNG {month}/{year}* _(đóng {created_date})_\n"
-        message += f"📅 _{date_range}_\n"
-        message += f"💵 Thu: `{format_currency(total_income)}` | Chi: `{format_currency(total_expenses)}`\n"
-        message += f"📈 Tiết kiệm ròng: `{format_currency(net_savings)}`\n"
-        if transferred > 0:
-            message += f"💰 Chuyển vào tiết kiệm: `{format_currency(transferred)}`\n"
-        message += f"💳 Tiết kiệm cuối tháng: `{format_currency(saving_after)}`\n\n"
-    
-    message += "💡 _Chỉ hiển thị 6 tháng gần nhất_"
-    
-    await send_formatted_message(update, message)
\ No newline at end of file
+        for closure in closures_data.data:
+            month = closure["month"]
+            year = closure["year"]
+            created_date = closure["created_at"][:10]
+            
+            total_income = float(closure["total_income"])
+            total_expenses = float(closure["total_expenses"])
+            net_savings = float(closure["net_savings"])
+            transferred = float(closure.get("transferred_to_savings", 0))
+            
+            # Calculate final saving balance after this closure
+            saving_before = float(closure.get("saving_balance_before", 0))
+            saving_after = saving_before + transferred
+            
+            # Get calendar month display range
+            date_range = get_month_display(year, month)
+            
+            message.add(f"📊 *THÁNG {month}/{year}* _(đóng {created_date})_")
+            message.add(f"📅 _{date_range}_")
+            message.add(f"💵 Thu: `{format_currency(total_income)}` | Chi: `{format_currency(total_expenses)}`")
+            message.add(f"📈 Tiết kiệm ròng: `{format_currency(net_savings)}`")
+            if transferred > 0:
+                message.add(f"💰 Chuyển vào tiết kiệm: `{format_currency(transferred)}`")
+            message.add(f"💳 Tiết kiệm cuối tháng: `{format_currency(saving_after)}`\n")
+        
+        message.add("💡 _Chỉ hiển thị 6 tháng gần nhất_")
\ No newline at end of file
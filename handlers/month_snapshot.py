@@ -0,0 +1,118 @@
+from database import db
+from write_journal import write_journal
+from utils import get_month_date_range
+from config import DEFAULT_SUBSCRIPTION_CATEGORY
+
+# Description suffix of the expenses post_monthly_subscriptions creates
+SUBSCRIPTION_SUFFIX = " (subscription)"
+
+class MonthSnapshot:
+    """Everything the month views need for one user, fetched once per request
+    
+    /list, /summary and /wishlist used to re-query the same expenses, budgets
+    and wishlist inside every breakdown helper. Load a snapshot once (all
+    queries run concurrently) and pass it to the helpers instead.
+    
+    Totals come from the pre-aggregated monthly_rollups rows. The raw
+    expense/income rows are only fetched with include_rows=True, for views
+    that list individual transactions. include_subscriptions=True fetches
+    the subscription expenses posted for the month (dated the 1st).
+    
+    Balances include write-journal deltas that aren't flushed yet, so the
+    journaled rows that aren't in the database yet are added to the rollups
+    and raw rows too - the account and the category totals always agree.
+    """
+    
+    def __init__(self, user_id, year, month, rollups, budgets, wishlist, balances, expenses=None, income=None,
+                 subscription_expenses=None):
+        self.user_id = user_id
+        self.year = year
+        self.month = month
+        self.month_start, self.month_end = get_month_date_range(year, month)
+        self.rollups = rollups
+        self.budgets = budgets
+        self.wishlist = wishlist
+        self.balances = balances
+        self.expenses = expenses or []
+        self.income = income or []
+        self.subscription_expenses = subscription_expenses or []
+    
+    @classmethod
+    async def load(cls, user_id, year, month, include_rows=False, include_subscriptions=False):
+        """Fetch rollups, budgets, wishlist and account balances (plus raw rows if asked) concurrently"""
+        month_start, month_end = get_month_date_range(year, month)
+        
+        queries = [
+            db.get_monthly_rollups(user_id, year, month),
+            db.get_budget_plans(user_id),
+            db.get_wishlist(user_id)
+        ]
+        if include_rows:
+            queries += [
+                db.get_monthly_expenses(user_id, month_start, month_end),
+                db.get_monthly_income(user_id, month_start, month_end)
+            ]
+        if include_subscriptions:
+            queries.append(db.get_expenses_by_date(user_id, month_start, DEFAULT_SUBSCRIPTION_CATEGORY))
+        
+        results, balances, pending = await write_journal.read_consistent(user_id, *queries)
+        rollups, budgets, wishlist = results[:3]
+        expenses, income = (results[3].data, results[4].data) if include_rows else (None, None)
+        subscription_expenses = None
+        if include_subscriptions:
+            subscription_expenses = [
+                expense for expense in results[-1].data or []
+                if expense["description"].endswith(SUBSCRIPTION_SUFFIX)
+            ]
+        
+        snapshot = cls(
+            user_id, year, month,
+            rollups.data or [], budgets.data or [], wishlist.data or [], balances,
+            expenses, income, subscription_expenses
+        )
+        snapshot._add_pending(pending, include_rows)
+        return snapshot
+    
+    def _add_pending(self, pending, include_rows):
+        """Count journaled rows of this month that aren't in the database yet"""
+        month_start, month_end = self.month_start.isoformat(), self.month_end.isoformat()
+        rollups = {(row["kind"], row["category"]): row for row in self.rollups}
+        
+        for kind, rows in pending.items():
+            for row in rows:
+                if not month_start <= row["date"] <= month_end:
+                    continue
+                category = row["category"] if kind == "expense" else row.get("income_type") or "random"
+                rollup = rollups.get((kind, category))
+                if rollup is None:
+                    rollup = rollups[(kind, category)] = {"kind": kind, "category": category, "total": 0, "entry_count": 0}
+                    self.rollups.append(rollup)
+                rollup["total"] = float(rollup["total"]) + float(row["amount"])
+                rollup["entry_count"] = int(rollup["entry_count"]) + 1
+                
+                if include_rows:
+                    (self.expenses if kind == "expense" else self.income).append(row)
+    
+    def expense_totals(self):
+        """Get {category: total spent} for the month"""
+        return {row["category"]: float(row["total"]) for row in self.rollups if row["kind"] == "expense"}
+    
+    def income_totals(self):
+        """Get {income_type: total received} for the month"""
+        return {row["category"]: float(row["total"]) for row in self.rollups if row["kind"] == "income"}
+    
+    def expense_count(self):
+        """Get number of expenses in the month"""
+        return sum(int(row["entry_count"]) for row in self.rollups if row["kind"] == "expense")
+    
+    def income_count(self):
+        """Get number of income entries in the month"""
+        return sum(int(row["entry_count"]) for row in self.rollups if row["kind"] == "income")
+    
+    def expenses_for_category(self, category):
+        """Get this month's expenses for one category (needs include_rows=True)"""
+        return [expense for expense in self.expenses if expense["category"] == category]
+    
+    def account_balance(self, account_type):
+        """Get balance for one account type"""
+        return self.balances.get(account_type, 0)
\ No newline at end of file
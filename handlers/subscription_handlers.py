@@ -1,8 +1,14 @@
 from telegram import Update
 from telegram.ext import ContextTypes
+import logging
 
 from database import db
-from utils import check_authorization, send_formatted_message, safe_int_conversion, safe_parse_amount, format_currency
+from utils import (
+    check_authorization, send_formatted_message, safe_int_conversion, safe_parse_amount, format_currency,
+    get_current_month, get_month_date_range
+)
+from config import DEFAULT_SUBSCRIPTION_CATEGORY
+from .month_snapshot import SUBSCRIPTION_SUFFIX
 
 async def subscription_add_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Add subscription: /subadd Spotify 33k"""
@@ -31,7 +37,7 @@ async def subscription_add_command(update: Update, context: ContextTypes.DEFAULT
         "billing_cycle": "monthly"
     }
     
-    db.insert_subscription(subscription_data)
+    await db.insert_subscription(subscription_data)
     
     message = f"✅ Đã thêm subscription!\n📅 *{service_name}*: {format_currency(amount)}/tháng"
     await send_formatted_message(update, message)
@@ -42,7 +48,7 @@ async def subscription_list_command(update: Update, context: ContextTypes.DEFAUL
         return
     
     user_id = update.effective_user.id
-    subscriptions_data = db.get_subscriptions(user_id)
+    subscriptions_data = await db.get_subscriptions(user_id)
     
     if not subscriptions_data.data:
         await send_formatted_message(update, "📅 Không có subscription!\nDùng `/subadd Spotify 33k` để thêm")
@@ -85,7 +91,7 @@ async def subscription_remove_command(update: Update, context: ContextTypes.DEFA
         return
     
     # Get subscriptions
-    subscriptions_data = db.get_subscriptions(user_id)
+    subscriptions_data = await db.get_subscriptions(user_id)
     
     if not subscriptions_data.data or item_index < 0 or item_index >= len(subscriptions_data.data):
         await send_formatted_message(update, "❌ Số thứ tự không hợp lệ")
@@ -96,7 +102,29 @@ async def subscription_remove_command(update: Update, context: ContextTypes.DEFA
     selected_sub = subscriptions[item_index]
     
     # Remove
-    db.delete_subscription(selected_sub["id"])
+    await db.delete_subscription(selected_sub["id"])
     
     service_name = selected_sub["service_name"]
-    await send_formatted_message(update, f"✅ Đã xóa subscription *{service_name}*!")
\ No newline at end of file
+    await send_formatted_message(update, f"✅ Đã xóa subscription *{service_name}*!")
+
+async def post_monthly_subscriptions(context: ContextTypes.DEFAULT_TYPE):
+    """JobQueue callback: post every user's subscriptions for the current month
+    
+    Runs daily (and once at startup) so a missed 1st of the month is caught up.
+    Each (subscription_id, year, month) is claimed in subscription_postings
+    together with inserting its expense (dated the 1st), in one database
+    transaction - re-runs are no-ops, and a crash can't leave a claim
+    without its expense.
+    """
+    current_month, current_year = get_current_month()
+    month_start, month_end = get_month_date_range(current_year, current_month)
+    
+    try:
+        posted = await db.post_subscription_expenses(
+            current_year, current_month, month_start, DEFAULT_SUBSCRIPTION_CATEGORY, SUBSCRIPTION_SUFFIX
+        )
+        if posted.data:
+            logging.info(f"Posted {len(posted.data)} subscriptions for {current_month}/{current_year}")
+        
+    except Exception as e:
+        logging.error(f"Monthly subscription posting error: {e}")
\ No newline at end of file
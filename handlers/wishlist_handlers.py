@@ -5,18 +5,18 @@ import logging
 from database import db
 from utils import (
     check_authorization, send_formatted_message,
-    safe_parse_amount, format_currency  # REMOVED safe_int_conversion
+    safe_parse_amount, format_currency, get_current_month  # REMOVED safe_int_conversion
 )
+from .month_snapshot import MonthSnapshot
 from config import get_priority_emoji, get_priority_name, get_priority_description, get_message
 
-# Import Gemini for fuzzy matching
-import google.generativeai as genai
-from config import GEMINI_API_KEY
+# Local fuzzy matching; Gemini (ai_parser's shared model) only settles close calls
+from ai_parser import generate_text
+from text_matching import FuzzyIndex, MATCH_SCORE, resolve_priority
 import json
 
-# Configure Gemini
-genai.configure(api_key=GEMINI_API_KEY)
-gemini_model = genai.GenerativeModel('gemini-1.5-flash')
+# user_id -> (wishlist signature, FuzzyIndex)
+_wishlist_indexes = {}
 
 async def wishlist_add_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Add item to wishlist: /wishadd iPhone 25m prio:1"""
@@ -38,12 +38,10 @@ async def wishlist_add_command(update: Update, context: ContextTypes.DEFAULT_TYP
     item_args = []
     for arg in args:
         if arg.lower().startswith('prio:'):
-            try:
-                prio_value = int(arg.split(':')[1])  # Direct int conversion instead of safe_int_conversion
-                if 1 <= prio_value <= 5:
-                    priority = prio_value
-            except (ValueError, IndexError):
-                pass
+            # Level number or name: prio:2, prio:next
+            prio_value = resolve_priority(arg.split(':', 1)[1])
+            if prio_value:
+                priority = prio_value
         else:
             item_args.append(arg)
     
@@ -74,7 +72,7 @@ async def wishlist_add_command(update: Update, context: ContextTypes.DEFAULT_TYP
         "purchased": False
     }
     
-    db.insert_wishlist_item(wishlist_data)
+    await db.insert_wishlist_item(wishlist_data)
     
     # Response
     price_text = format_currency(estimated_price) if estimated_price else "Chưa có giá"
@@ -96,15 +94,16 @@ async def wishlist_view_command(update: Update, context: ContextTypes.DEFAULT_TY
     
     user_id = update.effective_user.id
     
-    # Get wishlist items
-    wishlist_data = db.get_wishlist(user_id)
+    # Get wishlist items together with this month's income/expenses
+    current_month, current_year = get_current_month()
+    snapshot = await MonthSnapshot.load(user_id, current_year, current_month)
     
-    if not wishlist_data.data:
+    if not snapshot.wishlist:
         await send_formatted_message(update, "🛏️ Wishlist trống! Dùng /wishadd để thêm sản phẩm")
         return
     
     # Filter active items
-    active_items = [item for item in wishlist_data.data if not item.get("purchased", False)]
+    active_items = [item for item in snapshot.wishlist if not item.get("purchased", False)]
     
     if not active_items:
         await send_formatted_message(update, "🛏️ Wishlist trống! Dùng /wishadd để thêm sản phẩm")
@@ -140,7 +139,7 @@ async def wishlist_view_command(update: Update, context: ContextTypes.DEFAULT_TY
         level_sums[level] = total
     
     # Get financial data
-    financial_data = get_simple_financial_data(user_id)
+    financial_data = get_simple_financial_data(snapshot)
     
     # Build message
     message = "🛏️ *WISHLIST 5 LEVELS*\n\n"
@@ -222,7 +221,7 @@ async def wishlist_remove_command(update: Update, context: ContextTypes.DEFAULT_
     search_term = " ".join(args).strip()
     
     # Get wishlist
-    wishlist_data = db.get_wishlist(user_id)
+    wishlist_data = await db.get_wishlist(user_id)
     if not wishlist_data.data:
         await send_formatted_message(update, "⌘ Wishlist trống")
         return
@@ -233,8 +232,8 @@ async def wishlist_remove_command(update: Update, context: ContextTypes.DEFAULT_
         await send_formatted_message(update, "⌘ Wishlist trống")
         return
     
-    # Use Gemini to find the best matching item
-    matched_item = find_matching_wishlist_item(search_term, active_items)
+    # Match locally; Gemini only breaks ties between close candidates
+    matched_item = await find_matching_wishlist_item(search_term, active_items, user_id)
     
     if not matched_item:
         # Show available items for reference
@@ -255,7 +254,7 @@ async def wishlist_remove_command(update: Update, context: ContextTypes.DEFAULT_
         return
     
     # Remove the matched item
-    db.delete_wishlist_item(matched_item["id"])
+    await db.delete_wishlist_item(matched_item["id"])
     
     # Response with item details
     item_name = matched_item["item_name"]
@@ -273,8 +272,50 @@ async def wishlist_remove_command(update: Update, context: ContextTypes.DEFAULT_
     
     await send_formatted_message(update, message)
 
-def find_matching_wishlist_item(search_term, wishlist_items):
-    """Use Gemini to find the best matching wishlist item"""
+def get_wishlist_index(user_id, wishlist_items):
+    """Get the user's fuzzy-match index, rebuilt only when their items changed"""
+    signature = tuple((item.get("id"), item.get("item_name")) for item in wishlist_items)
+    cached = _wishlist_indexes.get(user_id)
+    if cached and cached[0] == signature:
+        return cached[1]
+    
+    index = _build_wishlist_index(wishlist_items)
+    _wishlist_indexes[user_id] = (signature, index)
+    return index
+
+def _build_wishlist_index(wishlist_items):
+    return FuzzyIndex(wishlist_items, key=lambda item: item.get("item_name", ""))
+
+async def find_matching_wishlist_item(search_term, wishlist_items, user_id=None):
+    """Find the wishlist item best matching search_term
+    
+    Ranked locally (diacritic-insensitive trigram and token similarity);
+    Gemini is asked only to choose between close candidates, and only
+    those candidates are sent.
+    """
+    if user_id is not None:
+        index = get_wishlist_index(user_id, wishlist_items)
+    else:
+        index = _build_wishlist_index(wishlist_items)
+    matched_item, candidates, ambiguous = index.best_match(search_term)
+    if not ambiguous:
+        return matched_item
+    
+    candidate_items = [item for _, item in candidates]
+    try:
+        return await _pick_wishlist_item_with_gemini(search_term, candidate_items)
+    except Exception as e:
+        logging.error(f"Gemini wishlist matching error: {e!r}")
+        
+        # Offline: take the top candidate only if it is a strict, strong winner
+        top_score, top_item = candidates[0]
+        runner_up = candidates[1][0] if len(candidates) > 1 else 0.0
+        if top_score >= MATCH_SCORE and top_score > runner_up:
+            return top_item
+        return None
+
+async def _pick_wishlist_item_with_gemini(search_term, wishlist_items):
+    """Ask Gemini which of a few close candidates search_term means"""
     
     # Create a list of items with their names
     item_list = []
@@ -320,47 +361,32 @@ Examples:
 - Search "xyz123" with no similar items should return null
 """
 
-    try:
-        response = gemini_model.generate_content(prompt)
-        result_text = response.text.strip()
-        
-        # Clean markdown formatting
-        if result_text.startswith('```json'):
-            result_text = result_text.replace('```json', '').replace('```', '').strip()
-        
-        result = json.loads(result_text)
-        
-        matched_index = result.get("matched_index")
-        confidence = result.get("confidence", "low")
-        
-        # Only return match if confidence is reasonable and index is valid
-        if (matched_index is not None and 
-            confidence in ["high", "medium"] and 
-            0 <= matched_index < len(wishlist_items)):
-            return wishlist_items[matched_index]
-        
-        return None
-        
-    except Exception as e:
-        logging.error(f"Gemini wishlist matching error: {e}")
-        
-        # Fallback to simple string matching
-        search_lower = search_term.lower()
-        for item in wishlist_items:
-            item_name_lower = item.get("item_name", "").lower()
-            if search_lower in item_name_lower or item_name_lower in search_lower:
-                return item
-        
-        return None
+    result_text = (await generate_text(prompt)).strip()
+    
+    # Clean markdown formatting
+    if result_text.startswith('```json'):
+        result_text = result_text.replace('```json', '').replace('```', '').strip()
+    
+    result = json.loads(result_text)
+    
+    matched_index = result.get("matched_index")
+    confidence = result.get("confidence", "low")
+    
+    # Only return match if confidence is reasonable and index is valid
+    if (matched_index is not None and 
+        confidence in ["high", "medium"] and 
+        0 <= matched_index < len(wishlist_items)):
+        return wishlist_items[matched_index]
+    
+    return None
 
-def get_wishlist_priority_sums(user_id):
-    """Get sums for wishlist levels - simple version"""
+def get_wishlist_priority_sums(snapshot):
+    """Get sums for wishlist levels from a MonthSnapshot"""
     try:
-        wishlist_data = db.get_wishlist(user_id)
-        if not wishlist_data.data:
+        if not snapshot.wishlist:
             return {"level1": 0, "level2": 0, "level1_and_2": 0}
         
-        active_items = [item for item in wishlist_data.data if not item.get("purchased", False)]
+        active_items = [item for item in snapshot.wishlist if not item.get("purchased", False)]
         
         level1_sum = 0
         level2_sum = 0
@@ -394,46 +420,15 @@ def get_wishlist_priority_sums(user_id):
     except Exception:
         return {"level1": 0, "level2": 0, "level1_and_2": 0}
 
-def get_simple_financial_data(user_id):
-    """Get simple financial data without complex imports"""
-    try:
-        from datetime import datetime
-        
-        today = datetime.now()
-        month_start = today.replace(day=1).date()
-        
-        # Get expenses
-        expenses_data = db.get_monthly_expenses(user_id, month_start)
-        total_expenses = 0
-        if expenses_data.data:
-            for expense in expenses_data.data:
-                try:
-                    total_expenses += float(expense["amount"])
-                except (ValueError, TypeError):
-                    pass
-        
-        # Get income
-        income_data = db.get_monthly_income(user_id, month_start)
-        total_income = 0
-        if income_data.data:
-            for income in income_data.data:
-                try:
-                    total_income += float(income["amount"])
-                except (ValueError, TypeError):
-                    pass
-        
-        return {
-            "income": total_income,
-            "expenses": total_expenses
-        }
-    except Exception:
-        return {
-            "income": 0,
-            "expenses": 0
-        }
+def get_simple_financial_data(snapshot):
+    """Get this month's income and expense totals from a MonthSnapshot"""
+    return {
+        "income": sum(snapshot.income_totals().values()),
+        "expenses": sum(snapshot.expense_totals().values())
+    }
 
 # Backward compatibility
-def get_wishlist_priority1_sum(user_id):
+def get_wishlist_priority1_sum(snapshot):
     """Backward compatibility function"""
-    sums = get_wishlist_priority_sums(user_id)
+    sums = get_wishlist_priority_sums(snapshot)
     return sums["level1"]
\ No newline at end of file
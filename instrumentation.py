@@ -0,0 +1,243 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import TRACE_UPDATES
+
+# Histogram buckets (seconds) for backend calls and whole updates
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Keys of registered stats() dicts rendered as counters (everything else is a gauge)
+STATS_COUNTERS = {"hits", "misses"}
+
+# Handler that triggered the current backend calls ("background" for jobs)
+current_handler = contextvars.ContextVar("current_handler", default="background")
+
+# Backend calls made while handling the current update, for the trace log
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+trace_logger = logging.getLogger("wallet.trace")
+trace_logger.setLevel(logging.INFO if TRACE_UPDATES else logging.WARNING)
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+    
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+
+class Metrics:
+    """In-process counters and histograms, rendered in Prometheus text format"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = defaultdict(int)          # (kind, method, handler) -> calls
+        self.errors = defaultdict(int)         # (kind, method, handler) -> failed calls
+        self.rows = defaultdict(int)           # (kind, method, handler) -> rows returned
+        self.payload_bytes = defaultdict(int)  # (kind, method, handler) -> serialized size
+        self.durations = defaultdict(Histogram)
+        self.updates = defaultdict(int)        # handler -> updates handled
+        self.update_durations = defaultdict(Histogram)
+        self.stats_sources = {}                # metric prefix -> (help text, stats callable)
+    
+    def register_stats(self, prefix, help_text, stats):
+        """Export a component's stats() dict (e.g. cache hits/misses) on every render"""
+        self.stats_sources[prefix] = (help_text, stats)
+    
+    def record_call(self, kind, method, seconds, rows=0, payload_bytes=0, error=False):
+        """Record one backend round-trip, tagged with the current handler"""
+        key = (kind, method, current_handler.get())
+        with self._lock:
+            self.calls[key] += 1
+            self.rows[key] += rows
+            self.payload_bytes[key] += payload_bytes
+            self.durations[key].observe(seconds)
+            if error:
+                self.errors[key] += 1
+        
+        trace = current_trace.get()
+        if trace is not None:
+            trace.append((kind, method, seconds, rows, error))
+    
+    def record_update(self, handler, seconds):
+        with self._lock:
+            self.updates[handler] += 1
+            self.update_durations[handler].observe(seconds)
+    
+    def render_prometheus(self):
+        """Get all metrics in the Prometheus text exposition format"""
+        lines = []
+        
+        def call_labels(key):
+            return f'kind="{key[0]}",method="{key[1]}",handler="{_escape(key[2])}"'
+        
+        with self._lock:
+            for name, help_text, values in [
+                ("wallet_backend_calls_total", "Backend (database/Gemini) calls", self.calls),
+                ("wallet_backend_errors_total", "Backend calls that raised", self.errors),
+                ("wallet_backend_rows_total", "Rows returned by backend calls", self.rows),
+                ("wallet_backend_payload_bytes_total", "Serialized size of backend results", self.payload_bytes)
+            ]:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                lines += [f"{name}{{{call_labels(key)}}} {value}" for key, value in sorted(values.items())]
+            
+            lines += _histogram_lines("wallet_backend_duration_seconds", "Backend call latency", self.durations, call_labels)
+            
+            lines += ["# HELP wallet_updates_total Updates handled", "# TYPE wallet_updates_total counter"]
+            lines += [f'wallet_updates_total{{handler="{_escape(handler)}"}} {value}' for handler, value in sorted(self.updates.items())]
+            lines += _histogram_lines(
+                "wallet_update_duration_seconds", "Update handling latency", self.update_durations,
+                lambda handler: f'handler="{_escape(handler)}"'
+            )
+            stats_sources = list(self.stats_sources.items())
+        
+        # Outside the lock: a stats() call may read a file
+        for prefix, (help_text, stats) in stats_sources:
+            try:
+                values = stats()
+            except Exception as e:
+                logging.warning(f"Stats for {prefix} failed: {e}")
+                continue
+            for key, value in values.items():
+                if key in STATS_COUNTERS:
+                    name, metric_type = f"{prefix}_{key}_total", "counter"
+                else:
+                    name, metric_type = f"{prefix}_{key}", "gauge"
+                lines += [f"# HELP {name} {help_text}: {key}", f"# TYPE {name} {metric_type}", f"{name} {value}"]
+        
+        return "\n".join(lines) + "\n"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+def _histogram_lines(name, help_text, histograms, labels):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for key, histogram in sorted(histograms.items()):
+        label_text = labels(key)
+        for bound, count in zip(DURATION_BUCKETS, histogram.buckets):
+            lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{{label_text},le="+Inf"}} {histogram.count}')
+        lines.append(f"{name}_sum{{{label_text}}} {histogram.sum}")
+        lines.append(f"{name}_count{{{label_text}}} {histogram.count}")
+    return lines
+
+metrics = Metrics()
+
+def result_size(result):
+    """Get (rows, payload bytes) for a DatabaseManager return value"""
+    if isinstance(result, tuple):  # (result, new_balance(s)) from the balance functions
+        result = result[0]
+    data = getattr(result, "data", result)
+    
+    if data is None:
+        return 0, 0
+    rows = len(data) if isinstance(data, (list, dict)) else 1
+    return rows, len(json.dumps(data, default=str))
+
+class InstrumentedDatabaseManager:
+    """Times every call of an AsyncDatabaseManager and records it in metrics
+    
+    Sits under CachedDatabaseManager, so cache hits (which never reach the
+    database) are not counted as round-trips. Result sizes are measured on
+    the database worker thread (call_measured), not on the event loop.
+    """
+    
+    def __init__(self, manager):
+        self._manager = manager
+    
+    def __getattr__(self, name):
+        attr = getattr(self._manager, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+        
+        async def call(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result, (rows, payload_bytes) = await self._manager.call_measured(name, result_size, *args, **kwargs)
+            except Exception:
+                metrics.record_call("db", name, time.perf_counter() - started, error=True)
+                raise
+            
+            metrics.record_call("db", name, time.perf_counter() - started, rows, payload_bytes)
+            return result
+        
+        call.__name__ = name
+        call.__doc__ = attr.__doc__
+        return call
+
+def handler_name(handler):
+    """Tag for a registered handler: "/command" or the callback name"""
+    commands = getattr(handler, "commands", None)
+    if commands:
+        return "/" + sorted(commands)[0]
+    return handler.callback.__name__
+
+def traced(name, callback):
+    """Wrap a handler callback: tag its backend calls and log a per-update trace"""
+    async def call(update, context):
+        handler_token = current_handler.set(name)
+        trace_token = current_trace.set([])
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.record_update(name, elapsed)
+            _log_trace(name, update, elapsed, current_trace.get())
+            current_trace.reset(trace_token)
+            current_handler.reset(handler_token)
+    
+    call.__name__ = callback.__name__
+    call.__doc__ = callback.__doc__
+    return call
+
+def instrument_handlers(application):
+    """Wrap every registered handler callback with traced()"""
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            handler.callback = traced(handler_name(handler), handler.callback)
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """Serve GET /metrics from a daemon thread (for polling mode, which has no web server)"""
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            pass  # scrapes would flood the bot log
+    
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+def _log_trace(name, update, elapsed, trace):
+    if not trace_logger.isEnabledFor(logging.INFO):
+        return
+    
+    user = getattr(update, "effective_user", None)
+    calls = ", ".join(
+        f"{kind}.{method} {seconds * 1000:.1f}ms {rows}r" + (" ERR" if error else "")
+        for kind, method, seconds, rows, error in trace
+    )
+    trace_logger.info(
+        f"{name} user={user.id if user else '-'} {elapsed * 1000:.1f}ms "
+        f"calls={len(trace)} [{calls}]"
+    )
\ No newline at end of file
@@ -1,85 +1,199 @@
 from telegram.ext import Application, CommandHandler, MessageHandler, filters
 from telegram.error import Conflict
-from config import TELEGRAM_BOT_TOKEN
+import asyncio
+import datetime
+from config import (
+    TELEGRAM_BOT_TOKEN, WRITE_JOURNAL_FLUSH_INTERVAL, MAX_CONCURRENT_UPDATES,
+    TELEGRAM_API_BASE_URL, WEBHOOK_URL, METRICS_PORT, SHUTDOWN_DRAIN_TIMEOUT
+)
+from instrumentation import instrument_handlers, start_metrics_server
+from rate_limiter import TokenBucketRateLimiter
+from supervisor import Supervisor, RestartLimitExceeded, install_signal_handlers
+from update_processor import PerUserUpdateProcessor
+from write_journal import flush_write_journal, write_journal
 
 # Import all handlers - REMOVED category_command
 from handlers import (
     start, handle_message, savings_command, edit_savings_command,
-    help_command, monthly_summary, list_expenses_command,
+    help_command, monthly_summary, rebuild_rollups_command, list_expenses_command,
     wishlist_add_command, wishlist_view_command, wishlist_remove_command,
     subscription_add_command, subscription_list_command, subscription_remove_command,
     budget_command, budget_list_command, income_command,
     account_command, account_edit_command,
     allocation_command,
-    endmonth_command, monthhistory_command, balancehistory_command
+    endmonth_command, monthhistory_command, balancehistory_command,
+    import_command, import_csv_document,
+    post_monthly_subscriptions
 )
 
-import time
+import logging
 import sys
 
-def main():
-    """Main function - simplified"""
+def build_application(concurrent=True):
+    """Create the application with all handlers and background jobs registered
+    
+    Updates from different users are handled in parallel, one at a time and in
+    order per user (PerUserUpdateProcessor), so one user's balance changes and
+    /endmonth confirmation never interleave. concurrent=False processes every
+    update sequentially instead.
+    """
+    # Replies queue under Telegram's global and per-chat limits instead of hitting 429s
+    builder = Application.builder().token(TELEGRAM_BOT_TOKEN).rate_limiter(TokenBucketRateLimiter())
+    if TELEGRAM_API_BASE_URL:
+        builder = builder.base_url(TELEGRAM_API_BASE_URL)
+    if concurrent:
+        builder = builder.concurrent_updates(PerUserUpdateProcessor(MAX_CONCURRENT_UPDATES))
+    application = builder.build()
+    
+    register_handlers(application)
+    return application
+
+def register_handlers(application):
+    """Add command/message handlers and background jobs"""
+    # Add command handlers
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("help", help_command))
+    
+    # Expense & Income
+    application.add_handler(CommandHandler("list", list_expenses_command))  # Enhanced list command
+    application.add_handler(CommandHandler("summary", monthly_summary))
+    application.add_handler(CommandHandler("saving", savings_command))
+    application.add_handler(CommandHandler("editsaving", edit_savings_command))
+    application.add_handler(CommandHandler("rebuildrollups", rebuild_rollups_command))
+    # REMOVED: category_command - functionality moved to list_expenses_command
+    application.add_handler(CommandHandler("income", income_command))
+    
+    # Wishlist (5 levels)
+    application.add_handler(CommandHandler("wishadd", wishlist_add_command))
+    application.add_handler(CommandHandler("wishlist", wishlist_view_command))
+    application.add_handler(CommandHandler("wishremove", wishlist_remove_command))
+    
+    # Subscriptions
+    application.add_handler(CommandHandler("subadd", subscription_add_command))
+    application.add_handler(CommandHandler("sublist", subscription_list_command))
+    application.add_handler(CommandHandler("subremove", subscription_remove_command))
+    
+    # Budget
+    application.add_handler(CommandHandler("budget", budget_command))
+    application.add_handler(CommandHandler("budgetlist", budget_list_command))
+
+    # Account
+    application.add_handler(CommandHandler("account", account_command))
+    application.add_handler(CommandHandler("accountedit", account_edit_command))
+    
+    # Allocation
+    application.add_handler(CommandHandler("allocation", allocation_command))
+    
+    # Month-end processing
+    application.add_handler(CommandHandler("endmonth", endmonth_command))
+    application.add_handler(CommandHandler("monthhistory", monthhistory_command))
+    application.add_handler(CommandHandler("balancehistory", balancehistory_command))
+    
+    # Bulk CSV import: /import, then the file (or the file with an /import caption)
+    application.add_handler(CommandHandler("import", import_command))
+    application.add_handler(MessageHandler(
+        filters.Document.FileExtension("csv") | filters.Document.MimeType("text/csv"), import_csv_document
+    ))
+    
+    # Message handler (must be last)
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    
+    # Background jobs - subscriptions are posted daily (idempotent per month) and once at startup
+    application.job_queue.run_daily(post_monthly_subscriptions, time=datetime.time(hour=0, minute=5))
+    application.job_queue.run_once(post_monthly_subscriptions, when=10)
+    
+    # Drain journaled expense/income writes (the first run replays anything left from before a restart)
+    application.job_queue.run_repeating(flush_write_journal, interval=WRITE_JOURNAL_FLUSH_INTERVAL, first=0)
+    
+    # Tag database/Gemini calls with the handler that made them (metrics + trace log)
+    instrument_handlers(application)
+
+async def run_polling(application, stop_event):
+    """Long-poll getUpdates until stop_event is set
+    
+    Raises Conflict when another instance polls with the same token. Updates
+    already fetched are handled before the application stops.
+    """
+    conflict = []
+    
+    def on_polling_error(error):
+        if isinstance(error, Conflict):
+            conflict.append(error)
+            stop_event.set()
+        else:
+            logging.warning(f"Polling error: {error}")
+    
+    async with application:
+        await application.updater.start_polling(error_callback=on_polling_error)
+        try:
+            await application.start()
+            await stop_event.wait()
+        finally:
+            if application.updater.running:
+                await application.updater.stop()
+            if application.running:
+                await application.stop()
+    
+    if conflict:
+        raise conflict[0]
+
+async def serve(application, webhook=False):
+    """Run the bot under the supervisor, then drain journaled writes before exiting"""
+    stop_event = asyncio.Event()
+    install_signal_handlers(stop_event)
+    
+    if webhook:
+        from webhook_server import run_webhook
+        start = lambda: run_webhook(application, stop_event=stop_event)
+    else:
+        start = lambda: run_polling(application, stop_event)
+    
     try:
-        # Create application
-        application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
-        
-        # Add command handlers
-        application.add_handler(CommandHandler("start", start))
-        application.add_handler(CommandHandler("help", help_command))
-        
-        # Expense & Income
-        application.add_handler(CommandHandler("list", list_expenses_command))  # Enhanced list command
-        application.add_handler(CommandHandler("summary", monthly_summary))
-        application.add_handler(CommandHandler("saving", savings_command))
-        application.add_handler(CommandHandler("editsaving", edit_savings_command))
-        # REMOVED: category_command - functionality moved to list_expenses_command
-        application.add_handler(CommandHandler("income", income_command))
-        
-        # Wishlist (5 levels)
-        application.add_handler(CommandHandler("wishadd", wishlist_add_command))
-        application.add_handler(CommandHandler("wishlist", wishlist_view_command))
-        application.add_handler(CommandHandler("wishremove", wishlist_remove_command))
-        
-        # Subscriptions
-        application.add_handler(CommandHandler("subadd", subscription_add_command))
-        application.add_handler(CommandHandler("sublist", subscription_list_command))
-        application.add_handler(CommandHandler("subremove", subscription_remove_command))
-        
-        # Budget
-        application.add_handler(CommandHandler("budget", budget_command))
-        application.add_handler(CommandHandler("budgetlist", budget_list_command))
+        await Supervisor(fatal=(Conflict,)).run(start, stop_event)
+    finally:
+        pending = await write_journal.drain(SHUTDOWN_DRAIN_TIMEOUT)
+        if pending:
+            print(f"⚠️ {pending} journaled writes left; they are replayed on the next start")
+        else:
+            print("✅ Write journal drained")
 
-        # Account
-        application.add_handler(CommandHandler("account", account_command))
-        application.add_handler(CommandHandler("accountedit", account_edit_command))
-        
-        # Allocation
-        application.add_handler(CommandHandler("allocation", allocation_command))
-        
-        # Month-end processing
-        application.add_handler(CommandHandler("endmonth", endmonth_command))
-        application.add_handler(CommandHandler("monthhistory", monthhistory_command))
-        application.add_handler(CommandHandler("balancehistory", balancehistory_command))
-        
-        # Message handler (must be last)
-        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
-        
-        # Simple startup message - updated for calendar months
-        print("🤖 Starting Personal Finance Bot...")
-        print("📅 Using standard calendar months (1st-31st)")
-        print("📄 Enhanced /list command with date support enabled!")
-        print("🚀 Bot is running!")
-        
-        application.run_polling()
+def main():
+    """Main function - simplified
+    
+    python main.py            long-polls getUpdates
+    python main.py --webhook  serves updates over HTTP
+    
+    Both modes handle users concurrently (updates of one user in order).
+    Crashes are restarted in-process with backoff (see supervisor.py);
+    SIGTERM stops taking updates, finishes queued ones and flushes pending
+    writes.
+    """
+    webhook = "--webhook" in sys.argv[1:]
+    
+    # Create application (kept across supervisor restarts)
+    application = build_application()
+    
+    # Simple startup message - updated for calendar months
+    print("🤖 Starting Personal Finance Bot...")
+    print("📅 Using standard calendar months (1st-31st)")
+    print("📄 Enhanced /list command with date support enabled!")
+    print("🚀 Bot is running!")
+    if webhook:
+        print(f"🌐 Webhook mode: {WEBHOOK_URL or 'no public URL set'}")
+    
+    try:
+        asyncio.run(serve(application, webhook))
         
     except Conflict:
         print("⛔ Bot conflict: Another instance is running!")
         sys.exit(1)
         
-    except Exception as e:
-        print(f"⛔ Error: {e}")
-        time.sleep(30)
-        main()
+    except RestartLimitExceeded as e:
+        print(f"⛔ Giving up: {e}")
+        sys.exit(1)
 
 if __name__ == "__main__":
+    # Polling mode has no web server of its own; webhook mode also serves /metrics
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
     main()
\ No newline at end of file
@@ -0,0 +1,34 @@
+-- Atomic account balance change used by DatabaseManager.update_account_balance.
+--
+-- Applies the delta and appends the account_transactions row in one
+-- transaction. The upsert takes a row lock, so concurrent updates for the
+-- same account queue up instead of overwriting each other's balance.
+--
+-- Run once in the Supabase SQL editor (or psql) before deploying.
+
+CREATE OR REPLACE FUNCTION apply_account_delta(
+    p_user_id BIGINT,
+    p_account_type TEXT,
+    p_amount NUMERIC,
+    p_transaction_type TEXT,
+    p_description TEXT,
+    p_reference_id BIGINT DEFAULT NULL
+) RETURNS NUMERIC
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_balance NUMERIC;
+BEGIN
+    INSERT INTO accounts (user_id, account_type, current_balance, last_updated)
+    VALUES (p_user_id, p_account_type, p_amount, NOW())
+    ON CONFLICT (user_id, account_type)
+    DO UPDATE SET current_balance = accounts.current_balance + EXCLUDED.current_balance,
+                  last_updated = EXCLUDED.last_updated
+    RETURNING current_balance INTO v_balance;
+
+    INSERT INTO account_transactions (user_id, account_type, transaction_type, amount, description, reference_id)
+    VALUES (p_user_id, p_account_type, p_transaction_type, p_amount, p_description, p_reference_id);
+
+    RETURN v_balance;
+END;
+$$;
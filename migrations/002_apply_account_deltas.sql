@@ -0,0 +1,36 @@
+-- Batched account balance changes used by DatabaseManager.apply_account_deltas.
+--
+-- p_deltas is a JSON array of
+--   {"account_type", "amount", "transaction_type", "description", "reference_id"}
+-- Every delta is applied with apply_account_delta (migrations/001) inside one
+-- transaction, so income allocation to several accounts is a single
+-- round-trip that either fully applies or not at all.
+--
+-- Returns a JSON object mapping account_type to its new balance.
+
+CREATE OR REPLACE FUNCTION apply_account_deltas(
+    p_user_id BIGINT,
+    p_deltas JSONB
+) RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_delta JSONB;
+    v_balance NUMERIC;
+    v_balances JSONB := '{}'::JSONB;
+BEGIN
+    FOR v_delta IN SELECT * FROM jsonb_array_elements(p_deltas) LOOP
+        v_balance := apply_account_delta(
+            p_user_id,
+            v_delta->>'account_type',
+            (v_delta->>'amount')::NUMERIC,
+            v_delta->>'transaction_type',
+            v_delta->>'description',
+            (v_delta->>'reference_id')::BIGINT
+        );
+        v_balances := v_balances || jsonb_build_object(v_delta->>'account_type', v_balance);
+    END LOOP;
+
+    RETURN v_balances;
+END;
+$$;
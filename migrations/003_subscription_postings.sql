@@ -0,0 +1,13 @@
+-- One row per subscription charge posted for a calendar month.
+--
+-- The monthly subscription job claims (subscription_id, year, month) here
+-- before inserting the expense, so re-running the job never posts the same
+-- subscription twice in a month.
+
+CREATE TABLE IF NOT EXISTS subscription_postings (
+    subscription_id BIGINT NOT NULL,
+    year INT NOT NULL,
+    month INT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (subscription_id, year, month)
+);
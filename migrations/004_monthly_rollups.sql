@@ -0,0 +1,54 @@
+-- Pre-aggregated per-month totals so /list and /summary don't sum raw rows.
+--
+-- kind is 'expense' (category = expense category) or 'income'
+-- (category = income_type). DatabaseManager bumps the rows after every
+-- expense/income insert; rebuild_monthly_rollups recomputes a user's rows
+-- from scratch (also run below to backfill existing data).
+
+CREATE TABLE IF NOT EXISTS monthly_rollups (
+    user_id BIGINT NOT NULL,
+    year INT NOT NULL,
+    month INT NOT NULL,
+    kind TEXT NOT NULL,
+    category TEXT NOT NULL,
+    total NUMERIC NOT NULL DEFAULT 0,
+    entry_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, year, month, kind, category)
+);
+
+-- p_rows: JSON array of {"user_id", "year", "month", "kind", "category", "total", "entry_count"}
+CREATE OR REPLACE FUNCTION bump_monthly_rollups(p_rows JSONB) RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO monthly_rollups (user_id, year, month, kind, category, total, entry_count)
+    SELECT (r->>'user_id')::BIGINT, (r->>'year')::INT, (r->>'month')::INT,
+           r->>'kind', r->>'category', (r->>'total')::NUMERIC, (r->>'entry_count')::INT
+    FROM jsonb_array_elements(p_rows) AS r
+    ON CONFLICT (user_id, year, month, kind, category)
+    DO UPDATE SET total = monthly_rollups.total + EXCLUDED.total,
+                  entry_count = monthly_rollups.entry_count + EXCLUDED.entry_count;
+$$;
+
+CREATE OR REPLACE FUNCTION rebuild_monthly_rollups(p_user_id BIGINT) RETURNS VOID
+LANGUAGE sql
+AS $$
+    DELETE FROM monthly_rollups WHERE user_id = p_user_id;
+
+    INSERT INTO monthly_rollups (user_id, year, month, kind, category, total, entry_count)
+    SELECT user_id, EXTRACT(YEAR FROM date)::INT, EXTRACT(MONTH FROM date)::INT,
+           'expense', category, SUM(amount), COUNT(*)
+    FROM expenses
+    WHERE user_id = p_user_id
+    GROUP BY user_id, EXTRACT(YEAR FROM date), EXTRACT(MONTH FROM date), category;
+
+    INSERT INTO monthly_rollups (user_id, year, month, kind, category, total, entry_count)
+    SELECT user_id, EXTRACT(YEAR FROM date)::INT, EXTRACT(MONTH FROM date)::INT,
+           'income', COALESCE(income_type, 'random'), SUM(amount), COUNT(*)
+    FROM income
+    WHERE user_id = p_user_id
+    GROUP BY user_id, EXTRACT(YEAR FROM date), EXTRACT(MONTH FROM date), COALESCE(income_type, 'random');
+$$;
+
+-- Backfill every existing user
+SELECT rebuild_monthly_rollups(user_id)
+FROM (SELECT DISTINCT user_id FROM expenses UNION SELECT DISTINCT user_id FROM income) AS users;
@@ -0,0 +1,97 @@
+-- Keep monthly_rollups in step with expenses/income inside the writing
+-- transaction, instead of a separate bump_monthly_rollups call after each
+-- insert (two round-trips, and a failed bump left the rollups wrong until
+-- /rebuildrollups).
+--
+-- Statement-level triggers with transition tables: a batch insert of
+-- hundreds of rows does one grouped upsert. Updates and deletes are
+-- covered too. Transition tables need one trigger per event, so each table
+-- gets three triggers sharing one function.
+
+CREATE OR REPLACE FUNCTION apply_expense_rollups() RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO monthly_rollups (user_id, year, month, kind, category, total, entry_count)
+        SELECT user_id, EXTRACT(YEAR FROM date)::INT, EXTRACT(MONTH FROM date)::INT,
+               'expense', category, -SUM(amount), -COUNT(*)
+        FROM old_rows
+        GROUP BY user_id, EXTRACT(YEAR FROM date), EXTRACT(MONTH FROM date), category
+        ON CONFLICT (user_id, year, month, kind, category)
+        DO UPDATE SET total = monthly_rollups.total + EXCLUDED.total,
+                      entry_count = monthly_rollups.entry_count + EXCLUDED.entry_count;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO monthly_rollups (user_id, year, month, kind, category, total, entry_count)
+        SELECT user_id, EXTRACT(YEAR FROM date)::INT, EXTRACT(MONTH FROM date)::INT,
+               'expense', category, SUM(amount), COUNT(*)
+        FROM new_rows
+        GROUP BY user_id, EXTRACT(YEAR FROM date), EXTRACT(MONTH FROM date), category
+        ON CONFLICT (user_id, year, month, kind, category)
+        DO UPDATE SET total = monthly_rollups.total + EXCLUDED.total,
+                      entry_count = monthly_rollups.entry_count + EXCLUDED.entry_count;
+    END IF;
+
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION apply_income_rollups() RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO monthly_rollups (user_id, year, month, kind, category, total, entry_count)
+        SELECT user_id, EXTRACT(YEAR FROM date)::INT, EXTRACT(MONTH FROM date)::INT,
+               'income', COALESCE(income_type, 'random'), -SUM(amount), -COUNT(*)
+        FROM old_rows
+        GROUP BY user_id, EXTRACT(YEAR FROM date), EXTRACT(MONTH FROM date), COALESCE(income_type, 'random')
+        ON CONFLICT (user_id, year, month, kind, category)
+        DO UPDATE SET total = monthly_rollups.total + EXCLUDED.total,
+                      entry_count = monthly_rollups.entry_count + EXCLUDED.entry_count;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO monthly_rollups (user_id, year, month, kind, category, total, entry_count)
+        SELECT user_id, EXTRACT(YEAR FROM date)::INT, EXTRACT(MONTH FROM date)::INT,
+               'income', COALESCE(income_type, 'random'), SUM(amount), COUNT(*)
+        FROM new_rows
+        GROUP BY user_id, EXTRACT(YEAR FROM date), EXTRACT(MONTH FROM date), COALESCE(income_type, 'random')
+        ON CONFLICT (user_id, year, month, kind, category)
+        DO UPDATE SET total = monthly_rollups.total + EXCLUDED.total,
+                      entry_count = monthly_rollups.entry_count + EXCLUDED.entry_count;
+    END IF;
+
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS expenses_rollups_insert ON expenses;
+DROP TRIGGER IF EXISTS expenses_rollups_update ON expenses;
+DROP TRIGGER IF EXISTS expenses_rollups_delete ON expenses;
+CREATE TRIGGER expenses_rollups_insert AFTER INSERT ON expenses
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION apply_expense_rollups();
+CREATE TRIGGER expenses_rollups_update AFTER UPDATE ON expenses
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION apply_expense_rollups();
+CREATE TRIGGER expenses_rollups_delete AFTER DELETE ON expenses
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION apply_expense_rollups();
+
+DROP TRIGGER IF EXISTS income_rollups_insert ON income;
+DROP TRIGGER IF EXISTS income_rollups_update ON income;
+DROP TRIGGER IF EXISTS income_rollups_delete ON income;
+CREATE TRIGGER income_rollups_insert AFTER INSERT ON income
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION apply_income_rollups();
+CREATE TRIGGER income_rollups_update AFTER UPDATE ON income
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION apply_income_rollups();
+CREATE TRIGGER income_rollups_delete AFTER DELETE ON income
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION apply_income_rollups();
+
+-- The client-side bump is gone; dropping it also stops a not-yet-updated
+-- bot from counting rows twice (its bump call fails and is only logged)
+DROP FUNCTION IF EXISTS bump_monthly_rollups(JSONB);
+
+-- Repair any drift left by bumps that failed before this migration
+SELECT rebuild_monthly_rollups(user_id)
+FROM (SELECT DISTINCT user_id FROM expenses UNION SELECT DISTINCT user_id FROM income) AS users;
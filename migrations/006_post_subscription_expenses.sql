@@ -0,0 +1,42 @@
+-- Claim a month's subscription postings and insert their expenses in one
+-- statement, so the two can't be separated.
+--
+-- The monthly job used to claim (subscription_id, year, month) first and
+-- insert the expenses in a second request. A crash in between left claims
+-- with no expenses, and that month's subscriptions were never posted. Here
+-- the claim and the insert commit (or roll back) together. Re-running is
+-- still a no-op for keys that are already claimed. The monthly_rollups
+-- triggers (migrations/005) fire on the insert.
+--
+-- Returns the inserted expense rows.
+
+CREATE OR REPLACE FUNCTION post_subscription_expenses(
+    p_year INT,
+    p_month INT,
+    p_date DATE,
+    p_category TEXT,
+    p_description_suffix TEXT
+) RETURNS SETOF expenses
+LANGUAGE sql
+AS $$
+    WITH claimed AS (
+        INSERT INTO subscription_postings (subscription_id, year, month)
+        SELECT id, p_year, p_month FROM subscriptions
+        ON CONFLICT (subscription_id, year, month) DO NOTHING
+        RETURNING subscription_id
+    )
+    INSERT INTO expenses (user_id, amount, description, category, date)
+    SELECT s.user_id, s.amount, s.service_name || p_description_suffix, p_category, p_date
+    FROM subscriptions s
+    JOIN claimed c ON c.subscription_id = s.id
+    RETURNING *;
+$$;
+
+-- Before the job existed, /summary posted subscriptions as
+-- "<service_name> (subscription)" expenses. Claim every month that already
+-- has one, so the first run after deploy doesn't charge them again.
+INSERT INTO subscription_postings (subscription_id, year, month)
+SELECT DISTINCT s.id, EXTRACT(YEAR FROM e.date)::INT, EXTRACT(MONTH FROM e.date)::INT
+FROM subscriptions s
+JOIN expenses e ON e.user_id = s.user_id AND e.description = s.service_name || ' (subscription)'
+ON CONFLICT (subscription_id, year, month) DO NOTHING;
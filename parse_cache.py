@@ -0,0 +1,166 @@
+import asyncio
+import functools
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+
+# Lookups between writes of the hit/miss counters and last_used times
+USAGE_FLUSH_EVERY = 100
+
+class ParseCache:
+    """Persistent normalized-text -> parsed-result cache for expense messages
+    
+    Stored in a local SQLite file so repeats survive restarts. Entries expire
+    after ttl_seconds and the least recently used ones are evicted once the
+    cache holds more than max_entries. The whole cache is dropped when the
+    fingerprint changes (e.g. EXPENSE_CATEGORIES was edited, so old answers
+    may point at categories the prompt no longer offers).
+    
+    get() only reads. Hit/miss counts and last_used times are kept in memory
+    and written with the next put(), or every usage_flush_every lookups, so
+    a lookup doesn't commit on the event loop; put_async() runs the write on
+    the cache's own worker thread. The file is in WAL mode with
+    synchronous=NORMAL: losing the last few entries in a power cut only
+    costs a Gemini call.
+    """
+    
+    def __init__(self, path, fingerprint, max_entries=5000, ttl_seconds=30 * 86400, usage_flush_every=USAGE_FLUSH_EVERY):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.usage_flush_every = usage_flush_every
+        self._lock = threading.Lock()
+        self._touched = {}  # key -> last_used not written yet
+        self._pending = {"hits": 0, "misses": 0}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="parse-cache")
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS parse_cache (
+                key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_parse_cache_last_used ON parse_cache (last_used);
+            CREATE TABLE IF NOT EXISTS parse_cache_meta (
+                name TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+        self._check_fingerprint(hashlib.sha256(fingerprint.encode("utf-8")).hexdigest())
+    
+    @staticmethod
+    def normalize(text):
+        """Normalize message text so trivial variations share one entry"""
+        return " ".join(unicodedata.normalize("NFC", text).lower().split())
+    
+    def get(self, text):
+        """Return the cached result for text, or None on a miss"""
+        key = self.normalize(text)
+        now = time.time()
+        
+        with self._lock:
+            row = self._conn.execute("SELECT result, created_at FROM parse_cache WHERE key = ?", (key,)).fetchone()
+            
+            # Expired entries are left for put() to delete
+            if row and now - row[1] > self.ttl_seconds:
+                row = None
+            
+            if row:
+                self._touched[key] = now
+                self._pending["hits"] += 1
+            else:
+                self._pending["misses"] += 1
+            
+            if self._pending["hits"] + self._pending["misses"] >= self.usage_flush_every:
+                self._write_usage()
+                self._conn.commit()
+        
+        return json.loads(row[0]) if row else None
+    
+    def put(self, text, result):
+        """Store a parsed result, evicting least recently used entries if full"""
+        key = self.normalize(text)
+        now = time.time()
+        
+        with self._lock:
+            self._write_usage()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO parse_cache (key, result, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(result, ensure_ascii=False), now, now)
+            )
+            self._conn.execute("DELETE FROM parse_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                "DELETE FROM parse_cache WHERE key IN ("
+                "SELECT key FROM parse_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+    
+    async def put_async(self, text, result):
+        """put() on the cache's worker thread, so the commit doesn't block the event loop"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, functools.partial(self.put, text, result))
+    
+    def clear(self):
+        """Drop all cached results and reset statistics"""
+        with self._lock:
+            self._touched.clear()
+            self._pending = {"hits": 0, "misses": 0}
+            self._conn.execute("DELETE FROM parse_cache")
+            self._conn.execute("DELETE FROM parse_cache_meta WHERE name IN ('hits', 'misses')")
+            self._conn.commit()
+    
+    def stats(self):
+        """Get hit/miss counters (persisted across restarts) and current size"""
+        with self._lock:
+            self._write_usage()
+            self._conn.commit()
+            counters = dict(self._conn.execute(
+                "SELECT name, value FROM parse_cache_meta WHERE name IN ('hits', 'misses')"
+            ).fetchall())
+            size = self._conn.execute("SELECT COUNT(*) FROM parse_cache").fetchone()[0]
+        
+        hits = int(counters.get("hits", 0))
+        misses = int(counters.get("misses", 0))
+        lookups = hits + misses
+        
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "size": size
+        }
+    
+    def _write_usage(self):
+        """Add pending counter increments and last_used times (caller holds the lock and commits)"""
+        for name, count in self._pending.items():
+            if count:
+                self._conn.execute(
+                    "INSERT INTO parse_cache_meta (name, value) VALUES (?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET value = CAST(value AS INTEGER) + ?",
+                    (name, str(count), count)
+                )
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE parse_cache SET last_used = ? WHERE key = ?",
+                [(last_used, key) for key, last_used in self._touched.items()]
+            )
+        self._touched.clear()
+        self._pending = {"hits": 0, "misses": 0}
+    
+    def _check_fingerprint(self, fingerprint):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM parse_cache_meta WHERE name = 'fingerprint'").fetchone()
+            if not row or row[0] != fingerprint:
+                self._conn.execute("DELETE FROM parse_cache")
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO parse_cache_meta (name, value) VALUES ('fingerprint', ?)",
+                    (fingerprint,)
+                )
+                self._conn.commit()
\ No newline at end of file
@@ -0,0 +1,126 @@
+import asyncio
+import contextlib
+import logging
+import time
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from config import TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE, TELEGRAM_CHAT_BURST, TELEGRAM_MAX_RETRIES
+
+# Group chats have a lower limit than private chats (20 messages per minute)
+GROUP_CHAT_RATE = 20 / 60
+
+# Per-chat buckets kept before idle (full) ones are dropped
+MAX_CHAT_BUCKETS = 1000
+
+# Requests that are not sends and must never wait behind them
+UNLIMITED_ENDPOINTS = {"getUpdates", "setWebhook", "deleteWebhook", "getMe", "close", "logOut"}
+
+class TokenBucket:
+    """Allows rate tokens per second with bursts of up to capacity
+    
+    acquire() waits for a token. Waiters are served in arrival order (the
+    lock is held while sleeping), so a chat's messages keep their order.
+    """
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def is_idle(self):
+        """True when the bucket is full and nobody waits on it (safe to drop)"""
+        self._refill()
+        return self.tokens >= self.capacity and not self._lock.locked()
+    
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+class TokenBucketRateLimiter(BaseRateLimiter):
+    """Outbound send queue: keeps requests under Telegram's global and per-chat limits
+    
+    Every send waits for a token from its chat's bucket (1 message/second
+    with a small burst for private chats, 20/minute for groups) and then
+    from the global bucket (30 messages/second), instead of being sent and
+    rejected with 429. A RetryAfter that still happens pauses all sends
+    for the requested time and retries, up to max_retries times.
+    
+    A rate of 0 disables that limit.
+    """
+    
+    def __init__(self, global_rate=TELEGRAM_GLOBAL_RATE, chat_rate=TELEGRAM_CHAT_RATE,
+                 chat_burst=TELEGRAM_CHAT_BURST, max_retries=TELEGRAM_MAX_RETRIES):
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_rate, global_rate) if global_rate else None
+        self._chats = {}
+        self._resume = asyncio.Event()  # cleared while waiting out a RetryAfter
+        self._resume.set()
+    
+    async def initialize(self):
+        """Nothing to set up"""
+    
+    async def shutdown(self):
+        """Nothing to tear down"""
+    
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= MAX_CHAT_BUCKETS:
+                for idle_chat in [key for key, value in self._chats.items() if value.is_idle()]:
+                    del self._chats[idle_chat]
+            
+            # Negative ids (and @channel names) are groups/channels
+            if isinstance(chat_id, str) or chat_id < 0:
+                bucket = TokenBucket(GROUP_CHAT_RATE, 1)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+    
+    async def _wait_for_slot(self, endpoint, data):
+        if endpoint in UNLIMITED_ENDPOINTS:
+            return
+        
+        await self._resume.wait()
+        
+        chat_id = data.get("chat_id")
+        with contextlib.suppress(ValueError, TypeError):
+            chat_id = int(chat_id)
+        if chat_id is not None and self.chat_rate:
+            await self._chat_bucket(chat_id).acquire()
+        
+        if self._global:
+            await self._global.acquire()
+    
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        max_retries = rate_limit_args or self.max_retries
+        
+        for attempt in range(max_retries + 1):
+            await self._wait_for_slot(endpoint, data)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt == max_retries:
+                    raise
+                logging.warning(f"Telegram rate limit hit on {endpoint}; pausing sends for {e.retry_after}s")
+                self._resume.clear()
+                try:
+                    await asyncio.sleep(e.retry_after + 0.1)
+                finally:
+                    self._resume.set()
\ No newline at end of file
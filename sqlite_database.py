@@ -0,0 +1,569 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from config import ACCOUNT_DESCRIPTIONS
+
+# Same defaults as DatabaseManager in database.py
+EXPENSE_SUMMARY_COLUMNS = "amount, category, date, description"
+INCOME_SUMMARY_COLUMNS = "amount, income_type, date, description"
+ALL_ACCOUNT_TYPES = list(ACCOUNT_DESCRIPTIONS.keys())
+
+# Columns stored as 0/1 that the handlers expect back as bool
+BOOLEAN_COLUMNS = {"purchased"}
+
+# Mirrors the Supabase tables (plus migrations/001-004)
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS users (
+        telegram_id INTEGER PRIMARY KEY,
+        first_name TEXT,
+        username TEXT,
+        created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+    );
+    
+    CREATE TABLE IF NOT EXISTS expenses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        amount REAL NOT NULL,
+        description TEXT,
+        category TEXT NOT NULL,
+        date TEXT NOT NULL,
+        created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+    );
+    CREATE INDEX IF NOT EXISTS idx_expenses_user_date ON expenses (user_id, date);
+    CREATE INDEX IF NOT EXISTS idx_expenses_user_category_date ON expenses (user_id, category, date);
+    
+    CREATE TABLE IF NOT EXISTS income (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        amount REAL NOT NULL,
+        income_type TEXT,
+        description TEXT,
+        date TEXT NOT NULL,
+        created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+    );
+    CREATE INDEX IF NOT EXISTS idx_income_user_date ON income (user_id, date);
+    
+    CREATE TABLE IF NOT EXISTS savings (
+        user_id INTEGER PRIMARY KEY,
+        current_amount REAL NOT NULL DEFAULT 0,
+        last_updated TEXT
+    );
+    
+    CREATE TABLE IF NOT EXISTS wishlist (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        item_name TEXT NOT NULL,
+        estimated_price REAL,
+        priority INTEGER,
+        purchased INTEGER NOT NULL DEFAULT 0,
+        created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+    );
+    CREATE INDEX IF NOT EXISTS idx_wishlist_user ON wishlist (user_id);
+    
+    CREATE TABLE IF NOT EXISTS subscriptions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        service_name TEXT NOT NULL,
+        amount REAL NOT NULL,
+        billing_cycle TEXT,
+        created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+    );
+    CREATE INDEX IF NOT EXISTS idx_subscriptions_user ON subscriptions (user_id);
+    
+    CREATE TABLE IF NOT EXISTS subscription_postings (
+        subscription_id INTEGER NOT NULL,
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+        PRIMARY KEY (subscription_id, year, month)
+    );
+    
+    CREATE TABLE IF NOT EXISTS budget_plans (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        category TEXT NOT NULL,
+        budget_amount REAL NOT NULL,
+        created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+        UNIQUE (user_id, category)
+    );
+    
+    CREATE TABLE IF NOT EXISTS accounts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        account_type TEXT NOT NULL,
+        current_balance REAL NOT NULL DEFAULT 0,
+        last_updated TEXT,
+        UNIQUE (user_id, account_type)
+    );
+    
+    CREATE TABLE IF NOT EXISTS allocation_settings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        account_type TEXT NOT NULL,
+        percentage REAL NOT NULL,
+        UNIQUE (user_id, account_type)
+    );
+    
+    CREATE TABLE IF NOT EXISTS account_transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        account_type TEXT NOT NULL,
+        transaction_type TEXT,
+        amount REAL NOT NULL,
+        description TEXT,
+        reference_id INTEGER,
+        created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+    );
+    CREATE INDEX IF NOT EXISTS idx_account_transactions_user_type ON account_transactions (user_id, account_type, created_at);
+    
+    CREATE TABLE IF NOT EXISTS monthly_closures (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        total_income REAL,
+        total_expenses REAL,
+        net_savings REAL,
+        need_balance_before REAL,
+        fun_balance_before REAL,
+        saving_balance_before REAL,
+        invest_balance_before REAL,
+        construction_balance_before REAL,
+        transferred_to_savings REAL,
+        created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+    );
+    CREATE INDEX IF NOT EXISTS idx_monthly_closures_user_period ON monthly_closures (user_id, year, month);
+    
+    CREATE TABLE IF NOT EXISTS account_balance_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        need_balance REAL,
+        fun_balance REAL,
+        saving_balance REAL,
+        invest_balance REAL,
+        construction_balance REAL,
+        created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+    );
+    CREATE INDEX IF NOT EXISTS idx_balance_history_user_period ON account_balance_history (user_id, year, month);
+    
+    CREATE TABLE IF NOT EXISTS monthly_rollups (
+        user_id INTEGER NOT NULL,
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        category TEXT NOT NULL,
+        total REAL NOT NULL DEFAULT 0,
+        entry_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, year, month, kind, category)
+    );
+"""
+
+# Claim months already posted by the old /summary flow (see migrations/006)
+SUBSCRIPTION_POSTINGS_BACKFILL_SQL = """
+    INSERT OR IGNORE INTO subscription_postings (subscription_id, year, month)
+    SELECT DISTINCT s.id, CAST(substr(e.date, 1, 4) AS INTEGER), CAST(substr(e.date, 6, 2) AS INTEGER)
+    FROM subscriptions s
+    JOIN expenses e ON e.user_id = s.user_id AND e.description = s.service_name || ' (subscription)'
+"""
+
+ROLLUP_BUMP_SQL = """
+    INSERT INTO monthly_rollups (user_id, year, month, kind, category, total, entry_count)
+    VALUES (?, CAST(substr(?, 1, 4) AS INTEGER), CAST(substr(?, 6, 2) AS INTEGER), ?, ?, ?, 1)
+    ON CONFLICT (user_id, year, month, kind, category)
+    DO UPDATE SET total = total + excluded.total, entry_count = entry_count + 1
+"""
+
+class QueryResult:
+    """Stand-in for the Supabase APIResponse - handlers only read .data"""
+    
+    def __init__(self, data):
+        self.data = data
+
+class SQLiteDatabaseManager:
+    """DatabaseManager backed by a local SQLite file instead of Supabase
+    
+    Same method surface and return shapes as DatabaseManager, so it can sit
+    behind AsyncDatabaseManager and CachedDatabaseManager unchanged. The
+    Postgres functions from migrations/ (account deltas, rollups) are done
+    as local transactions. WAL mode with synchronous=NORMAL keeps commits cheap.
+    Select it with DATABASE_BACKEND=sqlite.
+    """
+    
+    def __init__(self, path):
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        with self._transaction() as conn:
+            conn.execute(SUBSCRIPTION_POSTINGS_BACKFILL_SQL)
+    
+    def close(self):
+        """Close the underlying connection"""
+        with self._lock:
+            self._conn.close()
+    
+    # ----- generic helpers -----
+    
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            try:
+                yield self._conn
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+    
+    @staticmethod
+    def _param(value):
+        if isinstance(value, (date, datetime)):
+            return value.isoformat()
+        if isinstance(value, bool):
+            return int(value)
+        return value
+    
+    @staticmethod
+    def _row(row):
+        data = dict(row)
+        for column in BOOLEAN_COLUMNS & data.keys():
+            data[column] = bool(data[column])
+        return data
+    
+    @staticmethod
+    def _columns(columns):
+        if columns.strip() == "*":
+            return "*"
+        return ", ".join(f'"{column.strip()}"' for column in columns.split(","))
+    
+    def _select(self, table, where, columns="*", order=None, limit=None, ranges=None):
+        """SELECT with equality filters, optional (column, low, high) ranges, ORDER BY and LIMIT"""
+        clauses = [f'"{column}" = ?' for column in where]
+        params = [self._param(value) for value in where.values()]
+        
+        for column, low, high in ranges or []:
+            clauses.append(f'"{column}" BETWEEN ? AND ?')
+            params += [self._param(low), self._param(high)]
+        
+        sql = f'SELECT {self._columns(columns)} FROM "{table}"'
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        if order:
+            sql += " ORDER BY " + ", ".join(order)
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return QueryResult([self._row(row) for row in rows])
+    
+    def _write(self, conn, table, row, conflict=None, update=True):
+        """INSERT one row; with conflict columns, upsert (or skip duplicates if update=False)"""
+        columns = list(row)
+        column_list = ", ".join(f'"{column}"' for column in columns)
+        placeholders = ", ".join("?" for _ in columns)
+        sql = f'INSERT INTO "{table}" ({column_list}) VALUES ({placeholders})'
+        
+        if conflict:
+            updates = [column for column in columns if column not in conflict]
+            if update and updates:
+                sql += f" ON CONFLICT ({', '.join(conflict)}) DO UPDATE SET " + ", ".join(f"{c} = excluded.{c}" for c in updates)
+            else:
+                sql += f" ON CONFLICT ({', '.join(conflict)}) DO NOTHING"
+        
+        cursor = conn.execute(sql + " RETURNING *", [self._param(row[column]) for column in columns])
+        return [self._row(r) for r in cursor.fetchall()]
+    
+    def _insert(self, table, rows, conflict=None, update=True):
+        rows = rows if isinstance(rows, list) else [rows]
+        with self._transaction() as conn:
+            inserted = []
+            for row in rows:
+                inserted += self._write(conn, table, row, conflict, update)
+        return QueryResult(inserted)
+    
+    def _delete(self, table, where):
+        clauses = " AND ".join(f'"{column}" = ?' for column in where)
+        with self._transaction() as conn:
+            rows = conn.execute(f'DELETE FROM "{table}" WHERE {clauses} RETURNING *', [self._param(v) for v in where.values()]).fetchall()
+        return QueryResult([self._row(row) for row in rows])
+    
+    # ----- users, expenses, income -----
+    
+    def register_user(self, user_data):
+        """Register new user"""
+        return self._insert("users", user_data, conflict=["telegram_id"])
+    
+    def insert_expense(self, expense_data):
+        """Insert expense record (and bump its monthly rollup)"""
+        return self.insert_expenses([expense_data])
+    
+    def insert_expenses(self, expenses_data):
+        """Insert several expense records in one transaction (and bump their monthly rollups)"""
+        with self._transaction() as conn:
+            inserted = []
+            for expense in expenses_data:
+                inserted += self._write(conn, "expenses", expense)
+            self._bump_rollups(conn, "expense", inserted)
+        return QueryResult(inserted)
+    
+    def insert_income(self, income_data):
+        """Insert income record (and bump its monthly rollup)"""
+        with self._transaction() as conn:
+            inserted = self._write(conn, "income", income_data)
+            self._bump_rollups(conn, "income", inserted)
+        return QueryResult(inserted)
+    
+    def get_monthly_rollups(self, user_id, year, month):
+        """Get pre-aggregated expense/income totals for one month"""
+        return self._select("monthly_rollups", {"user_id": user_id, "year": year, "month": month}, "kind, category, total, entry_count")
+    
+    def rebuild_monthly_rollups(self, user_id):
+        """Recompute all of a user's monthly rollups from raw expenses and income"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM monthly_rollups WHERE user_id = ?", (user_id,))
+            conn.execute("""
+                INSERT INTO monthly_rollups (user_id, year, month, kind, category, total, entry_count)
+                SELECT user_id, CAST(substr(date, 1, 4) AS INTEGER), CAST(substr(date, 6, 2) AS INTEGER),
+                       'expense', category, SUM(amount), COUNT(*)
+                FROM expenses WHERE user_id = ?
+                GROUP BY user_id, substr(date, 1, 7), category
+            """, (user_id,))
+            conn.execute("""
+                INSERT INTO monthly_rollups (user_id, year, month, kind, category, total, entry_count)
+                SELECT user_id, CAST(substr(date, 1, 4) AS INTEGER), CAST(substr(date, 6, 2) AS INTEGER),
+                       'income', COALESCE(income_type, 'random'), SUM(amount), COUNT(*)
+                FROM income WHERE user_id = ?
+                GROUP BY user_id, substr(date, 1, 7), COALESCE(income_type, 'random')
+            """, (user_id,))
+        return QueryResult(None)
+    
+    def _bump_rollups(self, conn, kind, rows):
+        """Add freshly inserted rows to monthly_rollups inside the insert's transaction"""
+        conn.executemany(ROLLUP_BUMP_SQL, [(
+            row["user_id"], row["date"], row["date"], kind,
+            row["category"] if kind == "expense" else (row.get("income_type") or "random"),
+            float(row["amount"])
+        ) for row in rows])
+    
+    def get_savings(self, user_id):
+        """Get user's current savings"""
+        return self._select("savings", {"user_id": user_id})
+    
+    def upsert_savings(self, savings_data):
+        """Update or insert savings"""
+        return self._insert("savings", savings_data, conflict=["user_id"])
+    
+    def get_expenses_by_category(self, user_id, category, month_start, month_end, columns=EXPENSE_SUMMARY_COLUMNS):
+        """Get expenses for one category between month_start and month_end (inclusive)"""
+        return self._select("expenses", {"user_id": user_id, "category": category}, columns, ranges=[("date", month_start, month_end)])
+    
+    def get_monthly_expenses(self, user_id, month_start, month_end, columns=EXPENSE_SUMMARY_COLUMNS):
+        """Get all expenses between month_start and month_end (inclusive)"""
+        return self._select("expenses", {"user_id": user_id}, columns, ranges=[("date", month_start, month_end)])
+    
+    def get_expenses_by_date(self, user_id, target_date, category=None):
+        """Get expenses for a specific date, optionally for one category"""
+        where = {"user_id": user_id, "date": target_date}
+        if category:
+            where["category"] = category
+        return self._select("expenses", where)
+    
+    def get_monthly_income(self, user_id, month_start, month_end, columns=INCOME_SUMMARY_COLUMNS):
+        """Get all income between month_start and month_end (inclusive)"""
+        return self._select("income", {"user_id": user_id}, columns, ranges=[("date", month_start, month_end)])
+    
+    # ----- wishlist, subscriptions, budgets -----
+    
+    def insert_wishlist_item(self, wishlist_data):
+        """Add item to wishlist"""
+        return self._insert("wishlist", wishlist_data)
+    
+    def get_wishlist(self, user_id):
+        """Get user's wishlist"""
+        return self._select("wishlist", {"user_id": user_id})
+    
+    def delete_wishlist_item(self, item_id):
+        """Delete wishlist item"""
+        return self._delete("wishlist", {"id": item_id})
+    
+    def insert_subscription(self, subscription_data):
+        """Add subscription"""
+        return self._insert("subscriptions", subscription_data)
+    
+    def get_subscriptions(self, user_id):
+        """Get user's subscriptions"""
+        return self._select("subscriptions", {"user_id": user_id})
+    
+    def delete_subscription(self, subscription_id):
+        """Delete subscription"""
+        return self._delete("subscriptions", {"id": subscription_id})
+    
+    def get_all_active_subscriptions(self):
+        """Get all subscriptions for monthly processing"""
+        return self._select("subscriptions", {})
+    
+    def post_subscription_expenses(self, year, month, posting_date, category, description_suffix):
+        """Claim the month's postings and insert their expenses in one transaction (post_subscription_expenses equivalent)"""
+        with self._transaction() as conn:
+            subscriptions = [self._row(row) for row in conn.execute("SELECT * FROM subscriptions").fetchall()]
+            inserted = []
+            for subscription in subscriptions:
+                claim = {"subscription_id": subscription["id"], "year": year, "month": month}
+                if not self._write(conn, "subscription_postings", claim, conflict=["subscription_id", "year", "month"], update=False):
+                    continue  # already posted this month
+                inserted += self._write(conn, "expenses", {
+                    "user_id": subscription["user_id"],
+                    "amount": subscription["amount"],
+                    "description": subscription["service_name"] + description_suffix,
+                    "category": category,
+                    "date": posting_date.isoformat()
+                })
+            self._bump_rollups(conn, "expense", inserted)
+        return QueryResult(inserted)
+    
+    def insert_budget_plan(self, budget_data):
+        """Insert or update budget plan"""
+        return self._insert("budget_plans", budget_data, conflict=["user_id", "category"])
+    
+    def get_budget_plans(self, user_id):
+        """Get all budget plans for user"""
+        return self._select("budget_plans", {"user_id": user_id})
+    
+    def get_budget_plan_by_category(self, user_id, category):
+        """Get budget plan for specific category"""
+        return self._select("budget_plans", {"user_id": user_id, "category": category})
+    
+    # ----- accounts -----
+    
+    def get_accounts(self, user_id):
+        """Get all accounts for user"""
+        return self._select("accounts", {"user_id": user_id})
+    
+    def get_account_balances(self, user_id):
+        """Get {account_type: balance} for all account types, creating missing accounts at 0"""
+        accounts_data = self.get_accounts(user_id)
+        balances = {acc["account_type"]: float(acc.get("current_balance", 0)) for acc in accounts_data.data}
+        
+        missing_types = [account_type for account_type in ALL_ACCOUNT_TYPES if account_type not in balances]
+        if missing_types:
+            now = datetime.now().isoformat()
+            self._insert("accounts", [{
+                "user_id": user_id,
+                "account_type": account_type,
+                "current_balance": 0,
+                "last_updated": now
+            } for account_type in missing_types], conflict=["user_id", "account_type"], update=False)
+            
+            for account_type in missing_types:
+                balances[account_type] = 0.0
+        
+        return balances
+    
+    def upsert_account(self, account_data):
+        """Insert or update account record"""
+        return self._insert("accounts", account_data, conflict=["user_id", "account_type"])
+    
+    def update_account_balance(self, user_id, account_type, amount_change, transaction_type, description, reference_id=None):
+        """Apply one balance change and log the transaction atomically (apply_account_delta equivalent)"""
+        try:
+            with self._transaction() as conn:
+                new_balance = self._apply_delta(conn, user_id, account_type, amount_change, transaction_type, description, reference_id)
+            return QueryResult(new_balance), new_balance
+        except Exception as e:
+            print(f"Update account balance error: {e}")
+            raise e
+    
+    def apply_account_deltas(self, user_id, deltas):
+        """Apply several account balance changes in one transaction (apply_account_deltas equivalent)"""
+        if not deltas:
+            return None, {}
+        
+        try:
+            new_balances = {}
+            with self._transaction() as conn:
+                for delta in deltas:
+                    new_balances[delta["account_type"]] = self._apply_delta(
+                        conn, user_id, delta["account_type"], delta["amount"],
+                        delta["transaction_type"], delta["description"], delta.get("reference_id")
+                    )
+            return QueryResult(new_balances), new_balances
+        except Exception as e:
+            print(f"Apply account deltas error: {e}")
+            raise e
+    
+    def _apply_delta(self, conn, user_id, account_type, amount, transaction_type, description, reference_id):
+        now = datetime.now().isoformat()
+        balance = conn.execute("""
+            INSERT INTO accounts (user_id, account_type, current_balance, last_updated) VALUES (?, ?, ?, ?)
+            ON CONFLICT (user_id, account_type)
+            DO UPDATE SET current_balance = current_balance + excluded.current_balance, last_updated = excluded.last_updated
+            RETURNING current_balance
+        """, (user_id, account_type, amount, now)).fetchone()[0]
+        
+        conn.execute(
+            "INSERT INTO account_transactions (user_id, account_type, transaction_type, amount, description, reference_id) VALUES (?, ?, ?, ?, ?, ?)",
+            (user_id, account_type, transaction_type, amount, description, reference_id)
+        )
+        return float(balance)
+    
+    def get_account_by_type(self, user_id, account_type):
+        """Get specific account by type"""
+        return self._select("accounts", {"user_id": user_id, "account_type": account_type})
+    
+    def get_allocation_settings(self, user_id):
+        """Get user's allocation percentages"""
+        return self._select("allocation_settings", {"user_id": user_id})
+    
+    def upsert_allocation_setting(self, allocation_data):
+        """Insert or update allocation setting"""
+        return self._insert("allocation_settings", allocation_data, conflict=["user_id", "account_type"])
+    
+    def insert_account_transaction(self, transaction_data):
+        """Insert account transaction log"""
+        return self._insert("account_transactions", transaction_data)
+    
+    def get_account_transactions(self, user_id, account_type=None, limit=50):
+        """Get account transaction history"""
+        where = {"user_id": user_id}
+        if account_type:
+            where["account_type"] = account_type
+        return self._select("account_transactions", where, order=["created_at DESC", "id DESC"], limit=limit)
+    
+    def get_account_balance(self, user_id, account_type):
+        """Get current balance for specific account"""
+        account_data = self.get_account_by_type(user_id, account_type)
+        if account_data.data:
+            return float(account_data.data[0].get("current_balance", 0))
+        return 0
+    
+    # ----- month end -----
+    
+    def check_monthly_closure(self, user_id, year, month):
+        """Check if month is already closed"""
+        return self._select("monthly_closures", {"user_id": user_id, "year": year, "month": month})
+    
+    def insert_monthly_closure(self, closure_data):
+        """Insert monthly closure record"""
+        return self._insert("monthly_closures", closure_data)
+    
+    def get_monthly_closures_history(self, user_id, limit=6):
+        """Get monthly closures history for user"""
+        return self._select("monthly_closures", {"user_id": user_id}, order=["year DESC", "month DESC"], limit=limit)
+    
+    def get_monthly_closure_by_period(self, user_id, year, month):
+        """Get specific monthly closure"""
+        return self._select("monthly_closures", {"user_id": user_id, "year": year, "month": month})
+    
+    def insert_account_balance_history(self, history_data):
+        """Insert account balance history record"""
+        return self._insert("account_balance_history", history_data)
+    
+    def get_balance_history(self, user_id, limit=6):
+        """Get account balance history for user"""
+        return self._select("account_balance_history", {"user_id": user_id}, order=["year DESC", "month DESC"], limit=limit)
\ No newline at end of file
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import random
+import signal
+import time
+from collections import deque
+
+from config import (
+    SUPERVISOR_BACKOFF_BASE, SUPERVISOR_BACKOFF_MAX, SUPERVISOR_MAX_RESTARTS,
+    SUPERVISOR_RESTART_WINDOW, SUPERVISOR_HEALTHY_AFTER
+)
+
+class RestartLimitExceeded(RuntimeError):
+    """Raised when the bot crashed more often than the restart budget allows"""
+
+def backoff_delay(failures, base=SUPERVISOR_BACKOFF_BASE, cap=SUPERVISOR_BACKOFF_MAX):
+    """Exponential backoff with full jitter: uniform in [0, min(cap, base * 2^(failures-1))]"""
+    return random.uniform(0, min(cap, base * 2 ** max(failures - 1, 0)))
+
+def install_signal_handlers(stop_event):
+    """Set stop_event on SIGTERM/SIGINT (redeploys send SIGTERM)"""
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # not supported on this platform/thread; Ctrl+C still raises KeyboardInterrupt
+
+class Supervisor:
+    """Keeps the bot running in one process and event loop
+    
+    run() awaits start() until stop_event is set. When start() raises (or
+    returns without a stop being requested) it is started again after a
+    jittered exponential backoff. Everything built at import time - database
+    clients, caches, the Gemini model, the Application and its handlers -
+    stays warm across restarts. Consecutive failures reset once a run stays
+    up for healthy_after seconds; more than max_restarts restarts within
+    window seconds raises RestartLimitExceeded.
+    """
+    
+    def __init__(self, max_restarts=SUPERVISOR_MAX_RESTARTS, window=SUPERVISOR_RESTART_WINDOW,
+                 healthy_after=SUPERVISOR_HEALTHY_AFTER, fatal=()):
+        self.max_restarts = max_restarts
+        self.window = window
+        self.healthy_after = healthy_after
+        self.fatal = tuple(fatal)  # exception types that are never retried
+        self.failures = 0
+        self._restarts = deque()  # monotonic times of recent restarts
+    
+    async def run(self, start, stop_event):
+        while not stop_event.is_set():
+            started = time.monotonic()
+            try:
+                await start()
+                if stop_event.is_set():
+                    return
+                logging.warning("Bot stopped without a shutdown request")
+            except self.fatal:
+                raise
+            except Exception as e:
+                logging.exception(f"Bot crashed: {e}")
+            
+            if stop_event.is_set():
+                return
+            
+            now = time.monotonic()
+            if now - started >= self.healthy_after:
+                self.failures = 0
+            self.failures += 1
+            
+            self._restarts.append(now)
+            while self._restarts and now - self._restarts[0] > self.window:
+                self._restarts.popleft()
+            if len(self._restarts) > self.max_restarts:
+                raise RestartLimitExceeded(f"{len(self._restarts)} restarts in the last {self.window}s")
+            
+            delay = backoff_delay(self.failures)
+            logging.warning(f"Restarting in {delay:.1f}s (failure {self.failures}, {len(self._restarts)}/{self.max_restarts} restarts in window)")
+            try:
+                await asyncio.wait_for(stop_event.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
\ No newline at end of file
@@ -0,0 +1,211 @@
+import re
+import unicodedata
+from collections import defaultdict
+
+from config import CATEGORY_ALIASES, EXPENSE_CATEGORIES, ACCOUNT_DESCRIPTIONS, WISHLIST_PRIORITIES
+
+# Scores at or above this are a match; below MIN_SCORE there is no match at all
+MATCH_SCORE = 0.6
+MIN_SCORE = 0.3
+
+# A match must beat the runner-up by this much to be unambiguous
+MATCH_MARGIN = 0.1
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+def fold(text):
+    """Lowercase and strip Vietnamese diacritics: "Sofa Gỗ Đẹp" -> "sofa go dep"
+    
+    Punctuation becomes a single space, so "iphone-15" and "iPhone 15" fold
+    to the same text.
+    """
+    decomposed = unicodedata.normalize("NFD", str(text).replace("đ", "d").replace("Đ", "D"))
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _NON_WORD.sub(" ", stripped.lower()).strip()
+
+def trigrams(folded):
+    """Character trigrams of each word, padded so short words still get some"""
+    grams = set()
+    for word in folded.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def token_overlap(query_tokens, tokens):
+    """Fraction of query tokens found among tokens (a token may match as a prefix: "ip" -> "iphone")"""
+    if not query_tokens:
+        return 0.0
+    found = sum(
+        1 for query in query_tokens
+        if query in tokens or (len(query) >= 2 and any(token.startswith(query) for token in tokens))
+    )
+    return found / len(query_tokens)
+
+def similarity(query, text):
+    """Score in [0, 1] between two folded strings"""
+    if not query or not text:
+        return 0.0
+    if query == text:
+        return 1.0
+    
+    query_grams = trigrams(query)
+    text_grams = trigrams(text)
+    dice = 2 * len(query_grams & text_grams) / (len(query_grams) + len(text_grams))
+    overlap = token_overlap(query.split(), text.split())
+    score = 0.5 * dice + 0.5 * overlap
+    
+    # Whole-word containment ("sofa" in "sofa go cao cap") is a strong signal
+    if f" {query} " in f" {text} ":
+        score = max(score, 0.85)
+    return score
+
+class FuzzyIndex:
+    """Prebuilt trigram index over a list of items, ranked by similarity()
+    
+    Items are folded and split into trigrams once; search() only scores
+    items sharing at least one trigram with the query.
+    """
+    
+    def __init__(self, items, key=lambda item: item):
+        self.items = list(items)
+        self._folded = [fold(key(item)) for item in self.items]
+        self._postings = defaultdict(set)  # trigram -> item positions
+        for position, folded in enumerate(self._folded):
+            for gram in trigrams(folded):
+                self._postings[gram].add(position)
+    
+    def __len__(self):
+        return len(self.items)
+    
+    def search(self, query, limit=5):
+        """Get up to limit (score, item) pairs with score >= MIN_SCORE, best first"""
+        folded_query = fold(query)
+        candidates = set()
+        for gram in trigrams(folded_query):
+            candidates |= self._postings.get(gram, set())
+        
+        scored = []
+        for position in candidates:
+            score = similarity(folded_query, self._folded[position])
+            if score >= MIN_SCORE:
+                scored.append((score, position))
+        
+        scored.sort(key=lambda pair: (-pair[0], pair[1]))
+        return [(score, self.items[position]) for score, position in scored[:limit]]
+    
+    def best_match(self, query, limit=5):
+        """Get (item or None, candidates, ambiguous)
+        
+        item is set when the top score is at least MATCH_SCORE and clearly
+        ahead of the runner-up. ambiguous is True when there are candidates
+        but no clear winner, for the caller to settle (e.g. with Gemini).
+        """
+        candidates = self.search(query, limit)
+        if not candidates:
+            return None, candidates, False
+        
+        top_score = candidates[0][0]
+        runner_up = candidates[1][0] if len(candidates) > 1 else 0.0
+        if top_score >= MATCH_SCORE and top_score - runner_up >= MATCH_MARGIN:
+            return candidates[0][1], candidates, False
+        return None, candidates, True
+
+class PrefixTrie:
+    """Maps every prefix of the inserted keys to the set of values under it
+    
+    Each node stores its values, so a lookup costs O(len(prefix)).
+    """
+    
+    def __init__(self):
+        self._root = {}
+    
+    def insert(self, key, value):
+        node = self._root
+        for char in key:
+            node = node.setdefault(char, {})
+            node.setdefault(None, set()).add(value)
+    
+    def values(self, prefix):
+        node = self._root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return set()
+        return node.get(None, set())
+
+class NameResolver:
+    """Resolves what users type to one canonical name ("an uong", "an", "food" -> "ăn uống")
+    
+    In order: an exact alias (folded, with or without spaces); a prefix of
+    one alias or of any word inside it ("uong" -> "ăn uống") that points to
+    a single name; a clear fuzzy winner for typos. Anything ambiguous
+    resolves to None. With exact=True only the first step is tried.
+    """
+    
+    def __init__(self, aliases, fuzzy_score=0.5):
+        self.fuzzy_score = fuzzy_score  # names are short, so typos score lower than in FuzzyIndex
+        self._exact = {}
+        self._trie = PrefixTrie()
+        alias_items = []
+        for name, names in aliases.items():
+            for alias in [name, *names]:
+                folded = fold(alias)
+                if not folded:
+                    continue
+                self._exact.setdefault(folded, name)
+                self._exact.setdefault(folded.replace(" ", ""), name)
+                
+                words = folded.split()
+                for i in range(len(words)):
+                    self._trie.insert("".join(words[i:]), name)
+                alias_items.append((alias, name))
+        
+        self._fuzzy = FuzzyIndex(alias_items, key=lambda item: item[0])
+    
+    def resolve(self, text, exact=False):
+        folded = fold(text)
+        if not folded:
+            return None
+        
+        compact = folded.replace(" ", "")
+        name = self._exact.get(folded) or self._exact.get(compact)
+        if name or exact:
+            return name
+        
+        names = self._trie.values(compact)
+        if len(names) == 1:
+            return next(iter(names))
+        if names:
+            return None
+        
+        # Typos: best score per name, which must clearly beat the next name
+        best = {}
+        for score, (_, name) in self._fuzzy.search(folded, limit=10):
+            best[name] = max(score, best.get(name, 0.0))
+        ranked = sorted(best.values(), reverse=True)
+        if ranked and ranked[0] >= self.fuzzy_score and (len(ranked) == 1 or ranked[0] - ranked[1] >= MATCH_MARGIN):
+            return max(best, key=best.get)
+        return None
+
+# Resolvers for the names commands accept, built once from config
+category_resolver = NameResolver({
+    category: CATEGORY_ALIASES.get(category, []) for category in EXPENSE_CATEGORIES
+})
+account_resolver = NameResolver({
+    account_type: [info["name"]] for account_type, info in ACCOUNT_DESCRIPTIONS.items()
+})
+priority_resolver = NameResolver({
+    priority: [str(priority), info["name"]] for priority, info in WISHLIST_PRIORITIES.items()
+})
+
+def resolve_category(text, exact=False):
+    """Canonical expense category for text, or None (exact: only the name or an alias, folded)"""
+    return category_resolver.resolve(text, exact)
+
+def resolve_account(text):
+    """Account type (key of ACCOUNT_DESCRIPTIONS) for text, or None"""
+    return account_resolver.resolve(text)
+
+def resolve_priority(text):
+    """Wishlist priority (1-5) for a number or level name, or None"""
+    return priority_resolver.resolve(text)
\ No newline at end of file
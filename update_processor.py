@@ -0,0 +1,69 @@
+import asyncio
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+# Updates that may be waiting (queued behind their user) per running slot
+QUEUED_PER_SLOT = 64
+
+def update_key(update):
+    """Ordering key for an update: the user, else the chat, else None (unordered)"""
+    if isinstance(update, Update):
+        if update.effective_user:
+            return ("user", update.effective_user.id)
+        if update.effective_chat:
+            return ("chat", update.effective_chat.id)
+    return None
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Process updates concurrently across users but one at a time per user
+    
+    Handlers read and write a user's balances and context.user_data (e.g. the
+    pending /endmonth confirmation), so two updates from the same user must
+    not interleave. Each user gets an asyncio.Lock; asyncio locks wake waiters
+    in FIFO order, so a user's updates still run in the order they arrived.
+    
+    The running-handler limit (max_concurrent_updates) is taken only after
+    the user's lock, so a user with a backlog holds one slot while waiting
+    updates queue up behind their own lock, not in front of other users.
+    """
+    
+    def __init__(self, max_concurrent_updates):
+        # The base class semaphore only bounds how many updates are in flight
+        # (running or queued); our own semaphore bounds how many run
+        super().__init__(max_concurrent_updates * QUEUED_PER_SLOT)
+        self.max_running_updates = max_concurrent_updates
+        self._running = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self._locks = {}  # key -> [lock, number of updates holding or waiting for it]
+    
+    async def do_process_update(self, update, coroutine):
+        key = update_key(update)
+        if key is None:
+            async with self._running:
+                await coroutine
+            return
+        
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                async with self._running:
+                    await coroutine
+        finally:
+            # Drop the lock once nobody holds or waits for it
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+    
+    def stats(self):
+        """Get the number of users with running or queued updates and of queued updates"""
+        return {
+            "active_keys": len(self._locks),
+            "queued_updates": sum(count for _, count in self._locks.values()) - len(self._locks)
+        }
+    
+    async def initialize(self):
+        """Nothing to set up"""
+    
+    async def shutdown(self):
+        """Nothing to tear down"""
\ No newline at end of file
@@ -1,8 +1,20 @@
 from telegram import Update
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
+from telegram.error import BadRequest
 from config import ALLOWED_USERS
 from datetime import date, datetime, timedelta
+import asyncio
+import logging
+
+# Telegram rejects messages longer than this (in UTF-16 code units)
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+# Characters that open an entity in Telegram's legacy Markdown
+MARKDOWN_ENTITY_CHARS = "_*`["
+
+# Starts every chunk of a split message after the first
+CONTINUATION_PREFIX = "📄 *Tiếp tục...*\n\n"
 
 def is_authorized(user_id: int) -> bool:
     """Check if user is authorized"""
@@ -24,15 +36,65 @@ def parse_amount(amount_str: str) -> float:
     else:
         return float(amount_str)
 
-async def send_formatted_message(update: Update, message: str, parse_mode: ParseMode = ParseMode.MARKDOWN_V2):
-    """Send formatted message with fallback"""
+def find_unclosed_entity(text: str):
+    """Index of the first entity Telegram's (legacy) Markdown parser can't close, or None
+    
+    Follows Telegram's rules: *bold*, _italic_, `code`, ```pre``` and
+    [text](url) don't nest, and \\ escapes _ * ` [ outside an entity.
+    """
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char == "\\" and text[i + 1:i + 2] in MARKDOWN_ENTITY_CHARS:
+            i += 2
+            continue
+        if char not in MARKDOWN_ENTITY_CHARS:
+            i += 1
+            continue
+        
+        if text.startswith("```", i):
+            end = text.find("```", i + 3)
+            if end < 0:
+                return i
+            i = end + 3
+            continue
+        
+        end = text.find("]" if char == "[" else char, i + 1)
+        if end < 0:
+            return i
+        if char == "[" and text.startswith("(", end + 1):
+            end = text.find(")", end + 2)
+            if end < 0:
+                return i
+        i = end + 1
+    
+    return None
+
+def prepare_markdown(text: str) -> str:
+    """Escape stray _ * ` [ (e.g. from a description) so the text parses as Markdown"""
+    while True:
+        index = find_unclosed_entity(text)
+        if index is None:
+            return text
+        text = text[:index] + "\\" + text[index:]
+
+async def send_formatted_message(update: Update, message: str, parse_mode: ParseMode = None):
+    """Send formatted message, validated locally so the first attempt normally succeeds
+    
+    Messages are written with *bold*, _italic_ and `code`, which is Telegram's
+    legacy Markdown. Unbalanced markers are escaped before sending; if
+    Telegram still rejects the entities, the text is sent once more as plain
+    text. Pass parse_mode to skip the local check.
+    """
+    if parse_mode is None:
+        message = prepare_markdown(message)
+        parse_mode = ParseMode.MARKDOWN
+    
     try:
         await update.message.reply_text(message, parse_mode=parse_mode)
-    except Exception:
-        try:
-            await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
-        except Exception:
-            await update.message.reply_text(message)
+    except BadRequest as e:
+        logging.warning(f"Telegram rejected {parse_mode} message ({e}); sending as plain text")
+        await update.message.reply_text(message)
 
 async def check_authorization(update: Update) -> bool:
     """Check authorization and send error if needed"""
@@ -56,38 +118,136 @@ def safe_parse_amount(amount_str: str) -> tuple[bool, float, str]:
     except ValueError:
         return False, 0.0, "⛔ Số tiền không hợp lệ. Ví dụ: 50k, 1.5m, 3tr"
 
-async def send_long_message(update: Update, message: str, continuation_prefix: str = "📄 *Tiếp tục...*\n\n"):
-    """Send long message, splitting if necessary - with inlined split logic"""
-    max_length = 4000
+async def send_long_message(update: Update, message: str, continuation_prefix: str = CONTINUATION_PREFIX):
+    """Send long message, splitting at Telegram's length limit if necessary"""
+    async with MessageBuilder(update, continuation_prefix) as builder:
+        builder.add(message)
+
+def telegram_length(text: str) -> int:
+    """Length as Telegram counts it (UTF-16 code units - most emoji count twice)"""
+    return len(text.encode("utf-16-le")) // 2
+
+def _fitting_prefix_length(text, limit):
+    """Number of characters of text that fit in limit UTF-16 code units"""
+    units = 0
+    for index, char in enumerate(text):
+        units += 2 if ord(char) > 0xFFFF else 1
+        if units > limit:
+            return index
+    return len(text)
+
+def _split_markdown_line(line, limit):
+    """Cut an escaped line that is too long into (head, rest), both valid Markdown
     
-    if len(message) <= max_length:
-        chunks = [message]
-    else:
-        # Inline split logic (previously split_long_message function)
-        chunks = []
-        current_chunk = ""
-        lines = message.split('\n')
+    head fits in limit UTF-16 code units. Cutting can split an entity, so
+    both halves are escaped again (and head shrunk until it still fits).
+    """
+    cut = max(1, _fitting_prefix_length(line, limit))
+    while True:
+        if cut > 1 and line[cut - 1] == "\\":
+            cut -= 1  # keep an escape together with the character it escapes
+        head = prepare_markdown(line[:cut])
+        overflow = telegram_length(head) - limit
+        if overflow <= 0:
+            return head, prepare_markdown(line[cut:])
+        cut = max(1, cut - overflow)
+
+class MessageBuilder:
+    """Collects message lines and sends them as chunks under Telegram's limit
+    
+    add() only appends to a list; a chunk is joined once, when it is full,
+    and sent in the background so the first part reaches the user while the
+    handler is still formatting the rest. Chunks are sent in order; later
+    ones start with continuation_prefix.
+    
+    Each line is escaped with prepare_markdown when added, so chunks are
+    measured exactly as they are sent. Use it as `async with
+    MessageBuilder(update) as message:` - leaving the block sends what is
+    left and waits for every chunk, or cancels unsent chunks if the block
+    raised. finish() does the former without the block.
+    """
+    
+    def __init__(self, update: Update, continuation_prefix: str = CONTINUATION_PREFIX, max_length: int = TELEGRAM_MESSAGE_LIMIT):
+        self.update = update
+        self.continuation_prefix = continuation_prefix
+        self.max_length = max_length
+        self.chunks_sent = 0
+        self._lines = []
+        self._length = 0
+        self._sends = []  # one task per chunk, each waits for the one before
+    
+    def add(self, text: str = ""):
+        """Add one or more lines (text may contain newlines)"""
+        for line in text.split("\n"):
+            self._add_line(line)
+    
+    def _add_line(self, line):
+        # A line on its own is valid Markdown once escaped, so any set of lines is too
+        line = prepare_markdown(line)
+        line_length = telegram_length(line) + 1  # + newline
+        if self._lines and self._length + line_length > self._chunk_limit():
+            self._flush()
+        
+        # A single line longer than a whole message is cut into pieces
+        while telegram_length(line) > self._chunk_limit():
+            head, line = _split_markdown_line(line, self._chunk_limit())
+            self._lines.append(head)
+            self._flush()
         
-        for line in lines:
-            if len(current_chunk + line + '\n') > max_length:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                    current_chunk = line + '\n'
-                else:
-                    chunks.append(line[:max_length].strip())
-                    current_chunk = line[max_length:] + '\n'
-            else:
-                current_chunk += line + '\n'
+        self._lines.append(line)
+        self._length += telegram_length(line) + 1
+    
+    def _chunk_limit(self):
+        if self.chunks_sent:
+            return self.max_length - telegram_length(self.continuation_prefix)
+        return self.max_length
+    
+    def _flush(self):
+        text = "\n".join(self._lines).strip()
+        self._lines = []
+        self._length = 0
+        if not text:
+            return
         
-        if current_chunk.strip():
-            chunks.append(current_chunk.strip())
+        if self.chunks_sent:
+            text = self.continuation_prefix + text
+        self.chunks_sent += 1
+        previous = self._sends[-1] if self._sends else None
+        self._sends.append(asyncio.ensure_future(self._send_after(previous, text)))
+    
+    async def _send_after(self, previous, text):
+        if previous is not None:
+            await previous
+        # Already escaped line by line in add()
+        await send_formatted_message(self.update, text, parse_mode=ParseMode.MARKDOWN)
+    
+    async def finish(self):
+        """Send the remaining lines and wait until every chunk is sent"""
+        self._flush()
+        if self._sends:
+            await self._sends[-1]
+    
+    async def cancel(self):
+        """Drop unsent lines and cancel chunks still being sent"""
+        self._lines = []
+        self._length = 0
+        if not self._sends:
+            return
+        for task in self._sends:
+            task.cancel()
+        await asyncio.wait(self._sends)
+        for task in self._sends:
+            if not task.cancelled():
+                task.exception()  # may have failed before the cancel; mark the error as retrieved
+    
+    async def __aenter__(self):
+        return self
     
-    for i, chunk in enumerate(chunks):
-        if i == 0:
-            await send_formatted_message(update, chunk)
+    async def __aexit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            await self.finish()
         else:
-            continuation = continuation_prefix + chunk
-            await send_formatted_message(update, continuation)
+            await self.cancel()
 
 def get_current_month() -> tuple[int, int]:
     """Get current calendar month and year
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+
+from telegram import Update
+
+from config import WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET
+from instrumentation import metrics
+
+def create_webhook_app(application, secret_token=WEBHOOK_SECRET, path=WEBHOOK_PATH):
+    """Starlette app that feeds POSTed Telegram updates into the application's update queue"""
+    from starlette.applications import Starlette
+    from starlette.responses import PlainTextResponse, Response
+    from starlette.routing import Route
+    
+    async def telegram_webhook(request):
+        if secret_token and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != secret_token:
+            return Response(status_code=403)
+        
+        try:
+            update = Update.de_json(await request.json(), application.bot)
+        except Exception as e:
+            logging.warning(f"Rejected malformed webhook update: {e}")
+            return Response(status_code=400)
+        
+        # Handlers run from the queue, so Telegram gets its 200 straight away
+        await application.update_queue.put(update)
+        return Response()
+    
+    async def health(request):
+        return PlainTextResponse("ok")
+    
+    async def prometheus_metrics(request):
+        # Registered stats (e.g. the parse cache) read SQLite - keep that off the event loop
+        body = await asyncio.to_thread(metrics.render_prometheus)
+        return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+    
+    return Starlette(routes=[
+        Route(path, telegram_webhook, methods=["POST"]),
+        Route("/healthz", health, methods=["GET"]),
+        Route("/metrics", prometheus_metrics, methods=["GET"])
+    ])
+
+def create_webhook_server(application, listen=WEBHOOK_LISTEN, port=WEBHOOK_PORT):
+    """uvicorn server for the webhook app (set server.should_exit to stop it)"""
+    import uvicorn
+    
+    return uvicorn.Server(uvicorn.Config(
+        create_webhook_app(application),
+        host=listen,
+        port=port,
+        log_level="warning"
+    ))
+
+async def run_webhook(application, url=WEBHOOK_URL, server=None, set_webhook=True, stop_event=None):
+    """Serve updates over HTTP (uvicorn) instead of long-polling getUpdates
+    
+    Registers {url}{WEBHOOK_PATH} with Telegram unless there is no url or
+    set_webhook is False (the fake Telegram harness in benchmarks/ posts
+    updates itself). Returns once the server exits: on SIGTERM/SIGINT, or
+    when stop_event is set. Updates already queued are handled before the
+    application stops.
+    """
+    server = server or create_webhook_server(application)
+    
+    async def exit_on_stop():
+        await stop_event.wait()
+        server.should_exit = True
+    
+    async with application:
+        if set_webhook and url:
+            await application.bot.set_webhook(
+                url=f"{url.rstrip('/')}{WEBHOOK_PATH}",
+                secret_token=WEBHOOK_SECRET or None,
+                allowed_updates=Update.ALL_TYPES
+            )
+        
+        await application.start()
+        watcher = asyncio.create_task(exit_on_stop()) if stop_event else None
+        try:
+            await server.serve()
+        except SystemExit as e:
+            # uvicorn exits the process when it can't bind; let the supervisor retry instead
+            raise RuntimeError(f"Webhook server failed to start (exit code {e.code})") from e
+        finally:
+            if watcher:
+                watcher.cancel()
+            await application.stop()
\ No newline at end of file
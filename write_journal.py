@@ -0,0 +1,321 @@
+import asyncio
+import contextlib
+import functools
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import WRITE_JOURNAL_PATH, WRITE_JOURNAL_BATCH_SIZE
+from database import db
+
+# Journal stages: the row insert is still pending, or the row is in the
+# database (reference_id known) and only the balance deltas are pending
+STAGE_INSERT = 0
+STAGE_DELTAS = 1
+
+# Retry backoff for entries that failed to flush (seconds)
+RETRY_BASE_DELAY = 2
+RETRY_MAX_DELAY = 300
+
+class WriteJournal:
+    """Local durable write-behind journal for expense and income writes
+    
+    append_expense / append_income commit the write to a local SQLite file
+    (synchronous=FULL, so it is fsync'ed) and return the new account balance
+    from a locally maintained copy, without waiting for the database. All
+    journal file access runs on one worker thread (like AsyncDatabaseManager
+    does for the database), so the fsync never blocks the event loop. flush()
+    drains the journal in batches: rows are inserted first (one
+    insert_expenses call per batch), then each user's balance deltas go out
+    in one apply_account_deltas call. Entries stay in the journal until both
+    steps succeed, so a crash or outage only delays them - the next flush
+    (including the first one after a restart) replays whatever is left.
+    
+    Each flush step that changes what the database holds for a user (a row
+    insert, a user's deltas) runs under that user's lock. Seeding local
+    balances and read_consistent take the same lock, so they see every
+    entry either in the database or in the journal - never both or neither -
+    and wait for at most one such step instead of a whole flush.
+    
+    A crash between a successful database write and the journal update can
+    replay that step once; the window is a single local commit.
+    """
+    
+    def __init__(self, path, batch_size=100):
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._user_locks = {}  # user_id -> asyncio.Lock, see the class docstring
+        self._balances = {}  # user_id -> {account_type: balance} incl. unflushed deltas
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="write-journal")
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS write_journal (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                row TEXT NOT NULL,
+                deltas TEXT NOT NULL,
+                stage INTEGER NOT NULL DEFAULT 0,
+                reference_id INTEGER,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                last_error TEXT
+            );
+        """)
+    
+    async def _run(self, func, *args):
+        """Run a blocking journal file operation on the journal's worker thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+    
+    async def append_expense(self, expense_data, account_type, description):
+        """Journal an expense; returns the account's new local balance"""
+        delta = {
+            "account_type": account_type,
+            "amount": -expense_data["amount"],  # Negative for expense
+            "transaction_type": "expense",
+            "description": description
+        }
+        balances = await self._append("expense", expense_data, [delta])
+        return balances[account_type]
+    
+    async def append_income(self, income_data, deltas):
+        """Journal an income row and its allocation deltas; returns local balances"""
+        return await self._append("income", income_data, deltas)
+    
+    async def balances(self, user_id):
+        """Get {account_type: balance} including writes that are not flushed yet"""
+        return dict(await self._local_balances(user_id))
+    
+    async def read_consistent(self, user_id, *queries):
+        """Run database reads for one user while none of their entries are flushed
+        
+        Returns (query results, balances, pending) where balances include every
+        unflushed delta and pending is {"expense": rows, "income": rows} - the
+        journaled rows not in the database yet, which the caller adds to what
+        the queries returned.
+        """
+        async with self._user_lock(user_id):
+            *results, balances, (pending, deltas) = await asyncio.gather(
+                *queries, db.get_account_balances(user_id), self._run(self._pending, user_id)
+            )
+        
+        self._add_deltas(balances, deltas)
+        self._balances.setdefault(user_id, dict(balances))
+        return results, balances, pending
+    
+    def invalidate(self, user_id):
+        """Forget local balances after a direct database balance write (re-seeded on next use)"""
+        self._balances.pop(user_id, None)
+    
+    def pending_count(self):
+        """Number of journal entries not yet fully flushed"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM write_journal").fetchone()[0]
+    
+    async def flush(self, deadline=None):
+        """Drain the journal to the database; returns the number of entries completed
+        
+        With a deadline (time.monotonic() value) no new batch is started after it.
+        """
+        async with self._flush_lock:
+            completed = 0
+            while True:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return completed
+                
+                entries = await self._run(self._due_entries)
+                if not entries:
+                    return completed
+                
+                await self._flush_inserts([e for e in entries if e["stage"] == STAGE_INSERT])
+                done = await self._flush_deltas([e for e in entries if e["stage"] == STAGE_DELTAS])
+                completed += done
+                
+                # Stop when a batch made no progress (everything left is failing)
+                if not done:
+                    return completed
+    
+    async def drain(self, timeout):
+        """Flush everything before shutdown, retrying failed entries now; returns the number left
+        
+        Entries still pending are kept in the journal file and replayed on the
+        next start.
+        """
+        await self._run(self._execute, "UPDATE write_journal SET next_attempt_at = 0")
+        await self.flush(deadline=time.monotonic() + timeout)
+        return await self._run(self.pending_count)
+    
+    def _execute(self, sql, params=()):
+        with self._lock:
+            self._conn.execute(sql, params)
+            self._conn.commit()
+    
+    def _executemany(self, sql, rows):
+        with self._lock:
+            self._conn.executemany(sql, rows)
+            self._conn.commit()
+    
+    async def _append(self, kind, row, deltas):
+        user_id = row["user_id"]
+        balances = await self._local_balances(user_id)
+        
+        await self._run(
+            self._execute,
+            "INSERT INTO write_journal (kind, user_id, row, deltas) VALUES (?, ?, ?, ?)",
+            (kind, user_id, json.dumps(row, ensure_ascii=False), json.dumps(deltas, ensure_ascii=False))
+        )
+        
+        self._add_deltas(balances, deltas)
+        return dict(balances)
+    
+    @staticmethod
+    def _add_deltas(balances, deltas):
+        for delta in deltas:
+            account_type = delta["account_type"]
+            balances[account_type] = balances.get(account_type, 0.0) + float(delta["amount"])
+    
+    def _user_lock(self, user_id):
+        return self._user_locks.setdefault(user_id, asyncio.Lock())
+    
+    @contextlib.asynccontextmanager
+    async def _holding_users(self, entries):
+        """Hold the user locks of all entries (in user_id order, so two holders can't deadlock)"""
+        async with contextlib.AsyncExitStack() as stack:
+            for user_id in sorted({entry["user_id"] for entry in entries}):
+                await stack.enter_async_context(self._user_lock(user_id))
+            yield
+    
+    async def _local_balances(self, user_id):
+        if user_id in self._balances:
+            return self._balances[user_id]
+        
+        # Seed from the database plus deltas it hasn't seen yet; the user
+        # lock keeps this user's deltas from being applied meanwhile
+        async with self._user_lock(user_id):
+            if user_id not in self._balances:
+                balances, (_, deltas) = await asyncio.gather(
+                    db.get_account_balances(user_id), self._run(self._pending, user_id)
+                )
+                self._add_deltas(balances, deltas)
+                self._balances[user_id] = balances
+        
+        return self._balances[user_id]
+    
+    def _pending(self, user_id):
+        """({kind: rows not inserted yet}, all unapplied deltas) for one user, in one read"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT kind, row, deltas, stage FROM write_journal WHERE user_id = ? ORDER BY id", (user_id,)
+            ).fetchall()
+        
+        pending = {"expense": [], "income": []}
+        deltas = []
+        for kind, row, entry_deltas, stage in rows:
+            if stage == STAGE_INSERT:
+                pending[kind].append(json.loads(row))
+            deltas += json.loads(entry_deltas)
+        return pending, deltas
+    
+    def _due_entries(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, kind, user_id, row, deltas, stage, reference_id, attempts FROM write_journal "
+                "WHERE next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (time.time(), self.batch_size)
+            ).fetchall()
+        
+        return [{
+            "id": row[0],
+            "kind": row[1],
+            "user_id": row[2],
+            "row": json.loads(row[3]),
+            "deltas": json.loads(row[4]),
+            "stage": row[5],
+            "reference_id": row[6],
+            "attempts": row[7]
+        } for row in rows]
+    
+    async def _flush_inserts(self, entries):
+        """Insert pending rows; expenses go out as one batch"""
+        expenses = [e for e in entries if e["kind"] == "expense"]
+        if expenses:
+            async with self._holding_users(expenses):
+                try:
+                    result = await db.insert_expenses([e["row"] for e in expenses])
+                    await self._mark_inserted(expenses, result.data)
+                except Exception as e:
+                    await self._mark_failed(expenses, e)
+        
+        for entry in entries:
+            if entry["kind"] != "income":
+                continue
+            async with self._user_lock(entry["user_id"]):
+                try:
+                    result = await db.insert_income(entry["row"])
+                    await self._mark_inserted([entry], result.data)
+                except Exception as e:
+                    await self._mark_failed([entry], e)
+    
+    async def _flush_deltas(self, entries):
+        """Apply pending deltas, one apply_account_deltas call per user"""
+        by_user = {}
+        for entry in entries:
+            by_user.setdefault(entry["user_id"], []).append(entry)
+        
+        completed = 0
+        for user_id, user_entries in by_user.items():
+            deltas = [
+                dict(delta, reference_id=entry["reference_id"])
+                for entry in user_entries for delta in entry["deltas"]
+            ]
+            async with self._user_lock(user_id):
+                try:
+                    await db.apply_account_deltas(user_id, deltas)
+                except Exception as e:
+                    await self._mark_failed(user_entries, e)
+                    continue
+                
+                await self._run(self._executemany, "DELETE FROM write_journal WHERE id = ?", [(e["id"],) for e in user_entries])
+            completed += len(user_entries)
+        
+        return completed
+    
+    async def _mark_inserted(self, entries, inserted_rows):
+        ids = [row.get("id") for row in inserted_rows or []]
+        ids += [None] * (len(entries) - len(ids))
+        
+        await self._run(
+            self._executemany,
+            "UPDATE write_journal SET stage = ?, reference_id = ?, attempts = 0, next_attempt_at = 0 WHERE id = ?",
+            [(STAGE_DELTAS, reference_id, entry["id"]) for entry, reference_id in zip(entries, ids)]
+        )
+        
+        # Let the same flush pick them up for the delta step
+        for entry, reference_id in zip(entries, ids):
+            entry["stage"] = STAGE_DELTAS
+            entry["reference_id"] = reference_id
+    
+    async def _mark_failed(self, entries, error):
+        logging.error(f"Write journal flush failed for {len(entries)} entries: {error}")
+        now = time.time()
+        
+        await self._run(
+            self._executemany,
+            "UPDATE write_journal SET attempts = attempts + 1, next_attempt_at = ?, last_error = ? WHERE id = ?",
+            [(now + min(RETRY_BASE_DELAY * 2 ** entry["attempts"], RETRY_MAX_DELAY), str(error), entry["id"]) for entry in entries]
+        )
+
+write_journal = WriteJournal(WRITE_JOURNAL_PATH, batch_size=WRITE_JOURNAL_BATCH_SIZE)
+
+async def flush_write_journal(context):
+    """Job: drain the write journal (first run after startup replays leftovers)"""
+    completed = await write_journal.flush()
+    if completed:
+        logging.info(f"Write journal flushed {completed} entries")
\ No newline at end of file